@@ -0,0 +1,159 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import is_process_local
+from core.metrics import TOKEN_CACHE_LOOKUPS
+
+
+class TokenCache:
+    """
+    Bounded LRU mapping token keys to their (user, token) pair, with
+    entries expiring after a TTL. When a cache alias is given, entries are
+    kept in that Django cache backend instead, shared with the other
+    processes, so invalidating a token reaches all of them.
+
+    Without a shared backend entries are only kept while a single process
+    serves requests, as other processes would miss the invalidations and
+    keep accepting revoked tokens.
+    """
+    key_prefix = 'auth-token:'
+
+    def __init__(self, max_size, ttl, alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """
+        Return the shared cache backend, if one is configured that every
+        process serving requests sees
+        """
+        if not self.alias:
+            return None
+        cache = caches[self.alias]
+        if settings.SERVER_PROCESSES > 1 and is_process_local(cache):
+            return None
+        return cache
+
+    @property
+    def local(self):
+        """
+        Return whether entries are kept in the memory of this process
+        """
+        return (
+            self.max_size > 0
+            and settings.SERVER_PROCESSES <= 1
+            and self.shared is None
+        )
+
+    def get(self, key):
+        """
+        Return the cached (user, token) pair for a key, or None
+        """
+        shared = self.shared
+        if shared is not None:
+            # never copied locally, where a revocation would not reach it
+            return shared.get(self.key_prefix + key)
+        if not self.local:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        return None
+
+    def set(self, key, value):
+        """
+        Cache the (user, token) pair for a key
+        """
+        shared = self.shared
+        if shared is not None:
+            shared.set(self.key_prefix + key, value, self.ttl)
+        elif self.local:
+            self._store(key, value, time.monotonic())
+
+    def delete(self, key):
+        """
+        Drop a single token key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def delete_user(self, user_id):
+        """
+        Drop every cached token that belongs to a user
+        """
+        keys = set(
+            Token.objects.filter(user_id=user_id).values_list(
+                'key', flat=True,
+            )
+        )
+        with self._lock:
+            keys.update(
+                key for key, (_, (user, _)) in self._entries.items()
+                if user.pk == user_id
+            )
+        for key in keys:
+            self.delete(key)
+
+    def clear(self):
+        """
+        Drop every locally cached token
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL,
+    alias=settings.TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that avoids the token and user lookup for
+    recently seen tokens
+    """
+
+    def authenticate_credentials(self, key):
+        """
+        Return the cached user and token, looking them up on a miss
+        """
+        cached = token_cache.get(key)
+        TOKEN_CACHE_LOOKUPS.inc(result='miss' if cached is None else 'hit')
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+
+        # requests may modify their user, so never share the cached one
+        user, token = cached
+        return (copy.copy(user), copy.copy(token))
@@ -0,0 +1,161 @@
+import datetime
+import logging
+import os
+import posixpath
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+
+logger = logging.getLogger(__name__)
+
+# directory of the stored recipe images, see recipe_image_file_path
+IMAGE_DIRECTORY = 'uploads/recipe'
+
+
+def get_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def lock(name):
+    """
+    Lock the row of a stored image until the transaction ends, creating it
+    unused when the image is new
+    """
+    ImageBlob.objects.select_for_update().get_or_create(name=name)
+
+
+def acquire(name):
+    """
+    Count a recipe using an image
+    """
+    added = ImageBlob.objects.filter(name=name).update(
+        references=F('references') + 1,
+    )
+    if not added:
+        # assigned without going through the storage
+        blob, created = ImageBlob.objects.get_or_create(
+            name=name, defaults={'references': 1},
+        )
+        if not created:
+            acquire(name)
+
+
+def release(name):
+    """
+    Stop counting a recipe using an image, deleting the image once the
+    transaction commits if no recipe uses it any more
+    """
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1,
+    )
+    transaction.on_commit(lambda: _collect_after_commit([name]))
+
+
+def _collect_after_commit(names):
+    try:
+        collect(names)
+    except Exception:
+        # the recipes are saved already, the command collects it later
+        logger.exception('Deleting unused images %s failed', names)
+
+
+def delete_files(name):
+    """
+    Delete a stored image and the directory of its variants
+    """
+    get_storage().delete(name)
+    stem = os.path.splitext(name)[0]
+    if default_storage.exists(stem):
+        for filename in default_storage.listdir(stem)[1]:
+            default_storage.delete(posixpath.join(stem, filename))
+        default_storage.delete(stem)
+
+
+def collect(names=None):
+    """
+    Delete the given images, or all of them, that no recipe uses, and
+    return their names. Their rows are locked first, so images being
+    saved again meanwhile are kept.
+    """
+    blobs = ImageBlob.objects.select_for_update().filter(references=0)
+    if names is not None:
+        blobs = blobs.filter(name__in=list(names))
+
+    with transaction.atomic():
+        deleted = []
+        for blob in blobs:
+            delete_files(blob.name)
+            deleted.append(blob.name)
+        ImageBlob.objects.filter(name__in=deleted).delete()
+
+    return deleted
+
+
+def recount():
+    """
+    Set the references of every stored image from the recipes using it,
+    tracking the images missing a row, and return the number of rows
+    corrected
+    """
+    with transaction.atomic():
+        blobs = {
+            blob.name: blob for blob in ImageBlob.objects.select_for_update()
+        }
+        counts = dict(
+            Recipe.objects.exclude(image__isnull=True).exclude(
+                image='',
+            ).values_list('image').annotate(Count('id')).order_by()
+        )
+
+        wrong = [
+            blob for name, blob in blobs.items()
+            if blob.references != counts.get(name, 0)
+        ]
+        for blob in wrong:
+            blob.references = counts.get(blob.name, 0)
+            blob.save(update_fields=['references'])
+        missing = [
+            ImageBlob(name=name, references=count)
+            for name, count in counts.items() if name not in blobs
+        ]
+        ImageBlob.objects.bulk_create(missing)
+
+    return len(wrong) + len(missing)
+
+
+def untracked_files(grace):
+    """
+    Yield the files of the image directory that belong to no tracked image
+    or recipe and were not modified for `grace` seconds, such as images
+    whose recipe failed to save
+    """
+    storage = get_storage()
+    tracked = set(ImageBlob.objects.values_list('name', flat=True))
+    # used by recipes whose row is missing until the next recount
+    tracked.update(Recipe.objects.exclude(image__isnull=True).exclude(
+        image='',
+    ).values_list('image', flat=True))
+    stems = {os.path.splitext(name)[0] for name in tracked}
+    before = timezone.now() - datetime.timedelta(seconds=grace)
+
+    def walk(directory):
+        if directory in stems:
+            # variants of a tracked image
+            return
+        directories, files = storage.listdir(directory)
+        for name in files:
+            path = posixpath.join(directory, name)
+            if (
+                path not in tracked
+                and storage.get_modified_time(path) < before
+            ):
+                yield path
+        for name in directories:
+            yield from walk(posixpath.join(directory, name))
+
+    if storage.exists(IMAGE_DIRECTORY):
+        yield from walk(IMAGE_DIRECTORY)
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def _version_key(user_id):
+    return f'user-version:{user_id}'
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def is_process_local(cache):
+    """
+    Return whether a cache keeps its values in the memory of the process
+    """
+    return isinstance(cache, LocMemCache)
+
+
+def get_user_version(user_id):
+    """
+    Return the current version of the data owned by a user, or None when
+    the cache does not keep values, or keeps them per process while
+    several processes serve requests. Versions start from the clock, so a
+    counter evicted from the cache never repeats an old version.
+    """
+    key = _version_key(user_id)
+    cache = _cache()
+    if settings.SERVER_PROCESSES > 1 and is_process_local(cache):
+        # a change bumps the version of the process it was made in only
+        return None
+
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """
+    Move a user to a new version, so responses cached for the previous
+    one are no longer used
+    """
+    key = _version_key(user_id)
+    try:
+        _cache().incr(key)
+    except ValueError:
+        get_user_version(user_id)
@@ -0,0 +1,81 @@
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from core.models import Change, ChangeFloor
+
+
+def record_changes(model, pairs, action):
+    """
+    Log `action` for each (object id, user id) pair of `model` objects
+    """
+    Change.objects.bulk_create([
+        Change(
+            user_id=user_id,
+            model=model._meta.model_name,
+            object_id=object_id,
+            action=action,
+        )
+        for object_id, user_id in pairs
+    ])
+
+
+def record_instances(instances, action):
+    """
+    Log `action` for each of the given objects
+    """
+    instances = list(instances)
+    if instances:
+        record_changes(
+            type(instances[0]),
+            [(instance.pk, instance.user_id) for instance in instances],
+            action,
+        )
+
+
+def compact():
+    """
+    Delete the entries followed by a later one for the same object, and
+    return how many were deleted. Syncs only read the last change of each
+    object, so they return the same objects from the compacted log.
+    """
+    table = Change._meta.db_table
+    # numbered in one sorted pass, comparing each entry with the others of
+    # its object would take quadratic time
+    with connections[router.db_for_write(Change)].cursor() as cursor:
+        cursor.execute(f"""
+            DELETE FROM {table} WHERE seq IN (
+                SELECT seq FROM (
+                    SELECT seq, row_number() OVER (
+                        PARTITION BY user_id, model, object_id
+                        ORDER BY seq DESC
+                    ) AS newer
+                    FROM {table}
+                ) AS numbered
+                WHERE newer > 1
+            )
+        """)
+        return cursor.rowcount
+
+
+def prune(before):
+    """
+    Delete the tombstones logged before `before` and return how many were
+    deleted. The last position removed from each user's log is recorded,
+    so clients that synced up to an earlier position start over.
+    """
+    tombstones = Change.objects.filter(
+        action=Change.DELETED, created_at__lt=before,
+    )
+    with transaction.atomic():
+        floors = tombstones.values('user_id').annotate(
+            last_position=Max('position'),
+        ).order_by().values_list('user_id', 'last_position')
+        for user_id, position in floors:
+            floor, created = ChangeFloor.objects.select_for_update(
+            ).get_or_create(user_id=user_id, defaults={'position': position})
+            if not created and floor.position < position:
+                floor.position = position
+                floor.save(update_fields=['position'])
+        deleted, _ = tombstones.delete()
+
+    return deleted
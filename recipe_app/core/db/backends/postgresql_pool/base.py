@@ -0,0 +1,94 @@
+import functools
+import threading
+import time
+
+from django.db.backends.postgresql import base
+
+from core import metrics
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.backends.postgresql_pool.creation import DatabaseCreation
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, conn_params):
+    """
+    Return the connection pool for a database, creating it on first use
+    """
+    key = (alias, settings_dict['NAME'])
+    with _pools_lock:
+        if key not in _pools:
+            options = settings_dict.get('POOL', {})
+            _pools[key] = ConnectionPool(
+                functools.partial(base.Database.connect, **conn_params),
+                min_size=options.get('MIN_SIZE', 1),
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 30),
+                max_idle=options.get('MAX_IDLE', 600),
+                check=settings_dict.get('CONN_HEALTH_CHECKS', False),
+            )
+            _pools[key].fill()
+        return _pools[key]
+
+
+def close_pools(name=None):
+    """
+    Close the idle connections of every pool, or only those to `name`
+    """
+    with _pools_lock:
+        pools = [
+            pool for (_, pool_name), pool in _pools.items()
+            if name is None or pool_name == name
+        ]
+    for pool in pools:
+        pool.close_all()
+
+
+def record_stats(alias, pool):
+    """
+    Update the pool metrics of a database from its pool
+    """
+    stats = pool.stats()
+    for state in ('idle', 'in_use'):
+        metrics.DB_POOL_CONNECTIONS.set(
+            stats[state], database=alias, state=state,
+        )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that borrows connections from an in-process pool
+    and returns them on close instead of disconnecting
+    """
+    creation_class = DatabaseCreation
+    # connections are checked by the pool when they are checked out
+    pooled = True
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(self.alias, self.settings_dict, conn_params)
+        start = time.perf_counter()
+        try:
+            connection = self.pool.getconn()
+        except PoolTimeout:
+            metrics.DB_POOL_TIMEOUTS.inc(database=self.alias)
+            raise
+        metrics.DB_POOL_CHECKOUT_SECONDS.observe(
+            time.perf_counter() - start, database=self.alias,
+        )
+        record_stats(self.alias, self.pool)
+
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level,
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+            record_stats(self.alias, self.pool)
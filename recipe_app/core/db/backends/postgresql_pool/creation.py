@@ -0,0 +1,13 @@
+from django.db.backends.postgresql import creation
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        """
+        Close pooled connections to the test database before dropping it
+        """
+        from core.db.backends.postgresql_pool.base import close_pools
+
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Raised when no connection became available within the pool timeout
+    """
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of psycopg2 connections.
+
+    `fill` opens `min_size` connections up front, up to `max_size` are
+    opened on demand, and callers wait up to `timeout` seconds for one to
+    be returned once they are all in use. Idle connections above
+    `min_size` are closed after `max_idle` seconds. With `check`,
+    connections are tested when they are checked out.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=30,
+                 max_idle=600, check=False):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check = check
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+
+    def getconn(self):
+        """
+        Return a connection, opening one or waiting for one if needed
+        """
+        while True:
+            conn = self._checkout()
+            if conn is None:
+                return self._open()
+            if self._is_usable(conn):
+                return conn
+            self._discard(conn)
+
+    def fill(self):
+        """
+        Open idle connections until the pool holds `min_size` of them
+        """
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def putconn(self, conn):
+        """
+        Return a connection to the pool, discarding it if it is broken
+        """
+        if not conn.closed:
+            status = conn.get_transaction_status()
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+        if conn.closed or (
+            conn.get_transaction_status()
+            != extensions.TRANSACTION_STATUS_IDLE
+        ):
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._prune()
+            self._cond.notify()
+
+    def close_all(self):
+        """
+        Close every idle connection
+        """
+        with self._cond:
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+    def stats(self):
+        """
+        Return the pool usage and wait time counters
+        """
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'max_wait': self._max_wait,
+                'timeouts': self._timeouts,
+            }
+
+    def _checkout(self):
+        """
+        Take an idle connection, or reserve a slot for a new one by
+        returning None
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection available after {self.timeout}s'
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            if waited:
+                elapsed = time.monotonic() - start
+                self._waits += 1
+                self._wait_time += elapsed
+                self._max_wait = max(self._max_wait, elapsed)
+
+            if self._idle:
+                conn, _ = self._idle.pop()
+                return conn
+            self._size += 1
+            return None
+
+    def _open(self):
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _is_usable(self, conn):
+        if conn.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not conn.autocommit:
+                # handed out without the transaction the check opened
+                conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _prune(self):
+        """
+        Close connections idle for too long, keeping `min_size` of them
+        """
+        expired = time.monotonic() - self.max_idle
+        while (
+            self._size > self.min_size
+            and self._idle
+            and self._idle[0][1] < expired
+        ):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            conn.close()
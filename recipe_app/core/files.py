@@ -0,0 +1,201 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# encodings of precompressed files by preference, with their extension
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# names given by the static files storage, with 12 hex digits of the hash
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}(\.[^./]+)?$')
+
+
+class FileRange:
+    """
+    Part of an open file. Servers able to send files with sendfile read
+    the position of the file and the response Content-Length, others read
+    the part through `read`.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_hashed(path):
+    """
+    Return whether a file name includes a hash of its content
+    """
+    return HASHED_NAME.search(path) is not None
+
+
+def _accepted_encodings(request):
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            accepted.add(coding.strip().lower())
+
+    return accepted
+
+
+def _find_encoding(request, fullpath):
+    """
+    Return the (encoding, path, stats) of the preferred precompressed file
+    the client accepts, or None
+    """
+    accepted = _accepted_encodings(request)
+    for coding, extension in ENCODINGS:
+        if coding not in accepted:
+            continue
+        path = f'{fullpath}{extension}'
+        try:
+            return coding, path, os.stat(path)
+        except OSError:
+            continue
+
+    return None
+
+
+def _parse_range(header, size):
+    """
+    Return the (start, length) of a single byte range header, None when the
+    header is to be ignored and False when it is not satisfiable
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # several ranges are served as the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        length = min(int(last), size)
+        return (size - length, length) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+
+    return start, end - start + 1
+
+
+def _if_range_passes(request, etag, mtime):
+    """
+    Return whether the range of a request applies to the current file
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def serve(request, path, document_root, max_age, immutable=False,
+          precompressed=False):
+    """
+    Send a file below `document_root` with caching headers, answering
+    conditional requests with 304 responses and byte range requests with
+    206 responses. With `precompressed`, gzip and brotli encodings stored
+    next to the file are sent to clients accepting them.
+
+    The file is returned in a FileResponse, which the server sends with
+    sendfile when it supports it.
+    """
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stats = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(stats.st_mode):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    if encoding:
+        # sent as they are, not decoded by clients
+        content_type = f'application/{encoding}'
+    headers = {
+        'Content-Type': content_type or 'application/octet-stream',
+        'Last-Modified': http_date(stats.st_mtime),
+        'Cache-Control': f'public, max-age={max_age}'
+        + (', immutable' if immutable else ''),
+        'Accept-Ranges': 'bytes',
+    }
+    range_header = request.META.get('HTTP_RANGE')
+    content_encoding = None
+    if precompressed:
+        headers['Vary'] = 'Accept-Encoding'
+        # ranges are served from the file itself
+        encoded = None if range_header else _find_encoding(request, fullpath)
+        if encoded is not None:
+            content_encoding, fullpath, stats = encoded
+            headers['Content-Encoding'] = content_encoding
+    etag = '"{:x}-{:x}{}"'.format(
+        int(stats.st_mtime), stats.st_size,
+        f'-{content_encoding}' if content_encoding else '',
+    )
+    headers['ETag'] = etag
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stats.st_mtime),
+    )
+    if response is not None:
+        if response.status_code == 304:
+            for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Vary'):
+                if name in headers:
+                    response[name] = headers[name]
+        return response
+
+    size = stats.st_size
+    start, length, status = 0, size, 200
+    if range_header and _if_range_passes(request, etag, stats.st_mtime):
+        parsed = _parse_range(range_header, size)
+        if parsed is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if parsed is not None:
+            start, length = parsed
+            status = 206
+            headers['Content-Range'] = (
+                f'bytes {start}-{start + length - 1}/{size}'
+            )
+
+    if request.method == 'HEAD':
+        response = HttpResponse(status=status)
+    else:
+        file = open(fullpath, 'rb')
+        response = FileResponse(
+            FileRange(file, start, length) if status == 206 else file,
+            status=status,
+            content_type=headers['Content-Type'],
+        )
+    for name, value in headers.items():
+        response[name] = value
+    response['Content-Length'] = length
+
+    return response
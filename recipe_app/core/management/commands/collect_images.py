@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import blobs
+
+
+class Command(BaseCommand):
+    """
+    Recount the recipes using each stored image and delete the images no
+    recipe uses. Unused images are normally deleted as recipes drop them,
+    this catches up after failures and removes stray files.
+    """
+    help = 'Delete recipe images no recipe uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Seconds stray files are kept, as their upload may still '
+                 'be in progress',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the stray files without deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['grace'] < 0:
+            raise CommandError('The grace period cannot be negative')
+
+        if options['dry_run']:
+            strays = list(blobs.untracked_files(options['grace']))
+            for path in strays:
+                self.stdout.write(path)
+            self.stdout.write(f'{len(strays)} stray files')
+            return
+
+        # recounted first, so images of recipes missing their row are
+        # tracked again rather than deleted as stray files
+        corrected = blobs.recount()
+        strays = list(blobs.untracked_files(options['grace']))
+        deleted = blobs.collect()
+        storage = blobs.get_storage()
+        for path in strays:
+            storage.delete(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Corrected {corrected} counts, deleted {len(deleted)} unused '
+            f'images and {len(strays)} stray files',
+        ))
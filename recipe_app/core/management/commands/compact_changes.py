@@ -0,0 +1,39 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import changes
+
+
+class Command(BaseCommand):
+    """
+    Keep the change log from growing with the history of each object: drop
+    the entries followed by a later change of the same object, and the
+    tombstones of objects deleted before the retention period. Clients
+    that last synced before a removed tombstone are told to start over.
+    """
+    help = 'Compact the change log read by syncing clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SYNC_RETENTION_DAYS,
+            help='Days tombstones of deleted objects are kept',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('The retention period cannot be negative')
+
+        compacted = changes.compact()
+        pruned = changes.prune(
+            timezone.now() - datetime.timedelta(days=options['days']),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {compacted} superseded entries and {pruned} '
+            f'tombstones',
+        ))
@@ -1,8 +1,19 @@
+import random
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.db import connections
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.db.utils import (
+    ConnectionDoesNotExist,
+    DatabaseError,
+    OperationalError,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+# exit status when a database is still unavailable after --timeout, usage
+# errors and unknown aliases exit with 1 as any other command error
+EXIT_TIMEOUT = 3
 
 
 class Command(BaseCommand):
@@ -10,18 +21,108 @@ class Command(BaseCommand):
     Pause execution until database is available
     """
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--databases',
+            nargs='+',
+            default=['default'],
+            help='Database aliases to wait for, checked in parallel',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait before giving up, 0 waits forever',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.5,
+            help='Initial delay between attempts, doubled after each one',
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Upper bound for the delay between attempts',
+        )
+
     def handle(self, *args, **options):
+        aliases = options['databases']
+        for alias in aliases:
+            try:
+                connections[alias]
+            except ConnectionDoesNotExist:
+                raise CommandError(f"Unknown database alias '{alias}'")
+
         self.stdout.write(self.style.NOTICE(
             'Waiting for database...',
         ))
-        db_conn = None
-        while not db_conn:
-            try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write(self.style.WARNING(
-                    'Database unavailable, waiting 1 sec...',
+        if len(aliases) == 1:
+            ready = [self.wait(aliases[0], options)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+                ready = list(executor.map(
+                    lambda alias: self.wait(alias, options, close=True),
+                    aliases,
                 ))
-                time.sleep(1)
+
+        if not all(ready):
+            self.stderr.write(self.style.ERROR(
+                'Timed out waiting for database',
+            ))
+            sys.exit(EXIT_TIMEOUT)
 
         self.stdout.write(self.style.SUCCESS('Connected!'))
+
+    def wait(self, alias, options, close=False):
+        """
+        Probe a database until it answers or the timeout expires, backing
+        off exponentially with jitter between attempts
+        """
+        timeout = options['timeout']
+        deadline = time.monotonic() + timeout if timeout else None
+        delay = options['delay']
+        try:
+            while True:
+                try:
+                    self.probe(alias)
+                    return True
+                except OperationalError:
+                    pass
+
+                sleep = delay / 2 + random.uniform(0, delay / 2)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    sleep = min(sleep, remaining)
+
+                self.stdout.write(self.style.WARNING(
+                    f"Database '{alias}' unavailable, "
+                    f"waiting {sleep:.1f} sec...",
+                ))
+                time.sleep(sleep)
+                delay = min(delay * 2, options['max_delay'])
+        finally:
+            if close:
+                connections[alias].close()
+
+    def probe(self, alias):
+        """
+        Open a connection to the database and run a trivial query on it
+        """
+        conn = connections[alias]
+        conn.ensure_connection()
+        try:
+            with conn.wrap_database_errors:
+                cursor = conn.connection.cursor()
+                cursor.execute('SELECT 1')
+                cursor.close()
+        except OperationalError:
+            # drop the broken connection so the next attempt reconnects
+            try:
+                conn.close()
+            except DatabaseError:
+                pass
+            raise
@@ -0,0 +1,462 @@
+import atexit
+import bisect
+import contextlib
+import fcntl
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.profiling import QueryTimer
+
+# upper bounds of the default histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# file of a metrics directory holding the values of stopped processes
+AGGREGATE_FILE = 'aggregate.json'
+# file locked while processes are folded into the aggregate
+LOCK_FILE = 'aggregate.lock'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n',
+        ))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metric:
+    """
+    Base class of metrics keeping a value per combination of label values
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name} expects the labels {self.labelnames}'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        """
+        Return the current values as a JSON serializable list
+        """
+        with self._lock:
+            return [
+                [list(key), self._copy(value)]
+                for key, value in self._values.items()
+            ]
+
+    def drain(self):
+        """
+        Return the current values like `snapshot` and start over from none
+        """
+        with self._lock:
+            values, self._values = self._values, {}
+        return [[list(key), value] for key, value in values.items()]
+
+    def merge(self, total, value):
+        """
+        Return the sum of two values, adding up processes
+        """
+        raise NotImplementedError
+
+    def samples(self, key, value):
+        """
+        Yield the (name, labels, value) samples exposed for a value
+        """
+        raise NotImplementedError
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing total
+    """
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, total, value):
+        return total + value
+
+    def samples(self, key, value):
+        yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    """
+    Current value, added up over the running processes
+    """
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, total, value):
+        return total + value
+
+    def samples(self, key, value):
+        yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    """
+    Counts of observed values in cumulative buckets, with their sum
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # the value is stored as the count per bucket, then the sum
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, key, value):
+        labels = list(zip(self.labelnames, key))
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), value):
+            cumulative += count
+            yield (
+                f'{self.name}_bucket',
+                labels + [('le', _format_value(bound))],
+                cumulative,
+            )
+        yield f'{self.name}_sum', labels, value[-1]
+        yield f'{self.name}_count', labels, cumulative
+
+    def _copy(self, value):
+        return list(value)
+
+
+class Registry:
+    """
+    Collection of metrics exposed in the Prometheus text format.
+
+    With a directory, each process periodically writes its values to a
+    file of its own there, named after its id and start time, and exposing
+    the metrics adds up the files of every process, so any worker can
+    serve the totals. Stopping processes fold their values, gauges aside,
+    into a single aggregate file and delete their own, so totals never go
+    back while the directory holds one file per running process.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flushed = time.monotonic()
+        self._started()
+        os.register_at_fork(after_in_child=self._forked)
+
+    def _started(self):
+        self._process = f'{os.getpid()}-{time.time_ns()}'
+
+    def _forked(self):
+        # forked workers write a file of their own, leaving the values of
+        # the parent to the parent
+        self._started()
+        for metric in self._metrics.values():
+            metric.drain()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'{metric.name} is already registered')
+            self._metrics[metric.name] = metric
+
+    def snapshot(self):
+        """
+        Return the values of every metric of this process
+        """
+        return {
+            name: metric.snapshot() for name, metric in self._metrics.items()
+        }
+
+    def flush(self, directory):
+        """
+        Write the values of this process to its file in `directory`
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        temp = f'{path}.tmp'
+        # waits for retire, so values it drained are never written back
+        with self._locked(directory, fcntl.LOCK_SH):
+            with open(temp, 'w') as file:
+                json.dump(self.snapshot(), file)
+            # replaced atomically so readers never see a partial file
+            os.replace(temp, path)
+        self._flushed = time.monotonic()
+
+    def flush_if_due(self, directory, interval):
+        """
+        Flush when `interval` seconds passed since the last flush
+        """
+        if directory and time.monotonic() - self._flushed >= interval:
+            self.flush(directory)
+
+    def retire(self, directory):
+        """
+        Move the values of this process to the aggregate file of
+        `directory` and delete the file of this process, as it is stopping
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, AGGREGATE_FILE)
+        with self._locked(directory, fcntl.LOCK_EX):
+            # drained so values are never added to the aggregate twice,
+            # gauges describe running processes only
+            snapshots = [{
+                name: metric.drain()
+                for name, metric in self._metrics.items()
+                if metric.type != Gauge.type
+            }]
+            aggregate = self._read(path)
+            if aggregate is not None:
+                snapshots.append(aggregate)
+            totals = self._add_up(snapshots)
+
+            temp = f'{path}.tmp'
+            with open(temp, 'w') as file:
+                json.dump({
+                    name: [[list(key), value] for key, value in values.items()]
+                    for name, values in totals.items()
+                }, file)
+            os.replace(temp, path)
+            try:
+                os.remove(self._path(directory))
+            except FileNotFoundError:
+                # stopped before its first flush
+                pass
+
+    def collect(self, directory=None):
+        """
+        Return the values of every metric by label values, added up over
+        the processes writing to `directory`
+        """
+        snapshots = [self.snapshot()]
+        if directory and os.path.isdir(directory):
+            own = self._path(directory)
+            # read while no stopping process moves its values around
+            with self._locked(directory, fcntl.LOCK_SH):
+                for entry in os.scandir(directory):
+                    if not entry.name.endswith('.json') or entry.path == own:
+                        continue
+                    snapshot = self._read(entry.path)
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+
+        return self._add_up(snapshots)
+
+    def expose(self, directory=None):
+        """
+        Return the metrics in the Prometheus text exposition format
+        """
+        totals = self.collect(directory)
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(totals[name].items()):
+                for sample, labels, sample_value in metric.samples(key, value):
+                    lines.append(
+                        f'{sample}{_format_labels(labels)} '
+                        f'{_format_value(sample_value)}'
+                    )
+
+        return '\n'.join(lines) + '\n'
+
+    def _add_up(self, snapshots):
+        """
+        Return the values of the snapshots added up by label values
+        """
+        totals = {name: {} for name in self._metrics}
+        for snapshot in snapshots:
+            for name, values in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    # written by a process running other metrics
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    total = totals[name].get(key)
+                    totals[name][key] = (
+                        value if total is None else metric.merge(total, value)
+                    )
+
+        return totals
+
+    def _read(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            # removed while reading
+            return None
+
+    @contextlib.contextmanager
+    def _locked(self, directory, operation):
+        with open(os.path.join(directory, LOCK_FILE), 'a') as file:
+            fcntl.flock(file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _path(self, directory):
+        return os.path.join(directory, f'{self._process}.json')
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling requests',
+    ('view', 'action'),
+)
+RESPONSES = Counter(
+    'http_responses_total',
+    'Responses returned',
+    ('view', 'action', 'status'),
+)
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'Database queries run while handling requests',
+    ('view', 'action'),
+)
+DB_QUERY_SECONDS = Counter(
+    'db_query_seconds_total',
+    'Time spent in database queries while handling requests',
+    ('view', 'action'),
+)
+TOKEN_CACHE_LOOKUPS = Counter(
+    'auth_token_cache_lookups_total',
+    'Token authentication cache lookups',
+    ('result',),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'db_pool_connections',
+    'Connections held by the database connection pools',
+    ('database', 'state'),
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds',
+    'Time spent checking out pooled connections, waiting and connecting '
+    'included',
+    ('database',),
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Checkouts that found no pooled connection within the timeout',
+    ('database',),
+)
+UPLOAD_SIZE = Histogram(
+    'recipe_image_upload_bytes',
+    'Size of uploaded recipe images',
+    buckets=tuple(2 ** power for power in range(16, 25)),
+)
+
+
+def _retire_at_exit():
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        REGISTRY.retire(settings.METRICS_DIR)
+
+
+atexit.register(_retire_at_exit)
+
+
+def _view_labels(request, view_func):
+    """
+    Return the view and action labels of a request, the viewset action
+    for viewsets and the lowercase method otherwise
+    """
+    view_class = (
+        getattr(view_func, 'cls', None)
+        or getattr(view_func, 'view_class', None)
+    )
+    view = (
+        view_class.__name__ if view_class is not None
+        else getattr(view_func, '__name__', 'unknown')
+    )
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+
+    return view, actions.get(method, method)
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, status and database queries of each request by
+    view and action. Disabled unless METRICS_ENABLED is on.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with QueryTimer().installed() as queries:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        # requests matching no url never reach process_view
+        view, action = getattr(
+            request, '_metrics_labels', ('unmatched', ''),
+        )
+        REQUEST_DURATION.observe(duration, view=view, action=action)
+        RESPONSES.inc(view=view, action=action, status=response.status_code)
+        DB_QUERIES.inc(queries.queries, view=view, action=action)
+        DB_QUERY_SECONDS.inc(queries.db_time, view=view, action=action)
+
+        REGISTRY.flush_if_due(
+            settings.METRICS_DIR,
+            settings.METRICS_FLUSH_INTERVAL,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_labels = _view_labels(request, view_func)
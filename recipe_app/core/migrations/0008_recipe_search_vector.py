@@ -0,0 +1,66 @@
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery
+
+INDEX_NAME = 'core_recipe_search_vector_idx'
+
+
+def related_names(recipe, field_name):
+    """
+    Return the names of a related model joined per recipe
+    """
+    return Subquery(
+        recipe.objects.filter(pk=OuterRef('pk')).values('pk').annotate(
+            names=StringAgg(field_name, ' '),
+        ).values('names')
+    )
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Index and fill the search vectors on databases with full text search
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        f'CREATE INDEX {INDEX_NAME} ON core_recipe USING gin (search_vector)'
+    )
+    recipe = apps.get_model('core', 'Recipe')
+    # spelled out rather than taken from core.search, so later changes to
+    # it leave this migration as it was
+    config = settings.RECIPE_SEARCH_CONFIG
+    recipe.objects.update(search_vector=(
+        SearchVector(F('title'), weight='A', config=config)
+        + SearchVector(
+            related_names(recipe, 'tags__name'), weight='B', config=config,
+        )
+        + SearchVector(
+            related_names(recipe, 'ingredients__name'), weight='B',
+            config=config,
+        )
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
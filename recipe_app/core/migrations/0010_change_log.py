@@ -0,0 +1,53 @@
+# Generated by Django 2.1.15 on 2026-10-18 03:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_existing_objects(apps, schema_editor):
+    """
+    Log the objects created before the change log, so a first sync
+    returns them
+    """
+    change = apps.get_model('core', 'Change')
+    for model_name in ('tag', 'ingredient', 'recipe'):
+        model = apps.get_model('core', model_name)
+        rows = model.objects.order_by('pk').values_list('pk', 'user_id')
+        change.objects.bulk_create(
+            (
+                change(
+                    user_id=user_id,
+                    model=model_name,
+                    object_id=object_id,
+                    action='created',
+                )
+                for object_id, user_id in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=32)),
+                ('object_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=16)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'seq'], name='core_change_user_seq_idx'),
+        ),
+        migrations.RunPython(log_existing_objects, migrations.RunPython.noop),
+    ]
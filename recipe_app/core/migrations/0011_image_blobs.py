@@ -0,0 +1,46 @@
+# Generated by Django 2.1.15 on 2026-10-18 04:40
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+def track_existing_images(apps, schema_editor):
+    """
+    Count the recipes using each image stored before images were shared
+    """
+    recipe = apps.get_model('core', 'Recipe')
+    image_blob = apps.get_model('core', 'ImageBlob')
+    counts = recipe.objects.exclude(image__isnull=True).exclude(
+        image='',
+    ).values_list('image').annotate(models.Count('id')).order_by()
+    image_blob.objects.bulk_create(
+        (
+            image_blob(name=name, references=count)
+            for name, count in counts.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunPython(track_existing_images, migrations.RunPython.noop),
+    ]
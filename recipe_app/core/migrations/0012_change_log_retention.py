@@ -0,0 +1,99 @@
+# Generated by Django 2.1.15 on 2026-10-18 06:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+POSTGRESQL_TRIGGER = '''
+CREATE FUNCTION core_change_set_position() RETURNS trigger AS $$
+BEGIN
+    NEW.position := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_change_position BEFORE INSERT ON core_change
+FOR EACH ROW EXECUTE PROCEDURE core_change_set_position();
+'''
+
+# existing entries are committed, they are numbered in sequence order
+# below the current transaction id, sharing positions if there are more
+POSTGRESQL_EXISTING = '''
+UPDATE core_change SET position = numbered.position FROM (
+    SELECT seq, 1 + (row_number() OVER (ORDER BY seq) - 1)
+        * (txid_current() - 2)
+        / GREATEST(count(*) OVER (), txid_current() - 2) AS position
+    FROM core_change
+) AS numbered
+WHERE core_change.seq = numbered.seq;
+'''
+
+SQLITE_TRIGGER = '''
+CREATE TRIGGER core_change_position AFTER INSERT ON core_change
+BEGIN
+    UPDATE core_change SET position = NEW.seq WHERE seq = NEW.seq;
+END;
+'''
+
+
+def add_position_trigger(apps, schema_editor):
+    """
+    Set the position of existing entries, and of new ones from a trigger
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_EXISTING)
+        schema_editor.execute(POSTGRESQL_TRIGGER)
+    elif vendor == 'sqlite':
+        schema_editor.execute('UPDATE core_change SET position = seq')
+        schema_editor.execute(SQLITE_TRIGGER)
+
+
+def remove_position_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP TRIGGER core_change_position ON core_change',
+        )
+        schema_editor.execute('DROP FUNCTION core_change_set_position()')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TRIGGER core_change_position')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0011_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFloor',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('position', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='position',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='core_change_user_seq_idx',
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'position', 'seq'], name='core_change_user_position_idx'),
+        ),
+        migrations.RunPython(add_position_trigger, remove_position_trigger),
+    ]
@@ -2,6 +2,7 @@ import uuid
 import os
 
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -9,10 +10,13 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
 
 def recipe_image_file_path(instance, filename):
     """
-    Generate file path for a new recipe image
+    Generate file path for a new recipe image, which the storage renames
+    after its content within the same directory
     """
     ext = filename.split('.')[-1]
     filename = f'{uuid.uuid4()}.{ext}'
@@ -74,6 +78,16 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'name', 'id'),
+                name='core_tag_user_name_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -88,6 +102,16 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'name', 'id'),
+                name='core_ingredient_user_name_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -97,6 +121,15 @@ class Recipe(models.Model):
     """
     Recipe object
     """
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -107,7 +140,104 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # shared by the recipes with the same image, see core.blobs
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True,
+    )
+    # also touched when the tags or ingredients change, see core.signals
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # title, tag and ingredient names, kept current by core.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'id'),
+                name='core_recipe_user_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
+
+
+class Change(models.Model):
+    """
+    Entry of the log of changes to a user's tags, ingredients and recipes,
+    read by clients syncing from a position in the log
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    # no constraint, entries are written while the user is being deleted
+    # and removed afterwards, see core.signals
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    model = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=16, choices=ACTION_CHOICES)
+    # order in which clients read the log, set by a database trigger: the
+    # id of the inserting transaction on PostgreSQL, as sequence numbers
+    # become visible out of order when transactions commit, and the
+    # sequence number on SQLite, which commits one transaction at a time
+    position = models.BigIntegerField(null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('user', 'position', 'seq'),
+                name='core_change_user_position_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.seq} {self.action} {self.model} {self.object_id}'
+
+
+class ChangeFloor(models.Model):
+    """
+    Last position of the tombstones removed from a user's change log,
+    clients that synced up to an earlier position must start over
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    position = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.user_id} {self.position}'
+
+
+class ImageBlob(models.Model):
+    """
+    Stored recipe image, with the number of recipes using it. Images no
+    recipe uses any more are deleted along with their variants.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
@@ -0,0 +1,194 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.crypto import constant_time_compare
+
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_install_lock = threading.Lock()
+
+
+class QueryTimer:
+    """
+    Database wrapper, installed with `execute_wrapper`, counting and
+    timing the queries it runs
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    @contextmanager
+    def installed(self):
+        """
+        Time the queries of every database connection in the block
+        """
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(self))
+            yield self
+
+
+class RequestProfile(QueryTimer):
+    """
+    Timings collected while handling a request
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.serialize_time = 0.0
+        self.serialize_depth = 0
+
+
+def current_profile():
+    """
+    Return the profile of the request handled by this thread, if any
+    """
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def serializing():
+    """
+    Count the enclosed block as serialization time of the current request.
+    Serializers reading the data of other serializers count once.
+    """
+    profile = current_profile()
+    if profile is None:
+        yield
+        return
+
+    profile.serialize_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_depth -= 1
+        if not profile.serialize_depth:
+            profile.serialize_time += time.perf_counter() - start
+
+
+def _install_serializer_timing():
+    """
+    Time the serialization of outgoing data, which DRF performs when the
+    `data` of a serializer is first read. Installed only once profiling
+    is enabled, so disabled deployments run the stock property.
+    """
+    with _install_lock:
+        fget = BaseSerializer.data.fget
+        if getattr(fget, 'profiled', False):
+            return
+
+        def data(self):
+            with serializing():
+                return fget(self)
+
+        data.profiled = True
+        BaseSerializer.data = property(data)
+
+
+class ProfilingMiddleware:
+    """
+    Record the wall time, database queries, serialization time and
+    response size of each request, reported in `Server-Timing` headers
+    and a log line.
+
+    Requests sampled at PROFILING_SAMPLE_RATE, or sending the
+    PROFILING_SECRET in an `X-Profile` header, also run under cProfile,
+    with the stats written to PROFILING_DIR. The middleware removes itself
+    when PROFILING_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_serializer_timing()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        profiler = cProfile.Profile() if self._sampled(request) else None
+
+        _local.profile = profile
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(profile.installed())
+                if profiler is not None:
+                    profiler.enable()
+                    stack.callback(profiler.disable)
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - start
+
+        stats = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': profile.queries,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'serialize_ms': round(profile.serialize_time * 1000, 2),
+        }
+        if not response.streaming:
+            stats['size'] = len(response.content)
+        if profiler is not None:
+            stats['profile'] = self._dump(profiler, request)
+
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={stats["total_ms"]}',
+            f'db;dur={stats["db_ms"]};desc="{profile.queries} queries"',
+            f'serialize;dur={stats["serialize_ms"]}',
+        ))
+        logger.info(
+            ' '.join(f'{key}={value}' for key, value in stats.items()),
+            extra={'profile': stats},
+        )
+        return response
+
+    def _sampled(self, request):
+        """
+        Return whether to run the request under cProfile
+        """
+        secret = settings.PROFILING_SECRET
+        header = request.META.get('HTTP_X_PROFILE')
+        if secret and header and constant_time_compare(header, secret):
+            return True
+
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def _dump(self, profiler, request):
+        """
+        Write the stats of a profiled request, returning the file name
+        """
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        slug = re.sub(r'[^\w]+', '-', request.path).strip('-') or 'root'
+        path = os.path.join(
+            settings.PROFILING_DIR,
+            f'{time.time():.6f}-{request.method.lower()}-{slug}.prof',
+        )
+        profiler.dump_stats(path)
+
+        return path
@@ -0,0 +1,47 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson when it is installed, producing the
+    same JSON as JSONRenderer, although floats may be spelled differently,
+    e.g. 1e16 rather than 1e+16, and NaN and infinities render as null.
+    Values orjson cannot encode natively, such as Decimal, dates and lazy
+    strings, go through the encoder of JSONRenderer. Indented output, non
+    compact or ASCII only settings and data orjson rejects, such as
+    integers over 64 bits, fall back to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS
+                    | orjson.OPT_PASSTHROUGH_DATACLASS
+                    | orjson.OPT_PASSTHROUGH_DATETIME
+                ),
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # escaped like JSONRenderer, to keep the output a javascript subset
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028',
+        ).replace(
+            '\u2029'.encode(), b'\\u2029',
+        )
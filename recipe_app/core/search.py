@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connections, router
+from django.db.models import F, OuterRef, Subquery
+
+# fields of a recipe that are searched, with their tsvector weight
+WEIGHTS = (
+    ('title', 'A'),
+    ('tags__name', 'B'),
+    ('ingredients__name', 'B'),
+)
+# fields of the recipe itself among them
+RECIPE_FIELDS = frozenset(
+    field_name for field_name, _weight in WEIGHTS if '__' not in field_name
+)
+
+
+def is_supported(model):
+    """
+    Return whether the database of `model` supports full text search
+    """
+    alias = router.db_for_write(model)
+
+    return connections[alias].vendor == 'postgresql'
+
+
+def search_vector(model):
+    """
+    Return an expression computing the search vector of each recipe of
+    `model`, aggregating its tag and ingredient names in subqueries
+    """
+    vector = None
+    for field_name, weight in WEIGHTS:
+        if '__' in field_name:
+            expression = Subquery(
+                model.objects.filter(pk=OuterRef('pk')).values('pk').annotate(
+                    names=StringAgg(field_name, ' '),
+                ).values('names')
+            )
+        else:
+            expression = F(field_name)
+        part = SearchVector(
+            expression,
+            weight=weight,
+            config=settings.RECIPE_SEARCH_CONFIG,
+        )
+        vector = part if vector is None else vector + part
+
+    return vector
+
+
+def update_search_vectors(model, recipe_ids):
+    """
+    Recompute the stored search vector of the given recipes
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not is_supported(model):
+        return
+
+    model.objects.filter(pk__in=recipe_ids).update(
+        search_vector=search_vector(model),
+    )
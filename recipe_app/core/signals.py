@@ -0,0 +1,292 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core import blobs, changes, search
+from core.authentication import token_cache
+from core.cache import bump_user_version
+from core.models import Change, Ingredient, Recipe, Tag
+
+# sent after bulk writes, which skip the per object model signals
+bulk_saved = Signal(providing_args=['instances', 'created'])
+
+# recipe many to many fields by related model
+RECIPE_RELATED = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """
+    Drop cached tokens when a user changes, e.g. a profile or password
+    update
+    """
+    token_cache.delete_user(instance.pk)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_new_user_version(sender, instance, created, **kwargs):
+    """
+    Start new users on a fresh version, in case a cached version was left
+    behind by an earlier user with the same id
+    """
+    if created:
+        bump_user_version(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Drop a token from the cache once it is deleted
+    """
+    token_cache.delete(instance.key)
+
+
+@receiver(request_started)
+def check_persistent_connections(**kwargs):
+    """
+    Close persistent connections that stopped working since the last
+    request, for databases with CONN_HEALTH_CHECKS enabled. Pooled
+    connections are checked when taken from the pool instead, rather than
+    with a query on every request.
+    """
+    for conn in connections.all():
+        if (
+            conn.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not getattr(conn, 'pooled', False)
+            and conn.connection is not None
+            and not conn.is_usable()
+        ):
+            conn.close()
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    """
+    Remember the image a recipe was loaded with, to tell when it changes
+    """
+    # the raw name, the field file is only built when the image is read
+    name = instance.__dict__.get('image')
+    instance._saved_image = name if isinstance(name, str) and name else None
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_image(sender, instance, created, update_fields,
+                       **kwargs):
+    """
+    Count the recipes using each stored image as images are set or
+    replaced, deleting the images no recipe uses any more
+    """
+    if update_fields is not None and 'image' not in update_fields:
+        return
+
+    old = None if created else getattr(instance, '_saved_image', None)
+    new = instance.image.name or None
+    if new != old:
+        if new:
+            blobs.acquire(new)
+        if old:
+            blobs.release(old)
+        instance._saved_image = new
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """
+    Stop counting a deleted recipe using its image
+    """
+    if instance.image:
+        blobs.release(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    """
+    Recompute the search vector of a saved recipe, unless only fields that
+    are not searched were saved
+    """
+    if (
+        update_fields is not None
+        and not search.RECIPE_FIELDS.intersection(update_fields)
+    ):
+        return
+
+    search.update_search_vectors(Recipe, [instance.pk])
+
+
+def _recipes_changed(recipe_ids):
+    """
+    Mark recipes as modified, log the change and recompute their search
+    vectors, after their tags or ingredients changed
+    """
+    recipes = Recipe.objects.filter(pk__in=list(recipe_ids))
+    pairs = list(recipes.values_list('pk', 'user_id'))
+    if not pairs:
+        return
+
+    recipes.update(updated_at=timezone.now())
+    changes.record_changes(Recipe, pairs, Change.UPDATED)
+    search.update_search_vectors(Recipe, [pk for pk, _user_id in pairs])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_linked_recipes(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Refresh recipes whose tags or ingredients changed, from either side
+    of the relation
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _recipes_changed([instance.pk])
+    elif action == 'pre_clear':
+        # the cleared recipes cannot be looked up afterwards
+        instance._changed_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True),
+        )
+    elif action == 'post_clear':
+        _recipes_changed(getattr(instance, '_changed_recipe_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        _recipes_changed(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_recipes(sender, instance, created, **kwargs):
+    """
+    Refresh recipes using a renamed tag or ingredient
+    """
+    if not created:
+        _recipes_changed(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_recipes(sender, instance, **kwargs):
+    """
+    Remember the recipes of a tag or ingredient about to be deleted
+    """
+    instance._changed_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True),
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_recipes(sender, instance, **kwargs):
+    """
+    Refresh recipes that used a deleted tag or ingredient
+    """
+    _recipes_changed(getattr(instance, '_changed_recipe_ids', ()))
+
+
+@receiver(bulk_saved)
+def update_bulk_recipes(sender, instances, created, **kwargs):
+    """
+    Log the objects written by a bulk request and refresh the recipes
+    written, or whose tags and ingredients were renamed, by it. Written
+    recipes already carry their timestamps.
+    """
+    changes.record_instances(
+        instances,
+        Change.CREATED if created else Change.UPDATED,
+    )
+    if sender is Recipe:
+        search.update_search_vectors(
+            Recipe,
+            [instance.pk for instance in instances],
+        )
+    elif sender in RECIPE_RELATED and not created:
+        _recipes_changed(Recipe.objects.filter(**{
+            f'{RECIPE_RELATED[sender]}__in': instances,
+        }).values_list('pk', flat=True).distinct())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_saved_change(sender, instance, created, **kwargs):
+    """
+    Log a created or updated object for syncing clients
+    """
+    changes.record_instances(
+        [instance],
+        Change.CREATED if created else Change.UPDATED,
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_deleted_change(sender, instance, **kwargs):
+    """
+    Log a deleted object, so syncing clients can drop it
+    """
+    changes.record_instances([instance], Change.DELETED)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_changes(sender, instance, **kwargs):
+    """
+    Drop the change log of a deleted user, including the entries written
+    while their objects were deleted along with them
+    """
+    Change.objects.filter(user_id=instance.pk).delete()
+
+
+def _bump_after_commit(user_id):
+    """
+    Bump the version of a user now, so reads within the transaction see
+    the change, and again once committed, dropping responses that other
+    requests cached from the data as it was before the commit
+    """
+    bump_user_version(user_id)
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_owner_version(sender, instance, **kwargs):
+    """
+    Invalidate the cached responses of the owner of a changed object
+    """
+    _bump_after_commit(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_linked_owner_version(sender, instance, action, **kwargs):
+    """
+    Invalidate the cached responses of the owner of recipes whose tags or
+    ingredients changed
+    """
+    if action.startswith('post_'):
+        _bump_after_commit(instance.user_id)
+
+
+@receiver(bulk_saved)
+def bump_bulk_owner_versions(sender, instances, **kwargs):
+    """
+    Invalidate the cached responses of the owners of objects written by a
+    bulk request
+    """
+    for user_id in {instance.user_id for instance in instances}:
+        _bump_after_commit(user_id)
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import io
+import os
+import posixpath
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# extensions of the static files worth compressing, images and fonts other
+# than these are compressed already
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+}
+# smallest file compressed, and the largest compressed to original size
+# ratio kept
+COMPRESS_MIN_SIZE = 256
+COMPRESS_MAX_RATIO = 0.95
+
+
+def _gzip(data):
+    # without a timestamp, so collecting unchanged files gives the same bytes
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as file:
+        file.write(data)
+
+    return buffer.getvalue()
+
+
+def compress(data):
+    """
+    Return the encodings worth storing for some content, as (extension,
+    compressed content) pairs. Brotli is used when it is installed.
+    """
+    encoded = [('.gz', _gzip(data))]
+    if brotli is not None:
+        encoded.append(('.br', brotli.compress(data)))
+
+    return [
+        (extension, content) for extension, content in encoded
+        if len(content) <= len(data) * COMPRESS_MAX_RATIO
+    ]
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Static files storage naming collected files after a hash of their
+    content and storing gzip, and when available brotli, encodings next to
+    the text based ones, for the file views to send as they are.
+
+    Until collectstatic wrote a manifest the original names are used, so
+    running without collected files does not fail.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self._compress(name)
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+
+        return super().stored_name(name)
+
+    def _compress(self, name):
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+
+        for extension, content in compress(data):
+            path = f'{name}{extension}'
+            if self.exists(path):
+                self.delete(path)
+            self._save(path, ContentFile(content))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping each distinct content once. Files are
+    hashed while they are copied in, and named after their SHA-256 digest
+    below the directory of the requested name, with its extension, so
+    saving the same content again returns the existing file.
+
+    Stored files are tracked by ImageBlob rows, see core.blobs. The row of
+    a file is locked while it is written and until the transaction saving
+    it ends, so the file cannot be collected before a recipe uses it.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # the name is given by the content, see _save
+        return name
+
+    def _save(self, name, content):
+        # imported here, models use this storage
+        from core import blobs
+
+        directory, basename = posixpath.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.path(directory), prefix='.')
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            digest = digest.hexdigest()
+            name = posixpath.join(
+                directory, digest[:2], f'{digest}{extension}',
+            )
+            with transaction.atomic():
+                blobs.lock(name)
+                if self.exists(name):
+                    os.remove(temp)
+                else:
+                    os.makedirs(
+                        os.path.dirname(self.path(name)), exist_ok=True,
+                    )
+                    # temporary files are only readable by their owner
+                    os.chmod(temp, self.file_permissions_mode or 0o644)
+                    os.replace(temp, self.path(name))
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+        return name
@@ -0,0 +1,158 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache
+from utils.test_utils import sample_user
+
+ME_URL = reverse('user:me')
+
+
+class TokenCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        """
+        Test that the oldest unused entry is dropped when the cache is full
+        """
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('time.monotonic')
+    def test_entries_expire(self, monotonic):
+        """
+        Test that entries are not returned after their TTL
+        """
+        cache = TokenCache(max_size=2, ttl=60)
+        monotonic.return_value = 100
+        cache.set('a', 1)
+
+        monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 160
+        self.assertIsNone(cache.get('a'))
+
+    def test_shared_entries_not_kept_locally(self):
+        """
+        Test that entries of a shared cache are read from it every time,
+        so a deletion by another process is seen at once
+        """
+        caches['default'].clear()
+        cache = TokenCache(max_size=2, ttl=60, alias='default')
+        other = TokenCache(max_size=2, ttl=60, alias='default')
+        other.set('a', 1)
+
+        self.assertEqual(cache.get('a'), 1)
+        other.delete('a')
+        self.assertIsNone(cache.get('a'))
+
+    @override_settings(SERVER_PROCESSES=2)
+    def test_process_local_with_several_processes(self):
+        """
+        Test that nothing is cached in the memory of a process while other
+        processes serve requests
+        """
+        for cache in (
+            TokenCache(max_size=2, ttl=60),
+            TokenCache(max_size=2, ttl=60, alias='default'),
+        ):
+            cache.set('a', 1)
+            self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_lookup(self):
+        """
+        Test that a known token is not looked up again
+        """
+        self.client.get(ME_URL)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_user_update_invalidates_cache(self):
+        """
+        Test that requests see the user as updated through the API
+        """
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New name')
+
+    def test_inactive_user_invalidates_cache(self):
+        """
+        Test that a deactivated user can no longer authenticate
+        """
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidates_cache(self):
+        """
+        Test that a deleted token can no longer authenticate
+        """
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_token_refused_by_other_process(self):
+        """
+        Test that a token deleted in one process is refused by another
+        process sharing the token cache
+        """
+        caches['default'].clear()
+        first = TokenCache(max_size=10, ttl=60, alias='default')
+        second = TokenCache(max_size=10, ttl=60, alias='default')
+        for cache in (first, second):
+            with self.serving(cache):
+                res = self.client.get(ME_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.serving(first):
+            self.token.delete()
+        with self.serving(second):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @contextmanager
+    def serving(self, cache):
+        """
+        Serve requests with a token cache, as another process would
+        """
+        with patch('core.authentication.token_cache', cache):
+            with patch('core.signals.token_cache', cache):
+                yield
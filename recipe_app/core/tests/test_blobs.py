@@ -0,0 +1,232 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import blobs
+from core.models import ImageBlob, Recipe
+from recipe import images
+from utils.test_utils import sample_recipe, sample_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def sample_image(color='red'):
+    """
+    Return the bytes of a small JPEG image
+    """
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color=color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def run_on_commit(func):
+    # test transactions are never committed
+    func()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageBlobTests(TestCase):
+    """
+    Test storing recipe images once per content
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = sample_user()
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def references(self, name):
+        return ImageBlob.objects.get(name=name).references
+
+    def test_named_after_content(self):
+        """
+        Test that images are named after the digest of their content
+        """
+        data = sample_image()
+        recipe = sample_recipe(self.user)
+
+        recipe.image.save('Photo.JPG', ContentFile(data))
+
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(
+            recipe.image.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg',
+        )
+        with recipe.image.open('rb') as file:
+            self.assertEqual(file.read(), data)
+
+    def test_same_content_stored_once(self):
+        """
+        Test that recipes with the same image share one file, counted for
+        each of them
+        """
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        other = sample_recipe(self.user)
+
+        first.image.save('a.jpg', ContentFile(sample_image()))
+        second.image.save('b.jpg', ContentFile(sample_image()))
+        other.image.save('c.jpg', ContentFile(sample_image('blue')))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertEqual(self.references(other.image.name), 1)
+        directory = os.path.dirname(self.storage.path(first.image.name))
+        self.assertEqual(
+            [name for name in os.listdir(directory) if name.endswith('.jpg')],
+            [os.path.basename(first.image.name)],
+        )
+
+    @patch.object(transaction, 'on_commit', run_on_commit)
+    def test_replaced_image_collected(self):
+        """
+        Test that a replaced image is deleted with its variants once no
+        recipe uses it
+        """
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        first.image.save('a.jpg', ContentFile(sample_image()))
+        second.image.save('a.jpg', ContentFile(sample_image()))
+        old = first.image.name
+        images.process_recipe_image(first.id)
+        variant = images.variant_path(old, 'thumbnail', 'jpeg')
+        self.assertTrue(default_storage.exists(variant))
+
+        first.image.save('b.jpg', ContentFile(sample_image('blue')))
+
+        self.assertEqual(self.references(old), 1)
+        self.assertTrue(self.storage.exists(old))
+
+        second = Recipe.objects.get(pk=second.pk)
+        second.image = None
+        second.save()
+
+        self.assertFalse(ImageBlob.objects.filter(name=old).exists())
+        self.assertFalse(self.storage.exists(old))
+        self.assertFalse(default_storage.exists(variant))
+        self.assertEqual(self.references(first.image.name), 1)
+
+    @patch.object(transaction, 'on_commit', run_on_commit)
+    def test_deleted_recipe_image_collected(self):
+        """
+        Test that the image of a deleted recipe is deleted with it
+        """
+        recipe = sample_recipe(self.user)
+        recipe.image.save('a.jpg', ContentFile(sample_image()))
+        name = recipe.image.name
+
+        Recipe.objects.filter(pk=recipe.pk).delete()
+
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+
+    def test_collect_keeps_used_images(self):
+        """
+        Test that collecting only deletes the images no recipe uses
+        """
+        recipe = sample_recipe(self.user)
+        recipe.image.save('a.jpg', ContentFile(sample_image()))
+        unused = self.storage.save('uploads/recipe/b.jpg', ContentFile(
+            sample_image('blue'),
+        ))
+
+        deleted = blobs.collect()
+
+        self.assertEqual(deleted, [unused])
+        self.assertFalse(self.storage.exists(unused))
+        self.assertTrue(self.storage.exists(recipe.image.name))
+
+    def test_variants_shared(self):
+        """
+        Test that variants rendered for an image are reused by the other
+        recipes with the same image
+        """
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        first.image.save('a.jpg', ContentFile(sample_image()))
+        second.image.save('b.jpg', ContentFile(sample_image()))
+        images.process_recipe_image(first.id)
+
+        with patch('recipe.images.render_variants') as render:
+            images.process_recipe_image(second.id)
+
+        render.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image_status, Recipe.IMAGE_READY)
+
+    def test_recount(self):
+        """
+        Test that counts are corrected from the recipes using each image
+        """
+        recipe = sample_recipe(self.user)
+        recipe.image.save('a.jpg', ContentFile(sample_image()))
+        ImageBlob.objects.filter(name=recipe.image.name).update(references=5)
+        sample_recipe(self.user, image='uploads/recipe/legacy.jpg')
+        ImageBlob.objects.filter(name='uploads/recipe/legacy.jpg').delete()
+
+        corrected = blobs.recount()
+
+        self.assertEqual(corrected, 2)
+        self.assertEqual(self.references(recipe.image.name), 1)
+        self.assertEqual(self.references('uploads/recipe/legacy.jpg'), 1)
+
+    def test_collect_images_command(self):
+        """
+        Test that the command deletes unused images and old stray files
+        """
+        recipe = sample_recipe(self.user)
+        recipe.image.save('a.jpg', ContentFile(sample_image()))
+        unused = self.storage.save('uploads/recipe/b.jpg', ContentFile(
+            sample_image('blue'),
+        ))
+        stray = default_storage.save(
+            'uploads/recipe/stray.jpg', ContentFile(b'stray'),
+        )
+        recent = default_storage.save(
+            'uploads/recipe/recent.jpg', ContentFile(b'recent'),
+        )
+        hour_ago = time.time() - 7200
+        os.utime(default_storage.path(stray), (hour_ago, hour_ago))
+
+        call_command('collect_images', grace=3600, stdout=io.StringIO())
+
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertFalse(self.storage.exists(unused))
+        self.assertFalse(default_storage.exists(stray))
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_collect_images_keeps_untracked_recipe_images(self):
+        """
+        Test that the command tracks the image of a recipe missing its row
+        again rather than deleting it as a stray file
+        """
+        recipe = sample_recipe(self.user)
+        recipe.image.save('a.jpg', ContentFile(sample_image()))
+        name = recipe.image.name
+        ImageBlob.objects.filter(name=name).delete()
+        hour_ago = time.time() - 7200
+        os.utime(self.storage.path(name), (hour_ago, hour_ago))
+
+        out = io.StringIO()
+        call_command('collect_images', grace=3600, dry_run=True, stdout=out)
+        self.assertIn('0 stray files', out.getvalue())
+
+        call_command('collect_images', grace=3600, stdout=io.StringIO())
+
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.references(name), 1)
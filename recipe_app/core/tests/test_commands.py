@@ -1,26 +1,87 @@
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core.management.commands.wait_for_db import EXIT_TIMEOUT
+
+ENSURE_CONNECTION = (
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+)
+
 
 class CommandTests(TestCase):
+    def setUp(self):
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+
+    def call_command(self, *args, **options):
+        call_command(
+            *args, stdout=self.stdout, stderr=self.stderr, **options,
+        )
+
     def test_wait_for_db_ready(self):
         """
         Test that django waits for the db to be available
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch(ENSURE_CONNECTION) as ec:
+            self.call_command('wait_for_db')
+            self.assertEqual(ec.call_count, 1)
+
+        self.assertIn('Connected!', self.stdout.getvalue())
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
         """
         Test that django waits for the db to be available after 6 times
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            self.call_command('wait_for_db')
+            self.assertEqual(ec.call_count, 6)
+
+        output = self.stdout.getvalue()
+        self.assertEqual(
+            output.count("Database 'default' unavailable"), 5,
+        )
+        self.assertIn('Connected!', output)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backs_off(self, ts):
+        """
+        Test that the delay between attempts grows up to the maximum
+        """
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            self.call_command('wait_for_db', delay=1, max_delay=4)
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        bounds = [(0.5, 1), (1, 2), (2, 4), (2, 4), (2, 4)]
+        for delay, (low, high) in zip(delays, bounds):
+            self.assertTrue(low <= delay <= high)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """
+        Test that the command exits with the timeout status
+        """
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = OperationalError
+            with self.assertRaises(SystemExit) as cm:
+                self.call_command('wait_for_db', timeout=0.01)
+
+        self.assertEqual(cm.exception.code, EXIT_TIMEOUT)
+        self.assertIn(
+            'Timed out waiting for database', self.stderr.getvalue(),
+        )
+        self.assertNotIn('Connected!', self.stdout.getvalue())
+
+    def test_wait_for_db_unknown_alias(self):
+        """
+        Test that unknown database aliases are rejected
+        """
+        with self.assertRaises(CommandError):
+            self.call_command('wait_for_db', databases=['missing'])
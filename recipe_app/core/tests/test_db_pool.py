@@ -0,0 +1,160 @@
+from unittest import skipUnless
+from unittest.mock import MagicMock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.db.backends.postgresql_pool.base import (
+    DatabaseWrapper,
+    close_pools,
+)
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.metrics import REGISTRY
+
+
+def fake_connection():
+    """
+    Return a stand-in for an open, idle psycopg2 connection
+    """
+    conn = MagicMock(closed=0)
+    conn.get_transaction_status.return_value = (
+        extensions.TRANSACTION_STATUS_IDLE
+    )
+    return conn
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connections_are_reused(self):
+        """
+        Test that a returned connection is handed out again
+        """
+        connect = MagicMock(side_effect=fake_connection)
+        pool = ConnectionPool(connect, max_size=2)
+
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(connect.call_count, 1)
+
+    def test_fill_opens_min_size(self):
+        """
+        Test that the minimum number of connections is opened up front
+        """
+        connect = MagicMock(side_effect=fake_connection)
+        pool = ConnectionPool(connect, min_size=2, max_size=3)
+
+        pool.fill()
+        pool.getconn()
+        pool.getconn()
+
+        self.assertEqual(connect.call_count, 2)
+        self.assertEqual(pool.stats()['size'], 2)
+
+    def test_checked_connections_left_idle(self):
+        """
+        Test that the health check leaves no transaction open on the
+        connections it checked
+        """
+        pool = ConnectionPool(fake_connection, max_size=1, check=True)
+        conn = pool.getconn()
+        conn.autocommit = False
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        conn.cursor.return_value.__enter__.return_value.execute \
+            .assert_called_once_with('SELECT 1')
+        conn.rollback.assert_called_once_with()
+
+    def test_exhausted_pool_times_out(self):
+        """
+        Test that waiting for a connection gives up after the timeout
+        """
+        pool = ConnectionPool(fake_connection, max_size=1, timeout=0.01)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_closed_connections_are_replaced(self):
+        """
+        Test that a connection closed while idle is not handed out
+        """
+        pool = ConnectionPool(fake_connection, max_size=1)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.closed = 1
+
+        self.assertIsNot(pool.getconn(), conn)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_connections_in_transaction_are_rolled_back(self):
+        """
+        Test that a connection is returned without an open transaction
+        """
+        pool = ConnectionPool(fake_connection, max_size=1)
+        conn = pool.getconn()
+        conn.get_transaction_status.side_effect = [
+            extensions.TRANSACTION_STATUS_INTRANS,
+            extensions.TRANSACTION_STATUS_IDLE,
+        ]
+
+        pool.putconn(conn)
+
+        conn.rollback.assert_called_once_with()
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_idle_connections_pruned_to_min_size(self):
+        """
+        Test that connections idle for too long are closed above min size
+        """
+        pool = ConnectionPool(
+            fake_connection, min_size=1, max_size=3, max_idle=-1,
+        )
+        conns = [pool.getconn() for _ in range(3)]
+        for conn in conns:
+            pool.putconn(conn)
+
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(sum(conn.close.called for conn in conns), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'The pool needs PostgreSQL')
+class PooledBackendTests(SimpleTestCase):
+    def test_checkout_metrics(self):
+        """
+        Test that checkouts are timed and the connections of the pool are
+        reported by state
+        """
+        settings_dict = dict(
+            connection.settings_dict,
+            ENGINE='core.db.backends.postgresql_pool',
+            POOL={'MIN_SIZE': 2},
+        )
+        wrapper = DatabaseWrapper(settings_dict, alias='pooled')
+        try:
+            wrapper.ensure_connection()
+            totals = REGISTRY.collect()
+            self.assertEqual(
+                totals['db_pool_connections'][('pooled', 'in_use')], 1,
+            )
+            self.assertEqual(
+                totals['db_pool_connections'][('pooled', 'idle')], 1,
+            )
+            self.assertGreater(
+                totals['db_pool_checkout_seconds'][('pooled',)][-1], 0,
+            )
+
+            wrapper.close()
+            totals = REGISTRY.collect()
+            self.assertEqual(
+                totals['db_pool_connections'][('pooled', 'idle')], 2,
+            )
+        finally:
+            wrapper.close()
+            close_pools(settings_dict['NAME'])
@@ -0,0 +1,268 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from core import views
+from core.storage import CompressedManifestStaticFilesStorage
+from recipe_app.urls import file_pattern
+
+CSS = b'body { color: #333; }\n' * 50
+IMAGE = bytes(range(256)) * 4
+HASHED_CSS = 'css/site.0123456789ab.css'
+
+urlpatterns = [
+    file_pattern(settings.STATIC_URL, views.static_file, 'static'),
+    file_pattern(settings.MEDIA_URL, views.media_file, 'media'),
+]
+
+
+class FileViewTests(SimpleTestCase):
+    """
+    Test serving static and media files
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.static_root = os.path.join(self.root, 'static')
+        self.media_root = os.path.join(self.root, 'media')
+        os.makedirs(os.path.join(self.static_root, 'css'))
+        os.makedirs(os.path.join(self.media_root, 'uploads'))
+        for name in ('css/site.css', HASHED_CSS):
+            with open(os.path.join(self.static_root, name), 'wb') as file:
+                file.write(CSS)
+        with open(
+            os.path.join(self.static_root, f'{HASHED_CSS}.gz'), 'wb',
+        ) as file:
+            file.write(gzip.compress(CSS))
+        self.image_path = os.path.join(self.media_root, 'uploads/photo.jpg')
+        with open(self.image_path, 'wb') as file:
+            file.write(IMAGE)
+
+        # routed here whether SERVE_FILES is on or not
+        settings = override_settings(
+            ROOT_URLCONF=__name__,
+            STATIC_ROOT=self.static_root,
+            MEDIA_ROOT=self.media_root,
+            FILE_MAX_AGE=60,
+            HASHED_FILE_MAX_AGE=1000,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_hashed_static_file(self):
+        """
+        Test that static files named after their content are cached for
+        good and sent compressed to clients accepting it
+        """
+        res = self.client.get(
+            f'/static/{HASHED_CSS}', HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res['Cache-Control'], 'public, max-age=1000, immutable',
+        )
+        self.assertEqual(res['Content-Type'], 'text/css')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(res.streaming_content)), CSS)
+
+    def test_static_file(self):
+        """
+        Test that other static files are cached for a while, and sent as
+        they are to clients not accepting compression
+        """
+        res = self.client.get('/static/css/site.css')
+
+        self.assertEqual(res['Cache-Control'], 'public, max-age=60')
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(int(res['Content-Length']), len(CSS))
+        self.assertEqual(b''.join(res.streaming_content), CSS)
+
+    def test_media_file(self):
+        """
+        Test serving an uploaded file with its validators
+        """
+        res = self.client.get('/media/uploads/photo.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertEqual(
+            res['Last-Modified'],
+            http_date(os.stat(self.image_path).st_mtime),
+        )
+        self.assertEqual(b''.join(res.streaming_content), IMAGE)
+
+    def test_not_modified(self):
+        """
+        Test that unchanged files are answered with 304 responses
+        """
+        res = self.client.get('/media/uploads/photo.jpg')
+
+        by_date = self.client.get(
+            '/media/uploads/photo.jpg',
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+        by_etag = self.client.get(
+            '/media/uploads/photo.jpg', HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(by_date.status_code, 304)
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_etag['ETag'], res['ETag'])
+
+    def test_modified(self):
+        """
+        Test that files changed since the given date are sent again
+        """
+        res = self.client.get(
+            '/media/uploads/photo.jpg',
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                os.stat(self.image_path).st_mtime - 60,
+            ),
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_range(self):
+        """
+        Test that byte ranges are sent as partial content
+        """
+        res = self.client.get(
+            '/media/uploads/photo.jpg', HTTP_RANGE='bytes=10-19',
+        )
+        suffix = self.client.get(
+            '/media/uploads/photo.jpg', HTTP_RANGE='bytes=-5',
+        )
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res['Content-Range'], f'bytes 10-19/{len(IMAGE)}')
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(b''.join(res.streaming_content), IMAGE[10:20])
+        self.assertEqual(b''.join(suffix.streaming_content), IMAGE[-5:])
+
+    def test_range_not_satisfiable(self):
+        """
+        Test that ranges past the end of the file are rejected
+        """
+        res = self.client.get(
+            '/media/uploads/photo.jpg', HTTP_RANGE=f'bytes={len(IMAGE)}-',
+        )
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(IMAGE)}')
+
+    def test_if_range_changed(self):
+        """
+        Test that the whole file is sent when it changed since the range
+        was requested
+        """
+        res = self.client.get(
+            '/media/uploads/photo.jpg',
+            HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE='"stale"',
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(int(res['Content-Length']), len(IMAGE))
+
+    def test_head(self):
+        """
+        Test that HEAD requests get the headers alone
+        """
+        res = self.client.head('/media/uploads/photo.jpg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(int(res['Content-Length']), len(IMAGE))
+        self.assertEqual(res.content, b'')
+
+    def test_not_found(self):
+        """
+        Test that missing files, directories and paths outside the root
+        are not served
+        """
+        for path in (
+            '/media/uploads/missing.jpg',
+            '/media/uploads',
+            '/media/../static/css/site.css',
+            '/media/%2e%2e/static/css/site.css',
+        ):
+            res = self.client.get(path)
+            self.assertEqual(res.status_code, 404, path)
+
+    def test_post_rejected(self):
+        """
+        Test that files are only served to safe methods
+        """
+        res = self.client.post('/media/uploads/photo.jpg')
+
+        self.assertEqual(res.status_code, 405)
+
+
+class CompressedManifestStorageTests(SimpleTestCase):
+    """
+    Test the static files storage
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        source = os.path.join(self.root, 'source')
+        os.makedirs(os.path.join(source, 'css'))
+        files = {
+            'css/site.css': CSS + b'.logo { background: url("logo.png"); }',
+            'css/logo.png': IMAGE,
+            'css/small.css': b'a { color: red; }',
+        }
+        for name, content in files.items():
+            with open(os.path.join(source, name), 'wb') as file:
+                file.write(content)
+
+        self.source = FileSystemStorage(location=source)
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=os.path.join(self.root, 'static'),
+            base_url='/static/',
+        )
+        self.paths = {name: (self.source, name) for name in files}
+        for name in files:
+            with self.source.open(name) as file:
+                self.storage.save(name, file)
+
+    def test_post_process(self):
+        """
+        Test that collected files are hashed, and text files compressed
+        """
+        list(self.storage.post_process(self.paths))
+
+        hashed = self.storage.stored_name('css/site.css')
+        self.assertNotEqual(hashed, 'css/site.css')
+        self.assertTrue(self.storage.exists(f'{hashed}.gz'))
+        self.assertTrue(self.storage.exists('css/site.css.gz'))
+        with self.storage.open(f'{hashed}.gz') as file:
+            content = gzip.decompress(file.read())
+        # references are rewritten to the hashed names
+        self.assertIn(
+            os.path.basename(self.storage.stored_name('css/logo.png')),
+            content.decode(),
+        )
+        # images and files too small to gain from it are left alone
+        self.assertFalse(self.storage.exists(
+            f'{self.storage.stored_name("css/logo.png")}.gz',
+        ))
+        self.assertFalse(self.storage.exists('css/small.css.gz'))
+
+    def test_no_manifest(self):
+        """
+        Test that the original names are used until files are collected
+        """
+        self.assertEqual(
+            self.storage.url('css/site.css'), '/static/css/site.css',
+        )
@@ -0,0 +1,253 @@
+import fnmatch
+import json
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.metrics import (
+    AGGREGATE_FILE,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+)
+from utils.test_utils import sample_user
+
+METRICS_URL = reverse('metrics')
+METRICS_AUTHORIZATION = 'Bearer s3cret'
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def metric_value(name, key):
+    """
+    Return the current value of a metric of the global registry
+    """
+    return REGISTRY.collect()[name].get(key)
+
+
+class RegistryTests(TestCase):
+    """
+    Test the metrics registry
+    """
+
+    def setUp(self):
+        self.registry = Registry()
+        self.counter = Counter(
+            'jobs_total', 'Jobs run', ('kind',), registry=self.registry,
+        )
+        self.histogram = Histogram(
+            'job_seconds', 'Job time', registry=self.registry,
+            buckets=(1, 5),
+        )
+
+    def test_expose(self):
+        """
+        Test the text exposition of counters and histograms
+        """
+        self.counter.inc(kind='a "quoted" kind')
+        self.counter.inc(2, kind='a "quoted" kind')
+        for value in (0.5, 1, 3, 10):
+            self.histogram.observe(value)
+
+        lines = self.registry.expose().splitlines()
+
+        self.assertEqual(lines, [
+            '# HELP jobs_total Jobs run',
+            '# TYPE jobs_total counter',
+            'jobs_total{kind="a \\"quoted\\" kind"} 3.0',
+            '# HELP job_seconds Job time',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{le="1.0"} 2.0',
+            'job_seconds_bucket{le="5.0"} 3.0',
+            'job_seconds_bucket{le="+Inf"} 4.0',
+            'job_seconds_sum 14.5',
+            'job_seconds_count 4.0',
+        ])
+
+    def test_gauge(self):
+        """
+        Test that gauges expose their last value, added up over processes
+        """
+        gauge = Gauge(
+            'jobs_running', 'Jobs running', ('kind',), registry=self.registry,
+        )
+        gauge.set(4, kind='a')
+        gauge.set(2, kind='a')
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, '1-1.json'), 'w') as f:
+                json.dump({'jobs_running': [[['a'], 3]]}, f)
+            lines = self.registry.expose(directory).splitlines()
+
+        self.assertIn('# TYPE jobs_running gauge', lines)
+        self.assertIn('jobs_running{kind="a"} 5.0', lines)
+
+    def test_labels_required(self):
+        """
+        Test that values must be given every label of their metric
+        """
+        with self.assertRaises(ValueError):
+            self.counter.inc()
+
+    def test_duplicate_metric(self):
+        """
+        Test that metric names are registered once
+        """
+        with self.assertRaises(ValueError):
+            Counter('jobs_total', 'Jobs run', registry=self.registry)
+
+    def test_processes_added_up(self):
+        """
+        Test that the values written by other processes are added up with
+        the values of this one
+        """
+        self.counter.inc(kind='a')
+        self.histogram.observe(3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.registry.flush(directory)
+            [name] = fnmatch.filter(os.listdir(directory), '*.json')
+            self.assertTrue(name.startswith(f'{os.getpid()}-'))
+            with open(os.path.join(directory, name)) as f:
+                other = json.load(f)
+            with open(os.path.join(directory, '1.json'), 'w') as f:
+                json.dump(other, f)
+            self.counter.inc(kind='b')
+
+            totals = self.registry.collect(directory)
+
+        self.assertEqual(totals['jobs_total'], {('a',): 2, ('b',): 1})
+        self.assertEqual(totals['job_seconds'], {(): [0, 2, 0, 6]})
+
+    def test_retire(self):
+        """
+        Test that a stopping process moves its values to the aggregate
+        file once, keeping the totals served by the other processes
+        """
+        other = Registry()
+        Counter('jobs_total', 'Jobs run', ('kind',), registry=other)
+        Gauge('jobs_running', 'Jobs running', registry=other)
+        gauge = Gauge('jobs_running', 'Jobs running', registry=self.registry)
+        self.counter.inc(kind='a')
+        gauge.set(3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.registry.flush(directory)
+            self.registry.retire(directory)
+            self.counter.inc(kind='a')
+            self.registry.retire(directory)
+            self.registry.retire(directory)
+
+            files = fnmatch.filter(os.listdir(directory), '*.json')
+            totals = other.collect(directory)
+
+        self.assertEqual(files, [AGGREGATE_FILE])
+        self.assertEqual(totals['jobs_total'], {('a',): 2})
+        # gauges describe running processes only
+        self.assertEqual(totals['jobs_running'], {})
+        self.assertEqual(self.registry.collect()['jobs_total'], {})
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='s3cret')
+class MetricsEndpointTests(TestCase):
+    """
+    Test the metrics middleware and endpoint
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        token_cache.clear()
+
+    def test_request_metrics(self):
+        """
+        Test that requests are recorded by viewset and action
+        """
+        key = ('RecipeViewSet', 'list')
+        before = metric_value('db_queries_total', key) or 0
+        self.client.force_authenticate(self.user)
+
+        self.client.get(RECIPES_URL)
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION=METRICS_AUTHORIZATION,
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="RecipeViewSet",action="list"}',
+            res.content.decode(),
+        )
+        self.assertIn(
+            'http_responses_total'
+            '{view="RecipeViewSet",action="list",status="200"}',
+            res.content.decode(),
+        )
+        self.assertGreater(metric_value('db_queries_total', key), before)
+
+    def test_token_cache_lookups(self):
+        """
+        Test that token cache hits and misses are counted
+        """
+        token = Token.objects.create(user=self.user)
+        misses = metric_value('auth_token_cache_lookups_total', ('miss',))
+        hits = metric_value('auth_token_cache_lookups_total', ('hit',))
+
+        for _ in range(2):
+            self.client.get(
+                RECIPES_URL,
+                HTTP_AUTHORIZATION=f'Token {token.key}',
+            )
+
+        self.assertEqual(
+            metric_value('auth_token_cache_lookups_total', ('miss',)),
+            (misses or 0) + 1,
+        )
+        self.assertEqual(
+            metric_value('auth_token_cache_lookups_total', ('hit',)),
+            (hits or 0) + 1,
+        )
+
+    def test_token_required(self):
+        """
+        Test that the metrics token is required when set
+        """
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 401)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, 401)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION=METRICS_AUTHORIZATION,
+        )
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_token_unset(self):
+        """
+        Test that metrics are only served without a token in DEBUG
+        """
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 401)
+
+        with self.settings(DEBUG=True):
+            res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """
+        Test that the endpoint is not served when metrics are disabled
+        """
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 404)
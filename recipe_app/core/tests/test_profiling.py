@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.profiling import current_profile
+from utils.test_utils import sample_user, sample_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    """
+    Test the request profiling middleware
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        sample_recipe(user=self.user)
+
+    def test_server_timing(self):
+        """
+        Test that responses report their timings and query count
+        """
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            res = self.client.get(RECIPES_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        stats = logs.records[0].profile
+        self.assertEqual(stats['path'], RECIPES_URL)
+        self.assertEqual(stats['status'], 200)
+        self.assertEqual(stats['size'], len(res.content))
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['serialize_ms'], 0)
+        self.assertNotIn('profile', stats)
+        self.assertIsNone(current_profile())
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """
+        Test that requests are not profiled when profiling is disabled
+        """
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_profile_requested_by_header(self):
+        """
+        Test that requests sending the secret are run under cProfile
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                PROFILING_SECRET='s3cret',
+                PROFILING_DIR=directory,
+            ), self.assertLogs('core.profiling', 'INFO') as logs:
+                self.client.get(RECIPES_URL, HTTP_X_PROFILE='wrong')
+                self.client.get(RECIPES_URL, HTTP_X_PROFILE='s3cret')
+
+            self.assertNotIn('profile', logs.records[0].profile)
+            path = logs.records[1].profile['profile']
+            self.assertEqual(os.listdir(directory), [os.path.basename(path)])
+            self.assertGreater(os.path.getsize(path), 0)
+
+    def test_profile_sampled(self):
+        """
+        Test that requests are run under cProfile at the sample rate
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                PROFILING_SAMPLE_RATE=1.0,
+                PROFILING_DIR=directory,
+            ), self.assertLogs('core.profiling', 'INFO'):
+                self.client.get(RECIPES_URL)
+
+            self.assertEqual(len(os.listdir(directory)), 1)
@@ -0,0 +1,136 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core import parsers, renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+DATA = {
+    'price': Decimal('10.50'),
+    'created_at': datetime.datetime(
+        2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc,
+    ),
+    'day': datetime.date(2020, 1, 2),
+    'title': 'Crème brûlée\u2028with a line separator',
+    'label': gettext_lazy('Recipe'),
+    'tags': (1, 2),
+    'nested': [{'a': None, 'b': True, 'c': 1.5}],
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_matches_json_renderer(self):
+        """
+        Test that the output is byte identical to JSONRenderer for floats
+        written without an exponent
+        """
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, 'application/json'),
+            JSONRenderer().render(DATA, 'application/json'),
+        )
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_floats(self):
+        """
+        Test that floats encode to the same values as with JSONRenderer
+        """
+        data = {'floats': [1e16, 1.5e-7, 0.1, -2.5, 1e300]}
+
+        rendered = FastJSONRenderer().render(data, 'application/json')
+
+        self.assertEqual(
+            json.loads(rendered),
+            json.loads(JSONRenderer().render(data, 'application/json')),
+        )
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_big_integers(self):
+        """
+        Test that integers orjson cannot encode fall back to JSONRenderer
+        """
+        data = {'ids': [2 ** 64, -2 ** 70]}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json'),
+            JSONRenderer().render(data, 'application/json'),
+        )
+
+    def test_matches_json_renderer_without_orjson(self):
+        """
+        Test that the renderer falls back to the standard library
+        """
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(
+                FastJSONRenderer().render(DATA, 'application/json'),
+                JSONRenderer().render(DATA, 'application/json'),
+            )
+
+    def test_indented_output(self):
+        """
+        Test that indented output is rendered as JSONRenderer does
+        """
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, media_type),
+            JSONRenderer().render(DATA, media_type),
+        )
+
+    def test_render_none(self):
+        """
+        Test that no data renders an empty body
+        """
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def parse(self, body, encoding='utf-8'):
+        return FastJSONParser().parse(
+            io.BytesIO(body),
+            'application/json',
+            {'encoding': encoding},
+        )
+
+    def test_parse_body(self):
+        """
+        Test that a JSON body is parsed
+        """
+        data = self.parse('{"title": "Crème", "price": 10.5}'.encode())
+
+        self.assertEqual(data, {'title': 'Crème', 'price': 10.5})
+
+    def test_parse_body_without_orjson(self):
+        """
+        Test that the parser falls back to the standard library
+        """
+        with patch.object(parsers, 'orjson', None):
+            data = self.parse(b'[1, 2]')
+
+        self.assertEqual(data, [1, 2])
+
+    def test_parse_other_encodings(self):
+        """
+        Test that bodies in other encodings are decoded first
+        """
+        data = self.parse('{"title": "Crème"}'.encode('latin-1'), 'latin-1')
+
+        self.assertEqual(data, {'title': 'Crème'})
+
+    def test_parse_invalid_body(self):
+        """
+        Test that invalid JSON is reported as a parse error
+        """
+        with self.assertRaises(ParseError):
+            self.parse(b'{"title": ')
@@ -1,3 +1,59 @@
-# from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET, require_safe
 
-# Create your views here.
+from core import files
+from core.metrics import REGISTRY
+
+
+@require_GET
+def metrics(request):
+    """
+    Serve the metrics of every worker in the Prometheus text format,
+    requiring the METRICS_TOKEN as a bearer token unless in DEBUG without
+    a token set
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+
+    token = settings.METRICS_TOKEN
+    if token or not settings.DEBUG:
+        authorization = request.META.get('HTTP_AUTHORIZATION', '')
+        # without a token nothing is served outside DEBUG
+        if not token or not constant_time_compare(
+                authorization, f'Bearer {token}'):
+            return HttpResponse(status=401)
+
+    return HttpResponse(
+        REGISTRY.expose(settings.METRICS_DIR),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@require_safe
+def static_file(request, path):
+    """
+    Serve a collected static file, caching names that include a hash of
+    their content for good and sending precompressed encodings
+    """
+    hashed = files.is_hashed(path)
+
+    return files.serve(
+        request,
+        path,
+        settings.STATIC_ROOT,
+        settings.HASHED_FILE_MAX_AGE if hashed else settings.FILE_MAX_AGE,
+        immutable=hashed,
+        precompressed=True,
+    )
+
+
+@require_safe
+def media_file(request, path):
+    """
+    Serve an uploaded file
+    """
+    return files.serve(
+        request, path, settings.MEDIA_ROOT, settings.FILE_MAX_AGE,
+    )
@@ -0,0 +1,80 @@
+"""
+Gunicorn configuration for production, read by gunicorn from the current
+directory, e.g. `gunicorn recipe_app.wsgi` (WSGI) or
+`WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn recipe_app.asgi`
+(ASGI). Every setting can be changed through the environment.
+
+The application is imported once in the master process and workers are
+forked from it, sharing its memory copy-on-write. Workers are recycled
+after a number of requests, with some jitter so they do not all restart
+at the same time.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(
+    os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1),
+)
+# read by the settings, see RESPONSE_CACHE_ALIAS
+os.environ['SERVER_PROCESSES'] = str(workers)
+# threads per worker, more than one selects the threaded worker
+threads = int(os.environ.get('WEB_THREADS', 1))
+worker_class = os.environ.get(
+    'WEB_WORKER_CLASS', 'gthread' if threads > 1 else 'sync',
+)
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+errorlog = '-'
+# worker heartbeats go to memory rather than a possibly slow disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+if preload_app:
+    # objects created while importing the application are left to the
+    # master, collecting them would touch and copy their pages in workers
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    """
+    Import the views along with the application, which Django otherwise
+    leaves to the first request of each worker, leave no database
+    connection for workers to inherit, and move the objects of the master
+    out of reach of the garbage collector, which keeps collecting what the
+    master allocates afterwards
+    """
+    if not server.cfg.preload_app:
+        return
+
+    from django.db import connections
+    from django.urls import get_resolver
+    from core.db.backends.postgresql_pool.base import close_pools
+
+    get_resolver().url_patterns
+    connections.close_all()
+    close_pools()
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def worker_exit(server, worker):
+    """
+    Move the metrics of a stopping worker to the aggregate the other
+    workers serve along with their own
+    """
+    from django.conf import settings
+    from core.metrics import REGISTRY
+
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        REGISTRY.retire(settings.METRICS_DIR)
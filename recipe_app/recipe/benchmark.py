@@ -0,0 +1,305 @@
+import itertools
+import json
+import math
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.profiling import QueryTimer
+from utils.test_utils import sample_library
+
+# seeded users and recipes per user of each scale
+SCALES = {
+    '1k': (1, 1000),
+    '100k': (10, 10000),
+    '1m': (100, 10000),
+}
+TAGS_PER_USER = 50
+INGREDIENTS_PER_USER = 200
+PERCENTILES = (50, 90, 95, 99)
+
+# query count reported by the profiling middleware of a server
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+@contextmanager
+def throwaway_database(alias=DEFAULT_DB_ALIAS):
+    """
+    Run the block against a new, migrated copy of the database, dropped
+    when the block exits
+    """
+    connection = connections[alias]
+    name = connection.settings_dict['NAME']
+    test = connection.settings_dict.get('TEST', {})
+    if connection.vendor != 'sqlite':
+        # kept apart from the database of a running test suite
+        connection.settings_dict['TEST'] = {
+            **test, 'NAME': f'benchmark_{name}',
+        }
+    try:
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(name, verbosity=0)
+    finally:
+        connection.settings_dict['TEST'] = test
+
+
+def seed_users(users, recipes, seed=0, batch_size=1000, log=None):
+    """
+    Return `users` users owning `recipes` recipes each, creating the ones
+    a previous run did not leave behind, and the list of those created
+    """
+    seeded = []
+    created = []
+    for index in range(users):
+        email = f'benchmark-{users}x{recipes}-{index}@example.com'
+        user = get_user_model().objects.filter(email=email).first()
+        if user is None:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(email=email)
+                sample_library(
+                    user,
+                    recipes,
+                    tags=TAGS_PER_USER,
+                    ingredients=INGREDIENTS_PER_USER,
+                    seed=seed,
+                    index=index,
+                    batch_size=batch_size,
+                )
+            created.append(user)
+            if log:
+                log(f'Seeded {email}')
+        seeded.append(user)
+
+    return seeded, created
+
+
+def get_scenarios(user):
+    """
+    Return the (name, path, params) of the requests to benchmark for a
+    user, pointing at objects of their library
+    """
+    tag_ids = list(
+        Tag.objects.filter(user=user).order_by('id').values_list(
+            'id', flat=True,
+        )[:2]
+    )
+    ingredient_id = Ingredient.objects.filter(user=user).order_by(
+        'id',
+    ).values_list('id', flat=True).first()
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    title_word = recipe.title.split()[0] if recipe else ''
+    recipes_url = reverse('recipe:recipe-list')
+    ingredients_url = reverse('recipe:ingredient-list')
+
+    return [
+        ('recipe list', recipes_url, {}),
+        ('recipe list by tags', recipes_url, {
+            'tags': ','.join(map(str, tag_ids)),
+        }),
+        ('recipe list by ingredient', recipes_url, {
+            'ingredients': ingredient_id or 0,
+        }),
+        ('recipe search', recipes_url, {'search': title_word[:4]}),
+        ('recipe detail', reverse(
+            'recipe:recipe-detail', args=[recipe.pk if recipe else 0],
+        ), {}),
+        ('tag list', reverse('recipe:tag-list'), {}),
+        ('tag list by usage', reverse('recipe:tag-list'), {
+            'ordering': '-recipe_count',
+        }),
+        ('ingredient list assigned only', ingredients_url, {
+            'assigned_only': 1,
+        }),
+        ('stats', reverse('recipe:stats'), {}),
+        ('sync', reverse('recipe:sync'), {'since': 0}),
+    ]
+
+
+class ClientDriver:
+    """
+    Send requests in process through the test client, counting the
+    queries each runs
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self._local = threading.local()
+        # outside of tests only the allowed hosts are served
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        self.host = hosts[0].lstrip('.') if hosts else 'localhost'
+
+    def get(self, path, params):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = APIClient(SERVER_NAME=self.host)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+        with QueryTimer().installed() as queries:
+            start = time.perf_counter()
+            response = client.get(path, params)
+            elapsed = time.perf_counter() - start
+
+        return response.status_code, elapsed, queries.queries
+
+
+class HttpDriver:
+    """
+    Send requests over HTTP to a running server. Query counts are read
+    from the Server-Timing header, sent when the server has profiling
+    enabled.
+    """
+
+    def __init__(self, token, base_url, timeout=30):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def get(self, path, params):
+        url = f'{self.base_url}{path}'
+        if params:
+            url = f'{url}?{urllib.parse.urlencode(params)}'
+        request = urllib.request.Request(url, headers={
+            'Authorization': f'Token {self.token}',
+            'Accept': 'application/json',
+        })
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as res:
+                res.read()
+                status, headers = res.status, res.headers
+        except urllib.error.HTTPError as exc:
+            status, headers = exc.code, exc.headers
+        elapsed = time.perf_counter() - start
+
+        match = SERVER_TIMING_QUERIES.search(
+            headers.get('Server-Timing', ''),
+        )
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+def get_token(user):
+    """
+    Return the API token of a benchmark user
+    """
+    return Token.objects.get_or_create(user=user)[0].key
+
+
+def percentile(values, percent):
+    """
+    Return the nearest rank percentile of sorted values
+    """
+    index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def run_scenario(driver, path, params, requests, concurrency, cold=False):
+    """
+    Send `requests` GET requests from `concurrency` threads and return
+    their latency percentiles, queries per request and throughput. Cold
+    runs make each request unique, so cached responses are never reused.
+    """
+    # unique across runs, which may share the cache
+    prefix = uuid.uuid4().hex[:8]
+    counter = itertools.count()
+
+    def send():
+        request_params = dict(params)
+        if cold:
+            request_params['_'] = f'{prefix}-{next(counter)}'
+        return driver.get(path, request_params)
+
+    def work(count):
+        try:
+            return [send() for _ in range(count)]
+        finally:
+            # threads other than the caller's open connections of their own
+            if threading.current_thread() is not caller:
+                connections.close_all()
+
+    caller = threading.current_thread()
+    shares = [
+        requests // concurrency + (index < requests % concurrency)
+        for index in range(concurrency)
+    ]
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            samples = [
+                sample
+                for batch in executor.map(work, shares)
+                for sample in batch
+            ]
+    else:
+        samples = work(requests)
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for _status, elapsed, _q in samples)
+    queries = [count for _s, _e, count in samples if count is not None]
+    result = {
+        'requests': requests,
+        'errors': sum(1 for status, _e, _q in samples if status >= 400),
+        'throughput': round(requests / wall, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'max': round(latencies[-1], 3),
+            **{
+                f'p{percent}': round(percentile(latencies, percent), 3)
+                for percent in PERCENTILES
+            },
+        },
+        'queries': None,
+    }
+    if queries:
+        result['queries'] = {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        }
+
+    return result
+
+
+def compare(results, baseline, tolerance, metric='p95'):
+    """
+    Return the scenarios whose latency `metric` grew by more than the
+    `tolerance` ratio over the baseline, as (name, before, after) tuples
+    """
+    regressions = []
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        old = before['latency_ms'][metric]
+        new = result['latency_ms'][metric]
+        if new > old * (1 + tolerance):
+            regressions.append((name, old, new))
+
+    return regressions
+
+
+def load_results(path):
+    """
+    Return the results saved by an earlier run
+    """
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,358 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Cast
+from django.utils.translation import gettext as _
+
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core.signals import bulk_saved
+
+
+def bulk_update(queryset, objs, fields):
+    """
+    Save `fields` of several objects with a single UPDATE statement
+    """
+    if not objs or not fields:
+        return
+
+    model = queryset.model
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        values[name] = Case(
+            *[
+                # cast the parameters, postgres types them as text otherwise
+                When(pk=obj.pk, then=Cast(
+                    Value(getattr(obj, field.attname), output_field=field),
+                    output_field=field,
+                ))
+                for obj in objs
+            ],
+            output_field=field,
+        )
+
+    queryset.filter(pk__in=[obj.pk for obj in objs]).update(**values)
+
+
+def bulk_create(queryset, objs, batch_size=None):
+    """
+    Insert objects in batches and set their primary keys, without sending
+    model signals. Backends that cannot return the ids of bulk inserts read
+    them back instead: SQLite lets one transaction write at a time and
+    gives new rows increasing ids, so the rows just inserted are the ones
+    with the highest ids.
+    """
+    objs = list(objs)
+    db = queryset.db
+    if not objs or connections[db].features.can_return_ids_from_bulk_insert:
+        return queryset.bulk_create(objs, batch_size=batch_size)
+
+    with transaction.atomic(using=db):
+        queryset.bulk_create(objs, batch_size=batch_size)
+        pks = list(
+            queryset.model._base_manager.using(db).order_by(
+                '-pk',
+            ).values_list('pk', flat=True)[:len(objs)]
+        )
+    for obj, pk in zip(objs, reversed(pks)):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = db
+    return objs
+
+
+def is_id(value):
+    """
+    Return whether a value from a request body can be a primary key
+    """
+    # booleans are integers too
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BulkModelMixin:
+    """
+    Adds a `bulk` endpoint that creates (POST), updates (PATCH) or deletes
+    (DELETE) many user owned objects in one request.
+
+    Items are validated one by one without touching the database, related
+    ids are resolved for the whole batch with one query per relation, and
+    rows are written with bulk inserts in a single transaction. Items that
+    fail validation are reported without discarding the rest of the batch.
+    """
+    # many to many fields resolved in bulk, mapped to the related model
+    bulk_related = {}
+    bulk_serializer_class = None
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        """
+        Return the serializer used to validate each item
+        """
+        serializer_class = (
+            self.bulk_serializer_class or self.get_serializer_class()
+        )
+        kwargs['context'] = self.get_serializer_context()
+
+        return serializer_class(*args, **kwargs)
+
+    def get_bulk_queryset(self):
+        """
+        Return the objects bulk requests may read and write
+        """
+        return self.queryset.filter(user=self.request.user)
+
+    def get_bulk_results_queryset(self):
+        """
+        Return the objects serialized into the results of bulk requests
+        """
+        return self.get_bulk_queryset()
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False)
+    def bulk(self, request):
+        """
+        Create, update or delete several objects at once
+        """
+        items = self._get_items(request.data)
+        handler = {
+            'POST': self._bulk_create,
+            'PATCH': self._bulk_update,
+            'DELETE': self._bulk_delete,
+        }[request.method]
+        results = handler(items)
+
+        failed = any(result['status'] >= 400 for result in results)
+        if failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        elif request.method == 'POST':
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_200_OK
+
+        return Response({'results': results}, status=response_status)
+
+    def _get_items(self, data):
+        if not isinstance(data, list):
+            raise ValidationError(_('Expected a list of items'))
+        if len(data) > settings.BULK_MAX_ITEMS:
+            raise ValidationError(
+                _('Send at most %d items per request')
+                % settings.BULK_MAX_ITEMS
+            )
+
+        return data
+
+    def _bulk_create(self, items):
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = self.get_bulk_serializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, dict(serializer.validated_data)))
+            else:
+                results[index] = self._error(serializer.errors)
+        valid = self._check_related(valid, results)
+
+        model = self.queryset.model
+        objs = [
+            model(user=self.request.user, **self._fields(data))
+            for _, data in valid
+        ]
+        with transaction.atomic():
+            bulk_create(
+                model.objects.all(),
+                objs,
+                batch_size=settings.BULK_BATCH_SIZE,
+            )
+            self._set_related([
+                (obj, data) for obj, (_, data) in zip(objs, valid)
+            ])
+            bulk_saved.send(sender=model, instances=objs, created=True)
+
+        self._fill_results(
+            results,
+            [(index, obj.pk) for obj, (index, _) in zip(objs, valid)],
+            status.HTTP_201_CREATED,
+        )
+        return results
+
+    def _bulk_update(self, items):
+        results = [None] * len(items)
+        ids = [
+            item['id'] for item in items
+            if isinstance(item, dict) and is_id(item.get('id'))
+        ]
+        instances = self.get_bulk_queryset().in_bulk(ids)
+
+        valid = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = self._error(
+                    {'non_field_errors': [_('Expected an object')]},
+                )
+                continue
+            pk = item.get('id')
+            if not is_id(pk):
+                results[index] = self._error(
+                    {'id': [_('A valid integer is required.')]},
+                )
+                continue
+            if pk not in instances:
+                results[index] = self._error(
+                    {'id': [_('Not found.')]},
+                    status.HTTP_404_NOT_FOUND,
+                )
+                continue
+            serializer = self.get_bulk_serializer(
+                instances[pk], data=item, partial=True,
+            )
+            if serializer.is_valid():
+                valid.append((index, dict(serializer.validated_data)))
+            else:
+                results[index] = self._error(serializer.errors)
+        valid = self._check_related(valid, results)
+
+        model = self.queryset.model
+        # fields such as auto_now timestamps set when saving
+        auto_fields = [
+            field for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+        ]
+        updated = []
+        changed = set()
+        for index, data in valid:
+            obj = instances[items[index]['id']]
+            for name, value in self._fields(data).items():
+                setattr(obj, name, value)
+                changed.add(name)
+            for field in auto_fields:
+                field.pre_save(obj, add=False)
+                changed.add(field.name)
+            updated.append((obj, data))
+
+        with transaction.atomic():
+            bulk_update(
+                self.get_bulk_queryset(),
+                [obj for obj, _ in updated],
+                changed,
+            )
+            self._set_related(updated)
+            bulk_saved.send(
+                sender=model,
+                instances=[obj for obj, _ in updated],
+                created=False,
+            )
+
+        self._fill_results(
+            results,
+            [(index, obj.pk) for (index, _), (obj, _) in zip(valid, updated)],
+            status.HTTP_200_OK,
+        )
+        return results
+
+    def _bulk_delete(self, items):
+        ids = [pk for pk in items if is_id(pk)]
+        queryset = self.get_bulk_queryset().filter(pk__in=ids)
+        found = set(queryset.values_list('pk', flat=True))
+        with transaction.atomic():
+            queryset.delete()
+
+        results = []
+        for pk in items:
+            if not is_id(pk):
+                results.append(self._error(
+                    {'id': [_('A valid integer is required.')]},
+                ))
+            elif pk in found:
+                results.append({
+                    'status': status.HTTP_204_NO_CONTENT, 'id': pk,
+                })
+            else:
+                results.append(self._error(
+                    {'id': [_('Not found.')]}, status.HTTP_404_NOT_FOUND,
+                ))
+        return results
+
+    def _fields(self, data):
+        """
+        Return the validated data without the many to many fields
+        """
+        return {
+            name: value for name, value in data.items()
+            if name not in self.bulk_related
+        }
+
+    def _check_related(self, valid, results):
+        """
+        Resolve the related ids of every item with one query per relation,
+        reporting the items that reference unknown ids
+        """
+        for name, model in self.bulk_related.items():
+            wanted = {pk for _, data in valid for pk in data.get(name, ())}
+            if not wanted:
+                continue
+            found = set(model.objects.filter(
+                user=self.request.user,
+                pk__in=wanted,
+            ).values_list('pk', flat=True))
+
+            checked = []
+            for index, data in valid:
+                missing = [pk for pk in data.get(name, ()) if pk not in found]
+                if missing:
+                    results[index] = self._error({name: [
+                        _('Invalid pk "%s" - object does not exist.') % pk
+                        for pk in missing
+                    ]})
+                else:
+                    checked.append((index, data))
+            valid = checked
+
+        return valid
+
+    def _set_related(self, updated):
+        """
+        Replace the many to many sets given for each object with bulk
+        deletes and inserts on the through tables
+        """
+        model = self.queryset.model
+        for name in self.bulk_related:
+            pairs = [
+                (obj, data[name]) for obj, data in updated if name in data
+            ]
+            if not pairs:
+                continue
+            field = model._meta.get_field(name)
+            through = field.remote_field.through
+            source = f'{field.m2m_field_name()}_id'
+            target = f'{field.m2m_reverse_field_name()}_id'
+
+            through.objects.filter(
+                **{f'{source}__in': [obj.pk for obj, _ in pairs]}
+            ).delete()
+            through.objects.bulk_create(
+                [
+                    through(**{source: obj.pk, target: pk})
+                    for obj, ids in pairs
+                    for pk in dict.fromkeys(ids)
+                ],
+                batch_size=settings.BULK_BATCH_SIZE,
+            )
+
+    def _fill_results(self, results, saved, item_status):
+        """
+        Serialize the saved objects into their positions in the results
+        """
+        objs = self.get_bulk_results_queryset().in_bulk(
+            [pk for _, pk in saved],
+        )
+        for index, pk in saved:
+            results[index] = {
+                'status': item_status,
+                'data': self.get_serializer(objs[pk]).data,
+            }
+
+    def _error(self, errors, error_status=status.HTTP_400_BAD_REQUEST):
+        return {'status': error_status, 'errors': errors}
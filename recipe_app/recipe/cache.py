@@ -0,0 +1,113 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.cache import get_user_version
+
+
+def cached_response(request, get_response, key_prefix='response'):
+    """
+    Return the response of `get_response` cached for the user under a key
+    holding the version of the user's data, which signal handlers bump
+    whenever a tag, ingredient or recipe of the user changes.
+
+    The ETag is derived from the same version, so requests sending it
+    back in If-None-Match get a 304 without reading the cache.
+    """
+    version = get_user_version(request.user.pk)
+    if version is None:
+        # the cache backend does not keep values, e.g. the dummy cache
+        return get_response()
+
+    digest = hashlib.md5(
+        f'{request.accepted_renderer.format}:'
+        f'{request.build_absolute_uri()}'.encode(),
+    ).hexdigest()
+    etag = f'"{version}-{digest}"'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and etag in parse_etags(if_none_match):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        key = f'{key_prefix}:{request.user.pk}:{version}:{digest}'
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = get_response()
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, settings.RESPONSE_CACHE_TTL)
+
+    response['ETag'] = etag
+    # clients keep responses but check them with the server on each use
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class CachedListMixin:
+    """
+    Cache list responses per user, see cached_response
+    """
+    cache_key_prefix = 'response'
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            functools.partial(super().list, request, *args, **kwargs),
+            self.cache_key_prefix,
+        )
+
+
+class ConditionalRetrieveMixin:
+    """
+    Answer conditional detail requests from the object's `updated_at`
+    timestamp alone, returning 304 before the object is loaded and
+    serialized when the client already has its current version
+    """
+
+    def get_conditional_queryset(self):
+        """
+        Return the objects whose timestamps can be checked
+        """
+        return self.queryset.filter(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = self.get_conditional_queryset().filter(**{
+                self.lookup_field: self.kwargs[lookup_url_kwarg],
+            }).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            # as get_object_or_404, for lookups of the wrong type
+            raise Http404
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = (
+            f'"{request.accepted_renderer.format}-'
+            f'{updated_at.timestamp():.6f}"'
+        )
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return response
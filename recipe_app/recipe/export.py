@@ -0,0 +1,176 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.filters import filter_assigned
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+CONTENT_TYPES = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv',
+}
+
+FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+RELATED = ('tags', 'ingredients')
+# separator of the related names within a single CSV cell
+CSV_LIST_SEPARATOR = ';'
+
+# record types, tags and ingredients are only written when no recipe
+# uses them, the others are listed with their recipes
+RECORD_RECIPE = 'recipe'
+RECORD_TAG = 'tag'
+RECORD_INGREDIENT = 'ingredient'
+# models of the unused records and the CSV column of their names
+UNUSED = {
+    RECORD_TAG: (Tag, 'tags'),
+    RECORD_INGREDIENT: (Ingredient, 'ingredients'),
+}
+
+# first characters spreadsheets read as the start of a formula
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """
+    File-like object that hands back what is written to it, so csv rows
+    can be yielded one by one instead of buffered
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_recipes(user, chunk_size=None):
+    """
+    Yield every recipe of a user as a dict holding its fields and the
+    names of its tags and ingredients.
+
+    Recipes are read through a server side cursor in chunks of
+    `chunk_size` rows, and the related names of each chunk are fetched
+    with one query per relation, so memory use does not depend on the
+    size of the library.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = Recipe.objects.filter(user=user).order_by('id').values(*FIELDS)
+
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _with_related(chunk)
+            chunk = []
+    if chunk:
+        yield from _with_related(chunk)
+
+
+def _with_related(chunk):
+    """
+    Add the related names to a chunk of recipe rows
+    """
+    ids = [row['id'] for row in chunk]
+    names = {}
+    for name in RELATED:
+        field = Recipe._meta.get_field(name)
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        pairs = field.remote_field.through.objects.filter(
+            **{f'{source}_id__in': ids}
+        ).order_by(f'{target}__name').values_list(
+            f'{source}_id', f'{target}__name',
+        )
+        names[name] = {}
+        for recipe_id, related_name in pairs:
+            names[name].setdefault(recipe_id, []).append(related_name)
+
+    for row in chunk:
+        for name in RELATED:
+            row[name] = names[name].get(row['id'], [])
+        yield row
+
+
+def iter_unused(user, model, chunk_size=None):
+    """
+    Yield the id and name of every tag or ingredient of a user that no
+    recipe uses
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = filter_assigned(
+        model.objects.filter(user=user), assigned=False,
+    ).order_by('id').values('id', 'name')
+
+    yield from rows.iterator(chunk_size=chunk_size)
+
+
+def iter_library(user, chunk_size=None):
+    """
+    Yield (record type, row) pairs for every recipe of a user, followed by
+    the tags and ingredients no recipe uses, so the export holds the whole
+    library
+    """
+    for row in iter_recipes(user, chunk_size):
+        yield RECORD_RECIPE, row
+    for record_type, (model, _) in UNUSED.items():
+        for row in iter_unused(user, model, chunk_size):
+            yield record_type, row
+
+
+def escape_csv(value):
+    """
+    Prefix text that spreadsheets would run as a formula with a quote
+    """
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return f"'{value}"
+
+    return value
+
+
+def render_ndjson(records):
+    """
+    Yield one JSON document per line for each record, its type under the
+    `type` key
+    """
+    for record_type, row in records:
+        yield json.dumps(
+            {'type': record_type, **row}, cls=DjangoJSONEncoder,
+        ) + '\n'
+
+
+def render_csv(records):
+    """
+    Yield a CSV header followed by one line for each record. Unused tags
+    and ingredients have their name in the tags or ingredients column.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('type',) + FIELDS + RELATED)
+    for record_type, row in records:
+        if record_type == RECORD_RECIPE:
+            cells = (
+                [row[name] for name in FIELDS]
+                + [CSV_LIST_SEPARATOR.join(row[name]) for name in RELATED]
+            )
+        else:
+            column = UNUSED[record_type][1]
+            cells = (
+                [row['id']] + [''] * (len(FIELDS) - 1)
+                + [row['name'] if name == column else '' for name in RELATED]
+            )
+        yield writer.writerow(
+            [record_type] + [escape_csv(value) for value in cells],
+        )
+
+
+RENDERERS = {
+    FORMAT_NDJSON: render_ndjson,
+    FORMAT_CSV: render_csv,
+}
+
+
+def export_recipes(user, export_format=FORMAT_NDJSON, chunk_size=None):
+    """
+    Return a generator of the lines of a user's recipe library export
+    """
+    return RENDERERS[export_format](iter_library(user, chunk_size))
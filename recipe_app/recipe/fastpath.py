@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from rest_framework.response import Response
+
+from core.profiling import serializing
+
+
+class FastListMixin:
+    """
+    Serve list responses with `fast_list_serializer_class`, which reads
+    `.values()` rows instead of model instances, when RECIPE_LIST_FAST_PATH
+    is enabled
+    """
+    fast_list_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if (
+            not settings.RECIPE_LIST_FAST_PATH
+            or self.fast_list_serializer_class is None
+        ):
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.fast_list_serializer_class(
+            context=self.get_serializer_context(),
+        )
+        rows = serializer.get_rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            with serializing():
+                data = serializer.to_representation(page)
+            return self.get_paginated_response(data)
+
+        with serializing():
+            data = serializer.to_representation(rows)
+        return Response(data)
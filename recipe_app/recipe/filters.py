@@ -0,0 +1,147 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQueryField, SearchRank
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ValidationError
+
+from core import search
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+
+class PrefixSearchQuery(Func):
+    """
+    tsquery matching documents that contain every term as a prefix
+    """
+    function = 'to_tsquery'
+    output_field = SearchQueryField()
+
+    def __init__(self, terms):
+        super().__init__(
+            Value(settings.RECIPE_SEARCH_CONFIG),
+            Value(' & '.join(f'{term}:*' for term in terms)),
+        )
+
+
+def filter_by_related(queryset, field_name, ids, mode=MATCH_ANY):
+    """
+    Filter objects linked to any or all of the given ids through the
+    `field_name` many to many field, checking the through table with a
+    subquery instead of joining it so rows are never repeated
+    """
+    if mode not in MATCH_MODES:
+        raise ValidationError({
+            f'{field_name}_mode': _('Must be one of: %s') % ', '.join(
+                MATCH_MODES,
+            ),
+        })
+
+    field = queryset.model._meta.get_field(field_name)
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    links = field.remote_field.through.objects.filter(
+        **{f'{target}_id__in': ids}
+    )
+
+    if mode == MATCH_ALL:
+        matching = links.values(source).annotate(
+            matched=Count(target),
+        ).filter(
+            matched=len(set(ids)),
+        ).values(source)
+        return queryset.filter(pk__in=matching)
+
+    flag = f'has_{field_name}'
+    return queryset.annotate(**{
+        flag: Exists(links.filter(**{source: OuterRef('pk')})),
+    }).filter(**{flag: True})
+
+
+def search_recipes(queryset, query):
+    """
+    Filter recipes matching every word of `query` as a prefix in their
+    title, tag or ingredient names, annotated with their `search_rank`.
+    Databases without full text search fall back to substring matching.
+    """
+    # words only, so the query cannot contain tsquery operators
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return queryset.none()
+
+    if not search.is_supported(queryset.model):
+        for term in terms:
+            condition = Q()
+            for field_name, _weight in search.WEIGHTS:
+                condition |= Q(**{f'{field_name}__icontains': term})
+            matching = queryset.model.objects.filter(condition).values('pk')
+            queryset = queryset.filter(pk__in=matching)
+        return queryset.annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+        )
+
+    tsquery = PrefixSearchQuery(terms)
+    return queryset.filter(search_vector=tsquery).annotate(
+        # ts_rank returns a real, read as a double so that cursor positions
+        # compare equal to the value in the database
+        search_rank=Cast(
+            SearchRank(F('search_vector'), tsquery),
+            FloatField(),
+        ),
+    )
+
+
+def _recipe_links(model):
+    """
+    Return the recipe through table rows of a tag or ingredient model and
+    the name of the column pointing at the model
+    """
+    relation = model._meta.get_field('recipe')
+    return (
+        relation.through.objects.all(),
+        relation.field.m2m_reverse_field_name(),
+    )
+
+
+def annotate_recipe_count(queryset):
+    """
+    Annotate tags or ingredients with the number of recipes using them,
+    counted in a correlated subquery rather than a join so that rows are
+    neither repeated nor grouped
+    """
+    links, target = _recipe_links(queryset.model)
+    counts = links.filter(**{target: OuterRef('pk')}).order_by().values(
+        target,
+    ).annotate(count=Count('pk')).values('count')
+
+    return queryset.annotate(recipe_count=Coalesce(
+        Subquery(counts, output_field=IntegerField()),
+        0,
+    ))
+
+
+def filter_assigned(queryset, assigned=True):
+    """
+    Filter tags or ingredients used by at least one recipe, or with
+    `assigned` false the ones no recipe uses
+    """
+    links, target = _recipe_links(queryset.model)
+    return queryset.annotate(
+        assigned=Exists(links.filter(**{target: OuterRef('pk')})),
+    ).filter(assigned=assigned)
@@ -0,0 +1,241 @@
+import datetime
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, features
+
+from core.cache import bump_user_version
+from core.changes import record_instances
+from core.models import Change, Recipe
+
+logger = logging.getLogger(__name__)
+
+# EXIF orientation values mapped to the transpose that undoes them
+ORIENTATION_TRANSPOSES = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+EXIF_ORIENTATION = 274
+
+FORMAT_EXTENSIONS = {
+    'jpeg': 'jpg',
+    'webp': 'webp',
+}
+# variant formats keeping transparency, the others get a white background
+ALPHA_FORMATS = {'webp'}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """
+    Upload handler that skips files as soon as they grow past `max_size`
+    bytes, instead of reading the whole upload first
+    """
+
+    def __init__(self, max_size, request=None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.exceeded = False
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded = True
+            raise SkipFile()
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def get_formats():
+    """
+    Return the configured variant formats this Pillow build can write
+    """
+    return tuple(
+        fmt for fmt in settings.RECIPE_IMAGE_FORMATS
+        if fmt != 'webp' or features.check('webp')
+    )
+
+
+def variant_path(image_name, size_name, fmt):
+    """
+    Return the storage path of a variant of an original image
+    """
+    stem = os.path.splitext(image_name)[0]
+
+    return f'{stem}/{size_name}.{FORMAT_EXTENSIONS[fmt]}'
+
+
+def variant_paths(image_name):
+    """
+    Return the storage paths of every variant of an original image, keyed
+    by size name and format
+    """
+    formats = get_formats()
+
+    return {
+        size_name: {
+            fmt: variant_path(image_name, size_name, fmt) for fmt in formats
+        }
+        for size_name in settings.RECIPE_IMAGE_SIZES
+    }
+
+
+def render_variants(data, sizes, formats):
+    """
+    Return the encoded bytes of every variant of an image, keyed by
+    (size name, format). Runs without Django so it can use any executor.
+    """
+    image = Image.open(io.BytesIO(data))
+    exif = image._getexif() if hasattr(image, '_getexif') else None
+    orientation = (exif or {}).get(EXIF_ORIENTATION)
+    if orientation in ORIENTATION_TRANSPOSES:
+        image = image.transpose(ORIENTATION_TRANSPOSES[orientation])
+    # copying the pixels alone leaves EXIF and other metadata behind
+    alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+        'transparency' in image.info
+    )
+    image = image.convert('RGBA' if alpha else 'RGB')
+
+    variants = {}
+    for size_name, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in formats:
+            variant = resized
+            if alpha and fmt not in ALPHA_FORMATS:
+                # converting drops transparent pixels to their color,
+                # usually black
+                variant = Image.new('RGB', resized.size, 'white')
+                variant.paste(resized, mask=resized.getchannel('A'))
+            buffer = io.BytesIO()
+            variant.save(buffer, format=fmt.upper(), quality=85)
+            variants[(size_name, fmt)] = buffer.getvalue()
+
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    """
+    Render and store the variants of a recipe image, recording whether
+    it succeeded in the recipe image status
+    """
+    recipe = None
+    image_name = None
+    try:
+        recipe = Recipe.objects.get(pk=recipe_id)
+        if not recipe.image:
+            return
+        image_name = recipe.image.name
+        # recipes with the same image share its variants, see core.blobs
+        paths = {
+            (size_name, fmt): path
+            for size_name, formats in variant_paths(image_name).items()
+            for fmt, path in formats.items()
+        }
+        if not all(default_storage.exists(path) for path in paths.values()):
+            with recipe.image.open('rb') as original:
+                data = original.read()
+
+            variants = _run_cpu(
+                render_variants,
+                data,
+                dict(settings.RECIPE_IMAGE_SIZES),
+                get_formats(),
+            )
+            for key, content in variants.items():
+                default_storage.delete(paths[key])
+                default_storage.save(paths[key], ContentFile(content))
+        status = Recipe.IMAGE_READY
+    except Exception:
+        logger.exception('Processing image of recipe %s failed', recipe_id)
+        status = Recipe.IMAGE_FAILED
+
+    # only update the status if the image was not replaced meanwhile
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    if image_name is not None:
+        recipes = recipes.filter(image=image_name)
+    updated = recipes.update(image_status=status, updated_at=timezone.now())
+    if updated and recipe is not None:
+        # the status is part of cached and synced recipe responses
+        bump_user_version(recipe.user_id)
+        record_instances([recipe], Change.UPDATED)
+
+
+def stuck_recipes(age):
+    """
+    Return the recipes with an image processing for more than `age`
+    seconds, such as when the worker running the job exited before it
+    recorded a status
+    """
+    before = timezone.now() - datetime.timedelta(seconds=age)
+
+    return Recipe.objects.filter(
+        image_status=Recipe.IMAGE_PROCESSING,
+        updated_at__lt=before,
+    ).exclude(image='').exclude(image__isnull=True)
+
+
+def submit(recipe_id):
+    """
+    Queue the processing of a recipe image on the configured executor
+    """
+    if settings.RECIPE_IMAGE_EXECUTOR == 'sync':
+        process_recipe_image(recipe_id)
+        return
+
+    _get_executor('thread').submit(_run_job, recipe_id)
+
+
+def _run_job(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        # worker threads own their connections, so release them here
+        connections.close_all()
+
+
+def _run_cpu(func, *args):
+    """
+    Run a CPU bound function in the process pool when one is configured
+    """
+    if settings.RECIPE_IMAGE_EXECUTOR == 'process':
+        return _get_executor('process').submit(func, *args).result()
+
+    return func(*args)
+
+
+def _get_executor(kind):
+    with _executors_lock:
+        if kind not in _executors:
+            executor_class = {
+                'thread': ThreadPoolExecutor,
+                'process': ProcessPoolExecutor,
+            }[kind]
+            _executors[kind] = executor_class(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+            )
+        return _executors[kind]
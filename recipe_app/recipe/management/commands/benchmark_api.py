@@ -0,0 +1,193 @@
+import json
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Seed benchmark users with synthetic libraries and time the main API
+    requests of the first one, in process through the test client or over
+    HTTP against a running server. Results are printed and optionally
+    saved as JSON, and compared with the results of an earlier run to
+    catch regressions.
+
+    In process runs seed a throwaway database, dropped afterwards. Runs
+    over HTTP seed the configured database, which the server reads, and
+    delete the users they seeded once done. With `--keep`, the configured
+    database is seeded and the users are kept for later runs to reuse.
+    """
+    help = 'Benchmark the recipe API at a given data scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=sorted(benchmark.SCALES),
+            default='1k',
+            help='Seeded data size, in recipes',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='Seeded users, overriding the scale',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            help='Recipes per seeded user, overriding the scale',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests per scenario',
+        )
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server, requests are sent in '
+                 'process when omitted',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Make every request unique so cached responses are '
+                 'never reused',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            help='Only run the named scenarios',
+        )
+        parser.add_argument('--output', help='Save the results as JSON')
+        parser.add_argument(
+            '--compare',
+            help='JSON results of an earlier run to compare with',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed p95 latency growth over the compared run',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Seed the configured database and keep the seeded users '
+                 'for later runs',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Send at least one request from one thread')
+
+        users, recipes = benchmark.SCALES[options['scale']]
+        if options['users'] is not None:
+            users = options['users']
+        if options['recipes'] is not None:
+            recipes = options['recipes']
+        if users < 1:
+            raise CommandError('Seed at least one user')
+
+        if options['url'] or options['keep']:
+            database = nullcontext()
+        else:
+            database = benchmark.throwaway_database()
+        with database:
+            seeded, created = benchmark.seed_users(
+                users,
+                recipes,
+                seed=options['seed'],
+                batch_size=settings.BULK_BATCH_SIZE,
+                log=self.stdout.write,
+            )
+            try:
+                results = self._benchmark(
+                    seeded[0], users, recipes, options,
+                )
+            finally:
+                if options['url'] and not options['keep'] and created:
+                    get_user_model().objects.filter(
+                        pk__in=[user.pk for user in created],
+                    ).delete()
+                    self.stdout.write(
+                        f'Deleted {len(created)} seeded users'
+                    )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+        if options['compare']:
+            regressions = benchmark.compare(
+                results,
+                benchmark.load_results(options['compare']),
+                options['tolerance'],
+            )
+            for name, before, after in regressions:
+                self.stderr.write(
+                    f'{name}: p95 {before:.2f} ms -> {after:.2f} ms'
+                )
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} scenarios regressed past the '
+                    f'tolerance'
+                )
+
+    def _benchmark(self, user, users, recipes, options):
+        """
+        Run the scenarios as the first seeded user and return the results
+        """
+        token = benchmark.get_token(user)
+        if options['url']:
+            driver = benchmark.HttpDriver(token, options['url'])
+        else:
+            driver = benchmark.ClientDriver(token)
+
+        scenarios = benchmark.get_scenarios(user)
+        if options['scenario']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if scenario[0] in options['scenario']
+            ]
+            if not scenarios:
+                raise CommandError('No scenario matches the given names')
+
+        results = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'users': users,
+            'recipes_per_user': recipes,
+            'driver': 'http' if options['url'] else 'client',
+            'concurrency': options['concurrency'],
+            'cold': options['cold'],
+            'scenarios': {},
+        }
+        for name, path, params in scenarios:
+            result = benchmark.run_scenario(
+                driver,
+                path,
+                params,
+                options['requests'],
+                options['concurrency'],
+                cold=options['cold'],
+            )
+            results['scenarios'][name] = result
+            self._report(name, result)
+
+        return results
+
+    def _report(self, name, result):
+        latency = result['latency_ms']
+        queries = result['queries']
+        self.stdout.write(
+            f'{name:<32} p50 {latency["p50"]:8.2f} ms  '
+            f'p95 {latency["p95"]:8.2f} ms  p99 {latency["p99"]:8.2f} ms  '
+            f'{result["throughput"]:8.1f} req/s  '
+            f'queries {queries["mean"] if queries else "-":>6}  '
+            f'errors {result["errors"]}'
+        )
@@ -0,0 +1,139 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Recipe, Tag
+from recipe import filters
+
+
+class Command(BaseCommand):
+    """
+    Time recipe tag filtering as a user's library grows. All the sample
+    data is created inside a transaction that is rolled back at the end.
+    """
+    help = 'Benchmark recipe tag filtering against library size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Recipe counts to benchmark',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=20,
+            help='Number of tags owned by the user',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=100,
+            help='Rows fetched per filtered query',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per size, the best one is reported',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options['seed'])
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-filters@example.com',
+            )
+            Tag.objects.bulk_create(
+                Tag(user=user, name=f'Tag {i}')
+                for i in range(options['tags'])
+            )
+            # read back, as only PostgreSQL sets the ids of bulk inserts
+            tags = list(Tag.objects.filter(user=user).order_by('id'))
+            tag_ids = [tag.id for tag in tags[:2]]
+
+            results = []
+            for size in sorted(options['sizes']):
+                self._grow_library(user, tags, size, rand)
+                for mode in filters.MATCH_MODES:
+                    elapsed = self._time_filter(
+                        user, tag_ids, mode, options,
+                    )
+                    results.append((size, mode, elapsed))
+                    self.stdout.write(
+                        f'{size:>9} recipes  tags_mode={mode:<3}  '
+                        f'{elapsed * 1000:8.2f} ms'
+                    )
+
+            transaction.set_rollback(True)
+
+        self._report_growth(results)
+
+    def _grow_library(self, user, tags, size, rand):
+        """
+        Add recipes to the user until they own `size` of them
+        """
+        missing = size - Recipe.objects.filter(user=user).count()
+        if missing <= 0:
+            return
+
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=rand.randint(5, 120),
+                price=rand.randint(100, 5000) / 100,
+            )
+            for i in range(missing)
+        )
+        recipes = Recipe.objects.filter(user=user).order_by('-id')[:missing]
+        Through = Recipe.tags.through
+        Through.objects.bulk_create(
+            Through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rand.sample(tags, min(3, len(tags)))
+        )
+
+        # refresh the planner statistics, as a live database would have
+        with connection.cursor() as cursor:
+            for model in (Recipe, Through):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def _time_filter(self, user, tag_ids, mode, options):
+        """
+        Return the best time taken to fetch one page of filtered recipes
+        """
+        best = None
+        for _ in range(options['repeat']):
+            queryset = filters.filter_by_related(
+                Recipe.objects.filter(user=user),
+                'tags',
+                tag_ids,
+                mode,
+            ).order_by('-id')
+            start = time.perf_counter()
+            list(queryset[:options['page_size']].values_list('id'))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best
+
+    def _report_growth(self, results):
+        """
+        Compare the growth in query time with the growth in library size
+        """
+        for mode in filters.MATCH_MODES:
+            timings = [(size, t) for size, m, t in results if m == mode]
+            if len(timings) < 2:
+                continue
+            (first_size, first), (last_size, last) = timings[0], timings[-1]
+            self.stdout.write(self.style.SUCCESS(
+                f'tags_mode={mode}: {last_size / first_size:.0f}x recipes, '
+                f'{last / first:.1f}x time'
+            ))
@@ -0,0 +1,90 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+
+
+class Command(BaseCommand):
+    """
+    Time rendering recipe list payloads with JSONRenderer and with the
+    fast JSON renderer, checking that both produce the same bytes
+    """
+    help = 'Benchmark the fast JSON renderer against JSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Recipes per rendered payload',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per size, the best one is reported',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed, the fast renderer falls back to '
+                'the standard library',
+            ))
+
+        rand = random.Random(options['seed'])
+        for size in sorted(options['sizes']):
+            data = self._payload(size, rand)
+            slow, slow_json = self._time(JSONRenderer(), data, options)
+            fast, fast_json = self._time(
+                renderers.FastJSONRenderer(), data, options,
+            )
+            if slow_json != fast_json:
+                raise CommandError(f'Renderers disagree for {size} recipes')
+
+            self.stdout.write(
+                f'{size:>9} recipes  JSONRenderer {slow * 1000:8.2f} ms  '
+                f'fast {fast * 1000:8.2f} ms  {slow / fast:5.1f}x'
+            )
+
+    def _payload(self, size, rand):
+        """
+        Return a recipe list response body with `size` recipes, with the
+        first price left as a Decimal as a model value would be
+        """
+        results = [
+            {
+                'id': i,
+                'title': f'Recipe {i} – crème brûlée',
+                'time_minutes': rand.randint(5, 120),
+                'price': f'{rand.randint(100, 5000) / 100:.2f}',
+                'link': '',
+                'ingredients': rand.sample(range(1000), 5),
+                'tags': rand.sample(range(100), 3),
+                'image_status': '',
+                'image_variants': {},
+            }
+            for i in range(size)
+        ]
+        results[0]['price'] = Decimal('12.50')
+        return {'next': None, 'previous': None, 'results': results}
+
+    def _time(self, renderer, data, options):
+        """
+        Return the best time taken to render `data` and the output
+        """
+        best = None
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            output = renderer.render(data, 'application/json')
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, output
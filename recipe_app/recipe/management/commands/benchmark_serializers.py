@@ -0,0 +1,137 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Prefetch
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import serializers
+from recipe.bulk import bulk_create
+
+
+class Command(BaseCommand):
+    """
+    Time rendering recipe lists with RecipeSerializer and with the row
+    based fast path, checking that both produce the same JSON. All the
+    sample data is created inside a transaction that is rolled back at
+    the end.
+    """
+    help = 'Benchmark the recipe list serializers against list size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000],
+            help='Recipe counts to benchmark',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per size, the best one is reported',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options['seed'])
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-serializers@example.com',
+            )
+            tags = bulk_create(Tag.objects.all(), (
+                Tag(user=user, name=f'Tag {i}') for i in range(20)
+            ))
+            ingredients = bulk_create(Ingredient.objects.all(), (
+                Ingredient(user=user, name=f'Ingredient {i}')
+                for i in range(50)
+            ))
+
+            for size in sorted(options['sizes']):
+                self._grow_library(user, tags, ingredients, size, rand)
+                queryset = Recipe.objects.filter(user=user).order_by('-id')
+                slow, slow_json = self._time(
+                    lambda: self._render_serializer(queryset), options,
+                )
+                fast, fast_json = self._time(
+                    lambda: self._render_rows(queryset), options,
+                )
+                if slow_json != fast_json:
+                    raise CommandError(
+                        f'Serializers disagree for {size} recipes'
+                    )
+
+                self.stdout.write(
+                    f'{size:>9} recipes  serializer {slow * 1000:9.2f} ms  '
+                    f'fast path {fast * 1000:9.2f} ms  '
+                    f'{slow / fast:5.1f}x'
+                )
+
+            transaction.set_rollback(True)
+
+    def _grow_library(self, user, tags, ingredients, size, rand):
+        """
+        Add recipes with a few tags and ingredients to the user until they
+        own `size` of them
+        """
+        missing = size - Recipe.objects.filter(user=user).count()
+        if missing <= 0:
+            return
+
+        recipes = bulk_create(Recipe.objects.all(), (
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=rand.randint(5, 120),
+                price=rand.randint(100, 5000) / 100,
+            )
+            for i in range(missing)
+        ))
+        for name, related, count in (
+            ('tags', tags, 3),
+            ('ingredients', ingredients, 5),
+        ):
+            field = Recipe._meta.get_field(name)
+            through = field.remote_field.through
+            target = f'{field.m2m_reverse_field_name()}_id'
+            through.objects.bulk_create(
+                through(recipe_id=recipe.id, **{target: obj.id})
+                for recipe in recipes
+                for obj in rand.sample(related, count)
+            )
+
+    def _render_serializer(self, queryset):
+        queryset = queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id').order_by('id'),
+            ),
+        )
+        return JSONRenderer().render(
+            serializers.RecipeSerializer(queryset, many=True).data,
+        )
+
+    def _render_rows(self, queryset):
+        serializer = serializers.RecipeRowSerializer()
+        return JSONRenderer().render(
+            serializer.to_representation(serializer.get_rows(queryset)),
+        )
+
+    def _time(self, render, options):
+        """
+        Return the best time taken by `render` and its output
+        """
+        best = None
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            output = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, output
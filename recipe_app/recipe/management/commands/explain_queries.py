@@ -0,0 +1,130 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from rest_framework.request import Request
+
+from recipe import views
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+    """
+    Run EXPLAIN on the main recipe API queries for a user and report the
+    ones that fall back to sequential scans
+    """
+    help = 'Explain the main API queries and report sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Email of the user to build the queries for',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries and include the actual timings',
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Fail when any query uses a sequential scan',
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        tag_ids = self._sample_ids(user.tag_set)
+        ing_ids = self._sample_ids(user.ingredient_set)
+        recipe = user.recipe_set.order_by('-id').first()
+
+        queries = (
+            ('recipe list', views.RecipeViewSet, 'list', {}),
+            ('recipe list by tags', views.RecipeViewSet, 'list', {
+                'tags': tag_ids,
+            }),
+            ('recipe list by all tags', views.RecipeViewSet, 'list', {
+                'tags': tag_ids,
+                'tags_mode': 'all',
+            }),
+            ('recipe list by ingredients', views.RecipeViewSet, 'list', {
+                'ingredients': ing_ids,
+            }),
+            ('recipe search', views.RecipeViewSet, 'list', {
+                'search': recipe.title if recipe else 'recipe',
+            }),
+            ('recipe detail', views.RecipeViewSet, 'retrieve', {}),
+            ('tag list', views.TagViewSet, 'list', {}),
+            ('tag list assigned only', views.TagViewSet, 'list', {
+                'assigned_only': 1,
+            }),
+            ('tag list by usage', views.TagViewSet, 'list', {
+                'ordering': '-recipe_count',
+            }),
+            ('ingredient list', views.IngredientViewSet, 'list', {}),
+            (
+                'ingredient list assigned only',
+                views.IngredientViewSet,
+                'list',
+                {'assigned_only': 1},
+            ),
+        )
+
+        offenders = []
+        for name, viewset, action, params in queries:
+            queryset = self._get_queryset(user, viewset, action, params)
+            if action == 'retrieve':
+                queryset = queryset.filter(pk=recipe.pk if recipe else 0)
+            else:
+                queryset = queryset[:settings.API_PAGE_SIZE]
+
+            # only PostgreSQL and MySQL understand the analyze option
+            explain_options = {'analyze': True} if options['analyze'] else {}
+            plan = queryset.explain(**explain_options)
+            tables = sorted(set(SEQ_SCAN.findall(plan)))
+            if tables:
+                offenders.append(name)
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: sequential scan on {", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: ok'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if offenders and options['strict']:
+            raise CommandError(
+                f'{len(offenders)} queries use sequential scans'
+            )
+
+    def _get_user(self, email):
+        """
+        Return the user to explain the queries for
+        """
+        users = get_user_model().objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No matching user found')
+
+        return user
+
+    def _sample_ids(self, related):
+        """
+        Return a couple of the user's object ids as a query parameter
+        """
+        ids = related.order_by('id').values_list('id', flat=True)[:2]
+
+        return ','.join(str(pk) for pk in ids) or '0'
+
+    def _get_queryset(self, user, viewset, action, params):
+        """
+        Build the queryset the API would run for a request
+        """
+        request = Request(RequestFactory().get('/', params))
+        request.user = user
+        view = viewset(request=request, action=action, format_kwarg=None)
+
+        return view.get_queryset()
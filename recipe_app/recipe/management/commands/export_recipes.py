@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import export
+
+
+class Command(BaseCommand):
+    """
+    Write the recipe library of a user as NDJSON or CSV, recipes first,
+    then the tags and ingredients no recipe uses
+    """
+    help = 'Export the recipes of a user as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'email',
+            help='Email of the user to export the recipes of',
+        )
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=sorted(export.RENDERERS),
+            default=export.FORMAT_NDJSON,
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to instead of standard output',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(
+            email=options['email'],
+        ).first()
+        if user is None:
+            raise CommandError(f"No user with email '{options['email']}'")
+
+        lines = export.export_recipes(
+            user,
+            options['export_format'],
+            options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """
+    Process again the recipe images that never got a status, because the
+    worker running their job stopped, and optionally the failed ones
+    """
+    help = 'Process recipe images stuck in processing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--age',
+            type=int,
+            default=600,
+            help='Seconds an image has been processing before it is '
+                 'considered stuck',
+        )
+        parser.add_argument(
+            '--failed',
+            action='store_true',
+            help='Also process the images that failed',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the recipes without processing their images',
+        )
+
+    def handle(self, *args, **options):
+        if options['age'] < 0:
+            raise CommandError('The age cannot be negative')
+
+        recipes = images.stuck_recipes(options['age'])
+        if options['failed']:
+            recipes |= Recipe.objects.filter(
+                image_status=Recipe.IMAGE_FAILED,
+            ).exclude(image='').exclude(image__isnull=True)
+        recipe_ids = list(
+            recipes.order_by('id').values_list('id', flat=True),
+        )
+        if options['dry_run']:
+            for recipe_id in recipe_ids:
+                self.stdout.write(str(recipe_id))
+            self.stdout.write(f'{len(recipe_ids)} images to process')
+            return
+
+        for recipe_id in recipe_ids:
+            # in this process, the command exits once they are all done
+            images.process_recipe_image(recipe_id)
+
+        failed = Recipe.objects.filter(
+            id__in=recipe_ids, image_status=Recipe.IMAGE_FAILED,
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(recipe_ids)} images, {failed} failed',
+        ))
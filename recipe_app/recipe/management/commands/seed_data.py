@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from utils.seed import LibraryGenerator, can_copy
+
+
+class Command(BaseCommand):
+    """
+    Create users with generated recipe libraries, for benchmarks and
+    load tests. Users are numbered from the email template and the ones
+    that already exist are skipped, so an interrupted run can be resumed
+    and the same seed reproduces the same data.
+    """
+    help = 'Seed users with large generated recipe libraries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=1000,
+            help='Recipes per user',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=30,
+            help='Tags per user',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=200,
+            help='Ingredients per user',
+        )
+        parser.add_argument(
+            '--email',
+            default='seed-{index}@example.com',
+            help='Email template of the users, numbered by {index}',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.BULK_BATCH_SIZE,
+            help='Recipes inserted per statement',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use bulk inserts even when COPY is available',
+        )
+
+    def handle(self, *args, **options):
+        if '{index}' not in options['email']:
+            raise CommandError('The email template must contain {index}')
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be positive')
+
+        generator = LibraryGenerator(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+        )
+        self.stdout.write(
+            'Loading rows with '
+            + ('COPY' if generator.use_copy else 'bulk inserts')
+            + ('' if can_copy() else ', COPY is not available')
+        )
+
+        user_model = get_user_model()
+        created = 0
+        start = time.perf_counter()
+        for index in range(options['users']):
+            email = options['email'].format(index=index)
+            if user_model.objects.filter(email=email).exists():
+                self.stdout.write(f'Skipped {email}, it already exists')
+                continue
+
+            with transaction.atomic():
+                user = user_model.objects.create_user(email=email)
+                generator.generate(
+                    user,
+                    options['recipes'],
+                    tags=options['tags'],
+                    ingredients=options['ingredients'],
+                    index=index,
+                )
+            created += options['recipes']
+            self.stdout.write(f'Seeded {email}')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} recipes in {elapsed:.1f} s '
+            f'({created / elapsed if elapsed else 0:.0f} recipes/s)'
+        ))
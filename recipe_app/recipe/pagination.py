@@ -0,0 +1,146 @@
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class BaseCursorPagination(CursorPagination):
+    """
+    Keyset pagination with opaque cursor tokens, so that deep pages cost
+    the same as the first one.
+
+    Cursor positions hold the value of every ordering field rather than
+    of the first one only, and pages continue after the position in the
+    full ordering. Orderings ending with a unique field then never tie, so
+    pages are never found by an offset, which stops at `offset_cutoff`.
+    """
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                self._after(current_position, reverse),
+            )
+
+        # an extra item tells whether a page follows this one
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering,
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # fetched in the reverse ordering
+            self.page = list(reversed(self.page))
+
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _after(self, position, reverse):
+        """
+        Return the condition selecting the rows following `position` in the
+        ordering, or preceding it for reverse cursors, e.g.
+        `a > x OR (a = x AND b > y)` for the ordering (a, b)
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            condition |= equal & Q(**{f'{field_name}__{lookup}': value})
+            equal &= Q(**{field_name: value})
+
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(instance[field_name])
+            else:
+                values.append(getattr(instance, field_name))
+
+        return json.dumps(values)
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """
+    Paginate recipes, newest first, or by rank when searching
+    """
+    ordering = '-id'
+    # ranks tie often, every match ranks 0 without full text search, so
+    # cursors hold the id along with the rank
+    search_ordering = ('-search_rank', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """
+    Paginate user owned recipe attributes by name, using the id to keep
+    the order stable between repeated names, or in the ordering chosen
+    by the view
+    """
+    ordering = ('-name', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_ordering'):
+            return view.get_ordering()
+
+        return super().get_ordering(request, queryset, view)
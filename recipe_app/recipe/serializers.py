@@ -1,16 +1,57 @@
-from rest_framework import serializers
+from django.core.files.storage import default_storage
 
+from rest_framework import serializers
 
 from core.models import Tag, Ingredient, Recipe
+from recipe.images import variant_paths
+
+
+def get_image_variants(image_name, image_status, request=None):
+    """
+    Return the URLs of the processed variants of a recipe image, by size
+    and format, once they are ready
+    """
+    if not image_name or image_status != Recipe.IMAGE_READY:
+        return {}
+
+    def url(path):
+        url = default_storage.url(path)
+        return request.build_absolute_uri(url) if request else url
+
+    return {
+        size_name: {fmt: url(path) for fmt, path in paths.items()}
+        for size_name, paths in variant_paths(image_name).items()
+    }
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the processed variants of a recipe image, by size and format
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return get_image_variants(
+            recipe.image.name,
+            recipe.image_status,
+            self.context.get('request'),
+        )
 
 
 class TagSerializer(serializers.ModelSerializer):
     """
     Serializer for Tag objects
     """
+    # only set on lists annotated with the count, left out elsewhere
+    recipe_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_fields = ('id',)
 
 
@@ -18,9 +59,12 @@ class IngredientSerializer(serializers.ModelSerializer):
     """
     Serializer for Ingredient objects
     """
+    # only set on lists annotated with the count, left out elsewhere
+    recipe_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_fields = ('id',)
 
 
@@ -36,6 +80,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True,
         queryset=Tag.objects.all()
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -47,8 +92,100 @@ class RecipeSerializer(serializers.ModelSerializer):
             'link',
             'ingredients',
             'tags',
+            'image_status',
+            'image_variants',
         )
-        read_only_fields = ('id',)
+        read_only_fields = ('id', 'image_status')
+
+
+class RecipeRowSerializer:
+    """
+    Read only stand-in for RecipeSerializer in list responses. It builds
+    the same representation from `.values()` rows and a map of related
+    ids, without model instances or per field serializer calls.
+    """
+    value_fields = (
+        'id',
+        'title',
+        'time_minutes',
+        'price',
+        'link',
+        'image',
+        'image_status',
+    )
+    related_fields = ('ingredients', 'tags')
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def get_rows(self, queryset):
+        """
+        Return the rows of a recipe queryset, keeping its annotations so
+        pagination can order by them
+        """
+        return queryset.prefetch_related(None).values(
+            *self.value_fields,
+            *queryset.query.annotations,
+        )
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        related = self._get_related_ids([row['id'] for row in rows])
+        request = self.context.get('request')
+
+        return [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'time_minutes': row['time_minutes'],
+                'price': '{0:f}'.format(row['price']),
+                'link': row['link'],
+                'ingredients': related['ingredients'].get(row['id'], []),
+                'tags': related['tags'].get(row['id'], []),
+                'image_status': row['image_status'],
+                'image_variants': get_image_variants(
+                    row['image'],
+                    row['image_status'],
+                    request,
+                ),
+            }
+            for row in rows
+        ]
+
+    def _get_related_ids(self, recipe_ids):
+        """
+        Return the related ids of each recipe, ordered as prefetched for
+        RecipeSerializer, with one query per relation
+        """
+        related = {}
+        for name in self.related_fields:
+            field = Recipe._meta.get_field(name)
+            source = f'{field.m2m_field_name()}_id'
+            target = f'{field.m2m_reverse_field_name()}_id'
+            pairs = field.remote_field.through.objects.filter(**{
+                f'{source}__in': recipe_ids,
+            }).order_by(target).values_list(source, target)
+
+            related[name] = {}
+            for recipe_id, related_id in pairs:
+                related[name].setdefault(recipe_id, []).append(related_id)
+
+        return related
+
+
+class RecipeBulkSerializer(RecipeSerializer):
+    """
+    Serializer validating recipes in bulk requests, related ids are
+    checked for the whole batch by the view
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+    )
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -63,8 +200,9 @@ class RecipeImageSerializer(serializers.ModelSerializer):
     """
     Serializer for uploading images to recipes
     """
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'image_variants')
+        read_only_fields = ('id', 'image_status')
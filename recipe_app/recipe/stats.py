@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Avg, CharField, Count, Max, Min, Q, Value
+
+from core.models import Ingredient, Recipe, Tag
+
+CENTS = Decimal('0.01')
+
+
+def get_stats(user):
+    """
+    Return aggregate statistics of a user's library: recipe totals with
+    the price distribution, recipe counts per tag and the most used
+    ingredients. Runs one aggregate query over the recipes and one
+    grouped query over the tag and ingredient links.
+    """
+    return {
+        'recipes': _get_recipe_stats(user),
+        **_get_usage_stats(user),
+    }
+
+
+def _get_recipe_stats(user):
+    ranges = _price_ranges(settings.RECIPE_STATS_PRICE_BUCKETS)
+    aggregates = {
+        'count': Count('id'),
+        'average_time_minutes': Avg('time_minutes'),
+        'min_price': Min('price'),
+        'max_price': Max('price'),
+        'average_price': Avg('price'),
+    }
+    for index, (low, high) in enumerate(ranges):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f'price_range_{index}'] = Count('id', filter=condition)
+
+    totals = Recipe.objects.filter(user=user).aggregate(**aggregates)
+    average_time = totals['average_time_minutes']
+
+    return {
+        'count': totals['count'],
+        'average_time_minutes': (
+            round(float(average_time), 2) if average_time is not None
+            else None
+        ),
+        'price': {
+            'min': _format_price(totals['min_price']),
+            'max': _format_price(totals['max_price']),
+            'average': _format_price(totals['average_price']),
+            'distribution': [
+                {
+                    'min': _format_price(low),
+                    'max': _format_price(high),
+                    'count': totals[f'price_range_{index}'],
+                }
+                for index, (low, high) in enumerate(ranges)
+            ],
+        },
+    }
+
+
+def _get_usage_stats(user):
+    """
+    Return the recipe counts of the user's tags and the most used
+    ingredients, grouping both link tables in a single query
+    """
+    def usage(model, kind):
+        return model.objects.filter(user=user).annotate(
+            kind=Value(kind, output_field=CharField()),
+            recipe_count=Count('recipe'),
+        ).values_list('kind', 'id', 'name', 'recipe_count')
+
+    tags = []
+    ingredients = []
+    rows = usage(Tag, 'tag').union(
+        usage(Ingredient, 'ingredient'),
+        all=True,
+    )
+    for kind, pk, name, recipe_count in rows:
+        entry = {'id': pk, 'name': name, 'recipe_count': recipe_count}
+        (tags if kind == 'tag' else ingredients).append(entry)
+
+    def most_used(entry):
+        return (-entry['recipe_count'], entry['name'], entry['id'])
+
+    return {
+        'tags': sorted(tags, key=most_used),
+        'top_ingredients': sorted(
+            (entry for entry in ingredients if entry['recipe_count']),
+            key=most_used,
+        )[:settings.RECIPE_STATS_TOP_INGREDIENTS],
+    }
+
+
+def _price_ranges(bounds):
+    """
+    Return the (low, high) price ranges split at `bounds`, open ended at
+    both sides
+    """
+    bounds = [Decimal(str(bound)) for bound in sorted(bounds)]
+    lows = [None] + bounds
+    highs = bounds + [None]
+
+    return list(zip(lows, highs))
+
+
+def _format_price(value):
+    """
+    Return a price as the API renders them, with two decimal places
+    """
+    if value is None:
+        return None
+
+    return '{0:f}'.format(Decimal(value).quantize(CENTS))
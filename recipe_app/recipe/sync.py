@@ -0,0 +1,138 @@
+from django.db import connections, router
+from django.db.models import Prefetch
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import Change, ChangeFloor, Ingredient, Recipe, Tag
+from recipe import serializers
+
+# synced models by the name stored in the change log, with their
+# serializer and the key holding their changes in the response
+SYNCED = (
+    ('tag', Tag, serializers.TagSerializer, 'tags'),
+    ('ingredient', Ingredient, serializers.IngredientSerializer,
+     'ingredients'),
+    ('recipe', Recipe, serializers.RecipeSerializer, 'recipes'),
+)
+
+
+class ResyncRequired(APIException):
+    """
+    The changes after the watermark were partly removed from the log
+    """
+    status_code = status.HTTP_410_GONE
+    default_detail = _('Changes were removed from the log, sync from 0.')
+    default_code = 'resync_required'
+
+
+def get_horizon():
+    """
+    Return the position below which the change log is complete, or None
+    when it is complete up to its last entry.
+
+    On PostgreSQL positions are transaction ids, and the oldest running
+    transaction may still log changes with any of the ids after it.
+    """
+    connection = connections[router.db_for_read(Change)]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def get_changes(user, since, limit, context=None):
+    """
+    Return the objects of a user changed after the `since` position in the
+    change log, reading about `limit` entries of it.
+
+    Only the last change of each object counts: objects still present
+    are returned as they are now, deleted ones as tombstones. The
+    returned watermark is the position to resume from. Entries are read
+    up to the horizon only, and those of one transaction together, so no
+    entry can appear before the watermark once it was returned.
+    """
+    horizon = get_horizon()
+    log = Change.objects.filter(user=user, position__gt=since)
+    if horizon is not None:
+        log = log.filter(position__lt=horizon)
+    fields = ('position', 'seq', 'model', 'object_id', 'action')
+    entries = list(
+        log.order_by('position', 'seq').values_list(*fields)[:limit + 1]
+    )
+    more = len(entries) > limit
+    if more:
+        # leave the entries of the last transaction read to the next page
+        cut = entries[limit][0]
+        entries = [entry for entry in entries[:limit] if entry[0] != cut]
+        if not entries:
+            entries = list(
+                log.filter(position=cut).order_by('seq').values_list(*fields)
+            )
+
+    if since and ChangeFloor.objects.filter(
+        user=user, position__gt=since,
+    ).exists():
+        # after reading the entries, so entries pruned meanwhile are noticed
+        raise ResyncRequired()
+
+    if entries and (more or horizon is None):
+        watermark = entries[-1][0]
+    elif horizon is not None:
+        watermark = max(since, horizon - 1)
+    else:
+        watermark = since
+
+    latest = {}
+    # by sequence number, the order objects were changed in
+    for _position, _seq, model_name, object_id, action in sorted(
+        entries, key=lambda entry: entry[1],
+    ):
+        latest[(model_name, object_id)] = action
+
+    result = {
+        'watermark': watermark,
+        'more': more,
+    }
+    for model_name, model, serializer_class, key in SYNCED:
+        actions = {
+            object_id: action
+            for (name, object_id), action in latest.items()
+            if name == model_name
+        }
+        objects = _get_queryset(model, user).filter(pk__in=[
+            object_id for object_id, action in actions.items()
+            if action != Change.DELETED
+        ]).order_by('pk')
+        result[key] = {
+            'updated': serializer_class(
+                objects, many=True, context=context,
+            ).data,
+            'deleted': sorted(
+                object_id for object_id, action in actions.items()
+                if action == Change.DELETED
+            ),
+        }
+
+    return result
+
+
+def _get_queryset(model, user):
+    """
+    Return the user's objects of a model, with the related ids the list
+    serializers read prefetched
+    """
+    queryset = model.objects.filter(user=user)
+    if model is Recipe:
+        queryset = queryset.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id').order_by('id')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id').order_by('id'),
+            ),
+        )
+
+    return queryset
@@ -0,0 +1,254 @@
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from utils.test_utils import (
+    sample_user,
+    sample_recipe,
+    sample_tag,
+    sample_ingredient,
+    assert_constant_queries,
+)
+
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+
+
+class PrivateRecipeBulkAPITests(TestCase):
+    """
+    Test the bulk recipes API
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_recipes(self):
+        """
+        Test creating several recipes with their tags and ingredients
+        """
+        tag = sample_tag(user=self.user)
+        ing = sample_ingredient(user=self.user)
+        payload = [
+            {
+                'title': 'Pancakes',
+                'time_minutes': 10,
+                'price': '2.50',
+                'tags': [tag.id],
+                'ingredients': [ing.id],
+            },
+            {'title': 'Toast', 'time_minutes': 2, 'price': '1.00'},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        results = res.data['results']
+        self.assertEqual([r['status'] for r in results], [201, 201])
+        self.assertEqual(results[0]['data']['tags'], [tag.id])
+        recipe = Recipe.objects.get(id=results[0]['data']['id'])
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(list(recipe.ingredients.all()), [ing])
+
+    def test_bulk_create_reports_item_errors(self):
+        """
+        Test that invalid items are reported and valid ones still created
+        """
+        other_tag = sample_tag(user=sample_user(email='other@rafacorp.com'))
+        payload = [
+            {'title': 'Pancakes', 'time_minutes': 10, 'price': '2.50'},
+            {'time_minutes': 10, 'price': '2.50'},
+            {
+                'title': 'Waffles',
+                'time_minutes': 10,
+                'price': '2.50',
+                'tags': [other_tag.id],
+            },
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertEqual([r['status'] for r in results], [201, 400, 400])
+        self.assertIn('title', results[1]['errors'])
+        self.assertIn('tags', results[2]['errors'])
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Pancakes'],
+        )
+
+    def test_bulk_create_constant_queries(self):
+        """
+        Test that the number of queries does not grow with the batch
+        """
+        tag = sample_tag(user=self.user)
+
+        def add_items(count):
+            self.payload = [
+                {
+                    'title': f'Recipe {i}',
+                    'time_minutes': 10,
+                    'price': '2.50',
+                    'tags': [tag.id],
+                }
+                for i in range(count)
+            ]
+
+        assert_constant_queries(
+            self,
+            lambda: self.client.post(
+                RECIPES_BULK_URL, self.payload, format='json',
+            ),
+            add_items,
+        )
+
+    def test_bulk_update_recipes(self):
+        """
+        Test updating the fields and tags of several recipes
+        """
+        recipe1 = sample_recipe(user=self.user, title='Pancakes')
+        recipe2 = sample_recipe(user=self.user, title='Toast')
+        recipe1.tags.add(sample_tag(user=self.user, name='Breakfast'))
+        new_tag = sample_tag(user=self.user, name='Sweet')
+        payload = [
+            {'id': recipe1.id, 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'title': 'French toast', 'price': '3.00'},
+            {'id': 0, 'title': 'Missing'},
+        ]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertEqual([r['status'] for r in results], [200, 200, 404])
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Pancakes')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(recipe2.title, 'French toast')
+        self.assertEqual(str(recipe2.price), '3.00')
+
+    def test_bulk_update_other_users_recipe(self):
+        """
+        Test that recipes of other users cannot be updated
+        """
+        recipe = sample_recipe(user=sample_user(email='other@rafacorp.com'))
+
+        res = self.client.patch(
+            RECIPES_BULK_URL,
+            [{'id': recipe.id, 'title': 'Mine now'}],
+            format='json',
+        )
+
+        self.assertEqual(res.data['results'][0]['status'], 404)
+        recipe.refresh_from_db()
+        self.assertNotEqual(recipe.title, 'Mine now')
+
+    def test_bulk_delete_recipes(self):
+        """
+        Test deleting several recipes by id
+        """
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        other = sample_recipe(user=sample_user(email='other@rafacorp.com'))
+
+        res = self.client.delete(
+            RECIPES_BULK_URL,
+            [recipe1.id, recipe2.id, other.id],
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in res.data['results']],
+            [204, 204, 404],
+        )
+        self.assertEqual(list(Recipe.objects.all()), [other])
+
+    def test_bulk_rejects_malformed_ids(self):
+        """
+        Test that items that are not ids, or objects without an integer
+        id, are reported one by one
+        """
+        recipe = sample_recipe(user=self.user)
+
+        deleted = self.client.delete(
+            RECIPES_BULK_URL, [[1], {'id': 1}, 'x', True], format='json',
+        )
+        updated = self.client.patch(
+            RECIPES_BULK_URL,
+            [[1], {'id': [recipe.id]}, {'title': 'No id'}, {'id': '1'}],
+            format='json',
+        )
+
+        self.assertEqual(deleted.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in deleted.data['results']],
+            [400, 400, 400, 400],
+        )
+        self.assertEqual(updated.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in updated.data['results']],
+            [400, 400, 400, 400],
+        )
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+    def test_bulk_requires_list(self):
+        """
+        Test that the payload must be a list of items
+        """
+        res = self.client.post(RECIPES_BULK_URL, {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrivateTagBulkAPITests(TestCase):
+    """
+    Test the bulk tags API
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_tags(self):
+        """
+        Test creating several tags for the user
+        """
+        payload = [{'name': 'Vegan'}, {'name': ''}, {'name': 'Dessert'}]
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [r['status'] for r in res.data['results']],
+            [201, 400, 201],
+        )
+        self.assertEqual(
+            set(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True,
+            )),
+            {'Vegan', 'Dessert'},
+        )
+
+    def test_bulk_update_tags(self):
+        """
+        Test renaming several tags
+        """
+        tag = sample_tag(user=self.user, name='Vegan')
+
+        res = self.client.patch(
+            TAGS_BULK_URL,
+            [{'id': tag.id, 'name': 'Vegetarian'}],
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Vegetarian')
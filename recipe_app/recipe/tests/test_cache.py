@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import get_user_version
+from core.models import Recipe
+from recipe import images
+from utils.test_utils import sample_user, sample_recipe, sample_tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Test the per user cache of list responses
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """
+        Test that repeating a list request does not query the database
+        """
+        sample_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+
+        with CaptureQueriesContext(connection) as context:
+            res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(res1['ETag'], res2['ETag'])
+
+    def test_if_none_match_not_modified(self):
+        """
+        Test that sending back the ETag of an unchanged list returns 304
+        """
+        res = self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_changes_invalidate_list(self):
+        """
+        Test that creating, linking and deleting objects refresh the list
+        """
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['tags'], [tag.id])
+
+        tag.delete()
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.data['results'][0]['tags'], [])
+
+    def test_other_users_changes_keep_cache(self):
+        """
+        Test that changes by another user do not invalidate the list
+        """
+        res = self.client.get(TAGS_URL)
+
+        sample_tag(user=sample_user(email='other@rafacorp.com'))
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bulk_changes_invalidate_list(self):
+        """
+        Test that bulk requests refresh the list
+        """
+        self.client.get(TAGS_URL)
+
+        self.client.post(
+            reverse('recipe:tag-bulk'),
+            [{'name': 'Vegan'}],
+            format='json',
+        )
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data['results']],
+            ['Vegan'],
+        )
+
+    def test_image_status_invalidates_list(self):
+        """
+        Test that the outcome of processing an image refreshes the list
+        """
+        recipe = sample_recipe(user=self.user)
+        version = get_user_version(self.user.pk)
+
+        Recipe.objects.filter(pk=recipe.pk).update(image='missing.jpg')
+        with self.assertLogs('recipe.images', 'ERROR'):
+            images.process_recipe_image(recipe.pk)
+
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }})
+    def test_dummy_cache_disables_etag(self):
+        """
+        Test that lists are served without an ETag when nothing is cached
+        """
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.has_header('ETag'))
+
+    @override_settings(SERVER_PROCESSES=4)
+    def test_process_local_cache_with_several_processes(self):
+        """
+        Test that lists are not cached in the memory of one process while
+        other processes serve requests too
+        """
+        self.client.get(TAGS_URL)
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(TAGS_URL)
+
+        self.assertTrue(context.captured_queries)
+        self.assertFalse(res.has_header('ETag'))
+
+    def test_shared_cache_with_several_processes(self):
+        """
+        Test that lists are cached when the cache is shared by processes
+        """
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with override_settings(SERVER_PROCESSES=4, CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            res = self.client.get(TAGS_URL)
+
+        self.assertTrue(res.has_header('ETag'))
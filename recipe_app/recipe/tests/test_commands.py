@@ -0,0 +1,272 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from core import search
+from core.models import Change, Recipe
+from recipe import benchmark
+from utils.test_utils import sample_user, sample_recipe, sample_tag
+
+
+class BenchmarkFiltersCommandTests(TestCase):
+    def test_benchmark_filters_rolls_back(self):
+        """
+        Test that the filter benchmark reports timings and leaves no data
+        """
+        out = StringIO()
+        call_command(
+            'benchmark_filters',
+            sizes=[10, 20],
+            repeat=1,
+            stdout=out,
+        )
+
+        self.assertIn('tags_mode=all', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class BenchmarkSerializersCommandTests(TestCase):
+    def test_benchmark_serializers_rolls_back(self):
+        """
+        Test that the serializer benchmark compares both list serializers
+        and leaves no data
+        """
+        out = StringIO()
+        call_command(
+            'benchmark_serializers',
+            sizes=[5, 10],
+            repeat=1,
+            stdout=out,
+        )
+
+        self.assertIn('fast path', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ExplainQueriesCommandTests(TestCase):
+    def test_explain_queries_reports_each_query(self):
+        """
+        Test that every main API query is explained for the user
+        """
+        user = sample_user()
+        recipe = sample_recipe(user=user)
+        recipe.tags.add(sample_tag(user=user))
+        out = StringIO()
+
+        call_command('explain_queries', user=user.email, stdout=out)
+
+        self.assertIn('recipe list by all tags:', out.getvalue())
+        self.assertIn('ingredient list assigned only:', out.getvalue())
+
+    def test_explain_queries_without_users(self):
+        """
+        Test that the command fails when there is no user to explain for
+        """
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class BenchmarkRenderersCommandTests(TestCase):
+    def test_benchmark_renderers(self):
+        """
+        Test that the renderer benchmark compares both renderers
+        """
+        out = StringIO()
+
+        call_command(
+            'benchmark_renderers',
+            sizes=[5, 10],
+            repeat=1,
+            stdout=out,
+        )
+
+        self.assertIn('JSONRenderer', out.getvalue())
+
+
+class BenchmarkApiCommandTests(TestCase):
+    def test_benchmark_api_saves_results(self):
+        """
+        Test that the API benchmark keeping its library seeds it once and
+        saves the results of every scenario
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            for _ in range(2):
+                call_command(
+                    'benchmark_api',
+                    users=1,
+                    recipes=5,
+                    requests=3,
+                    cold=True,
+                    output=path,
+                    keep=True,
+                    stdout=StringIO(),
+                )
+            with open(path) as file:
+                results = json.load(file)
+
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertIn('recipe search', results['scenarios'])
+        for result in results['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 3)
+            self.assertGreater(result['queries']['mean'], 0)
+            self.assertLessEqual(
+                result['latency_ms']['p50'],
+                result['latency_ms']['p99'],
+            )
+
+    def test_benchmark_api_regression(self):
+        """
+        Test that the API benchmark fails when latency grew past the
+        tolerance of a compared run
+        """
+        baseline = {'scenarios': {'tag list': {'latency_ms': {'p95': 0}}}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+
+            with self.assertRaises(CommandError):
+                call_command(
+                    'benchmark_api',
+                    users=1,
+                    recipes=1,
+                    requests=1,
+                    scenario=['tag list'],
+                    compare=path,
+                    keep=True,
+                    stdout=StringIO(),
+                    stderr=StringIO(),
+                )
+
+    @patch('recipe.benchmark.HttpDriver')
+    def test_benchmark_api_server_deletes_seeded_users(self, driver):
+        """
+        Test that the API benchmark run against a server deletes the users
+        it seeded, and only those
+        """
+        # requests sent in process stand in for the server
+        driver.side_effect = lambda token, url: benchmark.ClientDriver(token)
+        user = sample_user()
+        sample_recipe(user=user)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command(
+                'benchmark_api',
+                users=1,
+                recipes=5,
+                requests=1,
+                scenario=['recipe list'],
+                url='http://localhost:8000',
+                output=path,
+                stdout=StringIO(),
+            )
+            with open(path) as file:
+                results = json.load(file)
+
+        self.assertEqual(results['scenarios']['recipe list']['errors'], 0)
+        self.assertEqual(list(get_user_model().objects.all()), [user])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+
+class BenchmarkApiDataTests(TransactionTestCase):
+    @skipUnless(
+        connection.vendor == 'postgresql',
+        'SQLite test databases are all the same in memory one',
+    )
+    def test_benchmark_api_throwaway_database(self):
+        """
+        Test that the API benchmark run in process leaves the configured
+        database alone
+        """
+        out = StringIO()
+
+        call_command(
+            'benchmark_api', users=1, recipes=5, requests=1, stdout=out,
+        )
+
+        self.assertIn('recipe list', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+
+
+class SeedDataCommandTests(TestCase):
+    def seed(self, email, **options):
+        call_command(
+            'seed_data',
+            email=email,
+            users=2,
+            recipes=15,
+            tags=5,
+            ingredients=12,
+            batch_size=10,
+            stdout=StringIO(),
+            **options
+        )
+        return [
+            (
+                recipe.title,
+                recipe.time_minutes,
+                recipe.price,
+                sorted(obj.name for obj in recipe.tags.all()),
+                sorted(obj.name for obj in recipe.ingredients.all()),
+            )
+            for recipe in Recipe.objects.filter(
+                user__email__startswith=email.split('{')[0],
+            ).order_by('id').prefetch_related('tags', 'ingredients')
+        ]
+
+    def test_seed_data(self):
+        """
+        Test that users are seeded with linked and logged recipes, and
+        skipped when seeding again
+        """
+        recipes = self.seed('seed-{index}@example.com')
+        self.seed('seed-{index}@example.com')
+
+        self.assertEqual(len(recipes), 30)
+        self.assertEqual(Recipe.objects.count(), 30)
+        for _title, _time, _price, _tags, ingredients in recipes:
+            self.assertGreaterEqual(len(ingredients), 3)
+        self.assertEqual(
+            Change.objects.filter(model='recipe').count(),
+            30,
+        )
+
+    def test_seed_data_reproducible(self):
+        """
+        Test that the same seed generates the same libraries
+        """
+        first = self.seed('first-{index}@example.com', seed=7)
+        second = self.seed('second-{index}@example.com', seed=7)
+        other = self.seed('other-{index}@example.com', seed=8)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    @skipUnless(
+        search.is_supported(Recipe),
+        'COPY needs PostgreSQL',
+    )
+    def test_seed_data_copy(self):
+        """
+        Test that loading with COPY matches bulk inserts, search vectors
+        included
+        """
+        copied = self.seed('copy-{index}@example.com')
+        inserted = self.seed('insert-{index}@example.com', no_copy=True)
+
+        self.assertEqual(copied, inserted)
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=True).exists(),
+        )
@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe import export
+from utils.test_utils import (
+    sample_user,
+    sample_recipe,
+    sample_tag,
+    sample_ingredient,
+)
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def read_ndjson(content):
+    """
+    Return the documents of an NDJSON export
+    """
+    return [json.loads(line) for line in content.splitlines()]
+
+
+class RecipeExportTests(TestCase):
+    """
+    Test exporting the recipe library of a user
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_export_requires_auth(self):
+        """
+        Test that authentication is required to export recipes
+        """
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """
+        Test streaming the user's recipes with their related names
+        """
+        recipe = sample_recipe(user=self.user, title='Pancakes')
+        recipe.tags.add(
+            sample_tag(user=self.user, name='Sweet'),
+            sample_tag(user=self.user, name='Breakfast'),
+        )
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user, title='Toast')
+        sample_recipe(user=sample_user(email='other@rafacorp.com'))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = read_ndjson(b''.join(res.streaming_content).decode())
+        self.assertEqual([row['type'] for row in rows], ['recipe', 'recipe'])
+        self.assertEqual([row['title'] for row in rows], ['Pancakes', 'Toast'])
+        self.assertEqual(rows[0]['tags'], ['Breakfast', 'Sweet'])
+        self.assertEqual(rows[0]['ingredients'], ['Salt'])
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(rows[1]['tags'], [])
+
+    def test_export_csv(self):
+        """
+        Test streaming the user's recipes as CSV
+        """
+        recipe = sample_recipe(user=self.user, title='Pancakes, American')
+        recipe.tags.add(
+            sample_tag(user=self.user, name='Sweet'),
+            sample_tag(user=self.user, name='Breakfast'),
+        )
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Pancakes, American')
+        self.assertEqual(rows[0]['tags'], 'Breakfast;Sweet')
+
+    def test_export_unused_tags_and_ingredients(self):
+        """
+        Test that tags and ingredients no recipe uses are exported as
+        records of their own
+        """
+        recipe = sample_recipe(user=self.user, title='Pancakes')
+        recipe.tags.add(sample_tag(user=self.user, name='Sweet'))
+        unused_tag = sample_tag(user=self.user, name='Vegan')
+        unused_ingredient = sample_ingredient(user=self.user, name='Kale')
+        sample_tag(user=sample_user(email='other@rafacorp.com'))
+
+        ndjson = self.client.get(EXPORT_URL)
+        content = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        rows = read_ndjson(b''.join(ndjson.streaming_content).decode())
+        self.assertEqual(rows[1:], [
+            {'type': 'tag', 'id': unused_tag.id, 'name': 'Vegan'},
+            {
+                'type': 'ingredient',
+                'id': unused_ingredient.id,
+                'name': 'Kale',
+            },
+        ])
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(content.streaming_content).decode(),
+        )))
+        self.assertEqual(
+            [row['type'] for row in rows], ['recipe', 'tag', 'ingredient'],
+        )
+        self.assertEqual(rows[1]['id'], str(unused_tag.id))
+        self.assertEqual(rows[1]['tags'], 'Vegan')
+        self.assertEqual(rows[2]['ingredients'], 'Kale')
+        self.assertEqual(rows[2]['title'], '')
+
+    def test_export_csv_escapes_formulas(self):
+        """
+        Test that text cells spreadsheets would run as formulas are
+        prefixed with a quote
+        """
+        recipe = sample_recipe(
+            user=self.user, title='=HYPERLINK("http://x")', link='@SUM(1)',
+        )
+        recipe.tags.add(sample_tag(user=self.user, name='-1+2'))
+        sample_ingredient(user=self.user, name='+cmd')
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        rows = list(csv.DictReader(io.StringIO(
+            b''.join(res.streaming_content).decode(),
+        )))
+        self.assertEqual(rows[0]['title'], "'=HYPERLINK(\"http://x\")")
+        self.assertEqual(rows[0]['link'], "'@SUM(1)")
+        self.assertEqual(rows[0]['tags'], "'-1+2")
+        self.assertEqual(rows[1]['ingredients'], "'+cmd")
+        self.assertEqual(rows[0]['price'], '5.00')
+
+    def test_export_invalid_format(self):
+        """
+        Test that unknown export formats are rejected
+        """
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('export_format', res.data)
+
+    def test_export_queries_per_chunk(self):
+        """
+        Test that related names are fetched once per chunk, not per recipe
+        """
+        tag = sample_tag(user=self.user)
+        for i in range(5):
+            sample_recipe(user=self.user, title=f'Recipe {i}').tags.add(tag)
+
+        with CaptureQueriesContext(connection) as context:
+            rows = list(export.iter_recipes(self.user, chunk_size=2))
+
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row['tags'] == [tag.name] for row in rows))
+        # three chunks, each with a query per relation, and the recipes
+        self.assertLessEqual(len(context.captured_queries), 1 + 3 * 2)
+
+
+class ExportRecipesCommandTests(TestCase):
+    def test_export_recipes_command(self):
+        """
+        Test that the command writes the recipes of the user
+        """
+        user = sample_user()
+        sample_recipe(user=user, title='Pancakes')
+        out = StringIO()
+
+        call_command('export_recipes', user.email, chunk_size=1, stdout=out)
+
+        rows = read_ndjson(out.getvalue())
+        self.assertEqual([row['title'] for row in rows], ['Pancakes'])
+
+    def test_export_recipes_unknown_user(self):
+        """
+        Test that the command fails for unknown users
+        """
+        with self.assertRaises(CommandError):
+            call_command('export_recipes', 'nobody@rafacorp.com')
@@ -0,0 +1,162 @@
+import datetime
+import io
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from core.models import Recipe
+from recipe import images
+from recipe.serializers import RecipeSerializer
+from utils.test_utils import sample_user, sample_recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def sample_image_bytes(size=(800, 600), orientation=None):
+    """
+    Return a JPEG image, optionally tagged with an EXIF orientation
+    """
+    buffer = io.BytesIO()
+    img = Image.new('RGB', size, color='red')
+    exif = b''
+    if orientation:
+        # minimal little endian TIFF block holding only the orientation
+        exif = (
+            b'Exif\x00\x00II*\x00\x08\x00\x00\x00\x01\x00'
+            b'\x12\x01\x03\x00\x01\x00\x00\x00'
+            + bytes([orientation]) + b'\x00\x00\x00\x00\x00\x00\x00'
+        )
+    img.save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class RenderVariantsTests(TestCase):
+    def test_variants_fit_sizes(self):
+        """
+        Test that a variant is rendered per size and format
+        """
+        variants = images.render_variants(
+            sample_image_bytes(),
+            {'thumbnail': 150, 'large': 1280},
+            ('jpeg', 'webp'),
+        )
+
+        self.assertEqual(len(variants), 4)
+        thumbnail = Image.open(io.BytesIO(variants[('thumbnail', 'webp')]))
+        self.assertEqual(thumbnail.format, 'WEBP')
+        # Pillow versions round the shorter side differently
+        width, height = thumbnail.size
+        self.assertEqual(width, 150)
+        self.assertLessEqual(abs(height - 150 * 600 / 800), 1)
+        large = Image.open(io.BytesIO(variants[('large', 'jpeg')]))
+        self.assertEqual(large.size, (800, 600))
+
+    def test_variants_strip_exif(self):
+        """
+        Test that variants are rotated upright and carry no EXIF data
+        """
+        data = sample_image_bytes(orientation=6)
+        self.assertIn('exif', Image.open(io.BytesIO(data)).info)
+
+        variants = images.render_variants(data, {'small': 480}, ('jpeg',))
+
+        variant = Image.open(io.BytesIO(variants[('small', 'jpeg')]))
+        self.assertEqual(variant.size, (360, 480))
+        self.assertNotIn('exif', variant.info)
+
+    def test_variants_keep_transparency(self):
+        """
+        Test that transparent areas stay transparent in WebP variants and
+        turn white, not black, in JPEG variants
+        """
+        for mode, color in (('RGBA', (0, 0, 0, 0)), ('P', 0)):
+            img = Image.new(mode, (40, 40), color=color)
+            if mode == 'P':
+                img.putpalette([0, 0, 0] * 256)
+                img.info['transparency'] = 0
+            buffer = io.BytesIO()
+            img.save(buffer, format='PNG')
+
+            variants = images.render_variants(
+                buffer.getvalue(), {'small': 20}, ('jpeg', 'webp'),
+            )
+
+            jpeg = Image.open(io.BytesIO(variants[('small', 'jpeg')]))
+            self.assertEqual(jpeg.mode, 'RGB')
+            self.assertGreater(min(jpeg.getpixel((10, 10))), 250)
+            webp = Image.open(io.BytesIO(variants[('small', 'webp')]))
+            self.assertEqual(webp.mode, 'RGBA')
+            self.assertEqual(webp.getpixel((10, 10))[3], 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ProcessRecipeImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.recipe = sample_recipe(user=sample_user())
+
+    def test_process_image_stores_variants(self):
+        """
+        Test that processing stores the variants and marks the image ready
+        """
+        self.recipe.image.save('photo.jpg', ContentFile(sample_image_bytes()))
+
+        images.process_recipe_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        storage = self.recipe.image.storage
+        for paths in images.variant_paths(self.recipe.image.name).values():
+            for path in paths.values():
+                self.assertTrue(storage.exists(path))
+
+        data = RecipeSerializer(self.recipe).data
+        self.assertEqual(
+            set(data['image_variants']),
+            {'thumbnail', 'small', 'large'},
+        )
+
+    def test_process_invalid_image_fails(self):
+        """
+        Test that an unreadable image is marked as failed
+        """
+        self.recipe.image.save('photo.jpg', ContentFile(b'not an image'))
+
+        with self.assertLogs('recipe.images', level='ERROR'):
+            images.process_recipe_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        data = RecipeSerializer(self.recipe).data
+        self.assertEqual(data['image_variants'], {})
+
+    def test_process_stuck_images(self):
+        """
+        Test that images left processing for too long are processed again,
+        and that recent ones are left to their job
+        """
+        self.recipe.image.save('photo.jpg', ContentFile(sample_image_bytes()))
+        recent = sample_recipe(user=self.recipe.user)
+        recent.image.save('photo.jpg', ContentFile(sample_image_bytes()))
+        Recipe.objects.update(image_status=Recipe.IMAGE_PROCESSING)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        out = io.StringIO()
+
+        call_command('process_images', age=600, stdout=out)
+
+        self.recipe.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(recent.image_status, Recipe.IMAGE_PROCESSING)
+        self.assertIn('Processed 1 images, 0 failed', out.getvalue())
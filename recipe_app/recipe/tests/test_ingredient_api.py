@@ -6,6 +6,7 @@ from rest_framework.test import APIClient
 
 from core.models import Ingredient
 from utils.test_utils import sample_user, sample_ingredient, sample_recipe
+from recipe.filters import annotate_recipe_count
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
@@ -47,10 +48,12 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL)
 
-        ingredients = Ingredient.objects.all().order_by('-name')
+        ingredients = annotate_recipe_count(
+            Ingredient.objects.all(),
+        ).order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_list_ingredients_only_for_current_user(self):
         """
@@ -67,8 +70,8 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def create_ingredient_successful(self):
         """
@@ -108,10 +111,11 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        serializer1 = IngredientSerializer(ingredient1)
-        serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        ingredients = annotate_recipe_count(Ingredient.objects.all())
+        serializer1 = IngredientSerializer(ingredients.get(pk=ingredient1.pk))
+        serializer2 = IngredientSerializer(ingredients.get(pk=ingredient2.pk))
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_ingredients_assigned_unique(self):
         """
@@ -132,4 +136,54 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_ingredients_recipe_count(self):
+        """
+        Test that ingredients carry the number of recipes using them
+        """
+        ingredient1 = sample_ingredient(user=self.user, name='Eggs')
+        ingredient2 = sample_ingredient(user=self.user, name='Cheese')
+        recipe1 = sample_recipe(user=self.user, title='Omelette')
+        recipe2 = sample_recipe(user=self.user, title='Frittata')
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2.ingredients.add(ingredient1)
+
+        res = self.client.get(INGREDIENTS_URL)
+
+        counts = {
+            ingredient['id']: ingredient['recipe_count']
+            for ingredient in res.data['results']
+        }
+        self.assertEqual(counts, {ingredient1.id: 2, ingredient2.id: 1})
+
+    def test_list_ingredients_by_usage(self):
+        """
+        Test ordering ingredients by the number of recipes using them, across
+        pages
+        """
+        ingredient1 = sample_ingredient(user=self.user, name='Eggs')
+        ingredient2 = sample_ingredient(user=self.user, name='Cheese')
+        ingredient3 = sample_ingredient(user=self.user, name='Flour')
+        recipe1 = sample_recipe(user=self.user, title='Omelette')
+        recipe2 = sample_recipe(user=self.user, title='Frittata')
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2.ingredients.add(ingredient1)
+
+        res = self.client.get(
+            INGREDIENTS_URL,
+            {'ordering': '-recipe_count', 'page_size': 2},
+        )
+        ids = [ingredient['id'] for ingredient in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [ingredient['id'] for ingredient in res.data['results']]
+
+        self.assertEqual(ids, [ingredient1.id, ingredient2.id, ingredient3.id])
+
+    def test_list_ingredients_invalid_ordering(self):
+        """
+        Test that an unknown ordering is rejected
+        """
+        res = self.client.get(INGREDIENTS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
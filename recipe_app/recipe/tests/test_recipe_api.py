@@ -1,21 +1,29 @@
 
 import tempfile
 import os
+from unittest import skipUnless
 from PIL import Image
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import search
+from core.metrics import REGISTRY
 from core.models import Recipe
 from utils.test_utils import (
     sample_user,
     sample_recipe,
     sample_ingredient,
     sample_tag,
+    assert_constant_queries,
 )
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
@@ -74,7 +82,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_list_recipes_only_for_current_user(self):
         """
@@ -87,8 +95,8 @@ class PrivateRecipeAPITests(TestCase):
         res = self.client.get(RECIPES_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['title'], recipe.title)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['title'], recipe.title)
 
     def test_view_recipe_detail(self):
         """
@@ -234,9 +242,9 @@ class PrivateRecipeAPIFiltersTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """
@@ -258,9 +266,495 @@ class PrivateRecipeAPIFiltersTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_recipes_by_tags_unique(self):
+        """
+        Test that a recipe matching several tags is returned only once
+        """
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}'},
+        )
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_recipes_by_all_tags(self):
+        """
+        Test returning recipes that have every requested tag
+        """
+        recipe1 = sample_recipe(user=self.user, title='Vegan brownies')
+        recipe2 = sample_recipe(user=self.user, title='Vegan curry')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'tags_mode': 'all'},
+        )
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe1.id],
+        )
+
+    def test_filter_recipes_by_all_ingredients(self):
+        """
+        Test returning recipes that have every requested ingredient
+        """
+        recipe1 = sample_recipe(user=self.user, title='Cheese omelette')
+        recipe2 = sample_recipe(user=self.user, title='Boiled eggs')
+        ing1 = sample_ingredient(user=self.user, name='Eggs')
+        ing2 = sample_ingredient(user=self.user, name='Cheese')
+        recipe1.ingredients.add(ing1, ing2)
+        recipe2.ingredients.add(ing1)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'ingredients': f'{ing1.id},{ing2.id}', 'ingredients_mode': 'all'},
+        )
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe1.id],
+        )
+
+    def test_filter_recipes_invalid_mode(self):
+        """
+        Test that an unknown matching mode is rejected
+        """
+        tag = sample_tag(user=self.user)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag.id}', 'tags_mode': 'some'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PrivateRecipeAPISearchTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        """
+        Return the ids of the recipes found for a search
+        """
+        res = self.client.get(RECIPES_URL, {'search': query, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_recipes_by_title_prefix(self):
+        """
+        Test finding recipes by the start of the words in their title
+        """
+        recipe = sample_recipe(user=self.user, title='Blueberry pancakes')
+        sample_recipe(user=self.user, title='Fish and chips')
+        sample_recipe(
+            user=sample_user(email='other@rafacorp.com'),
+            title='Plain pancakes',
+        )
+
+        self.assertEqual(self.search('pancak blue'), [recipe.id])
+
+    def test_search_recipes_by_related_names(self):
+        """
+        Test finding recipes by the names of their tags and ingredients
+        """
+        recipe1 = sample_recipe(user=self.user, title='Curry')
+        recipe1.tags.add(sample_tag(user=self.user, name='Vegan'))
+        recipe2 = sample_recipe(user=self.user, title='Omelette')
+        recipe2.ingredients.add(sample_ingredient(user=self.user, name='Egg'))
+
+        self.assertEqual(self.search('vegan'), [recipe1.id])
+        self.assertEqual(self.search('egg'), [recipe2.id])
+
+    def test_search_follows_related_changes(self):
+        """
+        Test that renamed and removed tags are reflected in the search
+        """
+        recipe = sample_recipe(user=self.user, title='Curry')
+        tag = sample_tag(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        tag.name = 'Spicy'
+        tag.save()
+        self.assertEqual(self.search('vegan'), [])
+        self.assertEqual(self.search('spicy'), [recipe.id])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.search('spicy'), [])
+
+    def test_search_follows_bulk_updates(self):
+        """
+        Test that recipes changed by bulk requests are searchable
+        """
+        recipe = sample_recipe(user=self.user, title='Curry')
+        tag = sample_tag(user=self.user, name='Vegan')
+
+        self.client.patch(
+            reverse('recipe:recipe-bulk'),
+            [{'id': recipe.id, 'tags': [tag.id]}],
+            format='json',
+        )
+
+        self.assertEqual(self.search('vegan'), [recipe.id])
+
+    def test_search_without_words(self):
+        """
+        Test that a search without words finds nothing
+        """
+        sample_recipe(user=self.user)
+
+        self.assertEqual(self.search('& !'), [])
+
+    def test_blank_search(self):
+        """
+        Test that a blank search lists every recipe, newest first
+        """
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+
+        self.assertEqual(self.search(''), [recipe2.id, recipe1.id])
+        self.assertEqual(self.search('  '), [recipe2.id, recipe1.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs full text search')
+    def test_saving_unsearched_fields(self):
+        """
+        Test that the search vector is only recomputed when searched
+        fields may have changed
+        """
+        recipe = sample_recipe(user=self.user, title='Curry')
+
+        recipe.time_minutes = 20
+        with CaptureQueriesContext(connection) as unsearched:
+            recipe.save(update_fields=['time_minutes'])
+        recipe.title = 'Stew'
+        with CaptureQueriesContext(connection) as searched:
+            recipe.save(update_fields=['title'])
+
+        def vector_updates(context):
+            return [
+                query for query in context.captured_queries
+                if '"search_vector" =' in query['sql']
+            ]
+        self.assertEqual(vector_updates(unsearched), [])
+        self.assertEqual(len(vector_updates(searched)), 1)
+        self.assertEqual(self.search('stew'), [recipe.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs full text search')
+    def test_search_ranks_title_matches_first(self):
+        """
+        Test that title matches rank above tag matches and that pages of
+        ranked results can be followed
+        """
+        by_tag = sample_recipe(user=self.user, title='Toast')
+        by_tag.tags.add(sample_tag(user=self.user, name='Breakfast'))
+        by_title = sample_recipe(user=self.user, title='Breakfast burrito')
+
+        self.assertEqual(self.search('breakfast'), [by_title.id, by_tag.id])
+
+        res = self.client.get(RECIPES_URL, {
+            'search': 'breakfast',
+            'page_size': 1,
+        })
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [by_tag.id],
+        )
+
+    def test_search_pages_tied_ranks(self):
+        """
+        Test that following the cursor returns every match once when more
+        matches than the pagination offset cutoff rank the same
+        """
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=self.user,
+                title='Tomato soup',
+                time_minutes=5,
+                price=5,
+            )
+            for _ in range(RecipeCursorPagination.offset_cutoff + 300)
+        )
+        recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+        search.update_search_vectors(Recipe, recipe_ids)
+
+        ids = []
+        url, params = RECIPES_URL, {'search': 'soup', 'page_size': 100}
+        pages = 0
+        while url and pages <= len(recipe_ids) // 100:
+            res = self.client.get(url, params)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+            pages += 1
+
+        self.assertIsNone(url)
+        self.assertEqual(sorted(ids), sorted(recipe_ids))
+
+
+class PrivateRecipeAPIConditionalTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def test_retrieve_sets_validators(self):
+        """
+        Test that recipe details carry an ETag and Last-Modified header
+        """
+        res = self.client.get(DETAIL_URL(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.has_header('ETag'))
+        self.assertTrue(res.has_header('Last-Modified'))
+
+    def test_retrieve_not_modified_skips_serializer(self):
+        """
+        Test that a current ETag returns 304 with a single query
+        """
+        res = self.client.get(DETAIL_URL(self.recipe.id))
+
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(
+                DETAIL_URL(self.recipe.id),
+                HTTP_IF_NONE_MATCH=res['ETag'],
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_retrieve_if_modified_since(self):
+        """
+        Test that a current Last-Modified date returns 304
+        """
+        res = self.client.get(DETAIL_URL(self.recipe.id))
+
+        res = self.client.get(
+            DETAIL_URL(self.recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_related_changes_modify_recipe(self):
+        """
+        Test that adding and renaming tags return the new details
+        """
+        res = self.client.get(DETAIL_URL(self.recipe.id))
+        tag = sample_tag(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(
+            DETAIL_URL(self.recipe.id),
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(
+            DETAIL_URL(self.recipe.id),
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_bulk_update_modifies_recipe(self):
+        """
+        Test that bulk updates move the modification time forward
+        """
+        updated_at = self.recipe.updated_at
+
+        self.client.patch(
+            reverse('recipe:recipe-bulk'),
+            [{'id': self.recipe.id, 'title': 'New title'}],
+            format='json',
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, updated_at)
+
+    def test_retrieve_other_users_recipe(self):
+        """
+        Test that conditional requests do not reveal other users' recipes
+        """
+        recipe = sample_recipe(user=sample_user(email='other@rafacorp.com'))
+
+        res = self.client.get(DETAIL_URL(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_invalid_id(self):
+        """
+        Test that ids that are not numbers are not found
+        """
+        res = self.client.get(DETAIL_URL('abc'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PrivateRecipeAPIPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_recipes_paginated(self):
+        """
+        Test that recipes are returned in pages, newest first
+        """
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[2].id, recipes[1].id],
+        )
+        self.assertIsNone(res.data['previous'])
+        self.assertIsNotNone(res.data['next'])
+
+    def test_list_recipes_follow_cursor(self):
+        """
+        Test that following the next cursor returns the remaining recipes
+        """
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipes[0].id],
+        )
+        self.assertIsNone(res.data['next'])
+
+    def test_list_recipes_invalid_cursor(self):
+        """
+        Test that a tampered cursor is rejected
+        """
+        res = self.client.get(RECIPES_URL, {'cursor': 'notacursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PrivateRecipeAPIQueriesTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _add_recipes(self, count):
+        """
+        Add recipes with a tag and an ingredient each
+        """
+        for _ in range(count):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(sample_tag(user=self.user))
+            recipe.ingredients.add(sample_ingredient(user=self.user))
+
+    def test_list_recipes_constant_queries(self):
+        """
+        Test that listing recipes does not query once per recipe
+        """
+        assert_constant_queries(
+            self,
+            lambda: self.client.get(RECIPES_URL),
+            self._add_recipes,
+        )
+
+    def test_view_recipe_detail_constant_queries(self):
+        """
+        Test that a recipe detail does not query once per tag or ingredient
+        """
+        recipe = sample_recipe(user=self.user)
+
+        def add_related(count):
+            for _ in range(count):
+                recipe.tags.add(sample_tag(user=self.user))
+                recipe.ingredients.add(sample_ingredient(user=self.user))
+
+        assert_constant_queries(
+            self,
+            lambda: self.client.get(DETAIL_URL(recipe.id)),
+            add_related,
+        )
+
+
+class PrivateRecipeAPIFastPathTests(TestCase):
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_content(self, fast_path, params=None):
+        """
+        Return the raw content of a recipe list response
+        """
+        cache.clear()
+        with override_settings(RECIPE_LIST_FAST_PATH=fast_path):
+            res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.content
+
+    def test_fast_path_matches_serializer(self):
+        """
+        Test that the fast path renders the same bytes as RecipeSerializer
+        """
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredient = sample_ingredient(user=self.user)
+        recipe1 = sample_recipe(user=self.user, price='10.50', link='x.com')
+        recipe1.tags.add(tags[2], tags[0])
+        recipe1.ingredients.add(ingredient)
+        recipe2 = sample_recipe(
+            user=self.user,
+            image='uploads/recipe/photo.jpg',
+            image_status=Recipe.IMAGE_READY,
+        )
+        recipe2.tags.add(tags[1])
+        sample_recipe(user=self.user, image_status=Recipe.IMAGE_FAILED)
+
+        self.assertEqual(
+            self.list_content(fast_path=True),
+            self.list_content(fast_path=False),
+        )
+
+    def test_fast_path_matches_serializer_pages(self):
+        """
+        Test that the fast path returns the same pages and cursors
+        """
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        self.assertEqual(
+            self.list_content(True, {'page_size': 2, 'search': 'recipe'}),
+            self.list_content(False, {'page_size': 2, 'search': 'recipe'}),
+        )
 
 
 class RecipeImageUploadTests(TestCase):
@@ -292,10 +786,28 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PROCESSING)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_size_recorded(self):
+        """
+        Test that the size of uploaded images is recorded
+        """
+        url = IMAGE_UPLOAD_URL(self.recipe.id)
+        uploads = REGISTRY.collect()['recipe_image_upload_bytes'].get(())
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            size = ntf.tell()
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+        self.recipe.refresh_from_db()
+
+        counts = REGISTRY.collect()['recipe_image_upload_bytes'][()]
+        self.assertEqual(counts[-1], (uploads[-1] if uploads else 0) + size)
+
     def test_upload_image_bad_request(self):
         """
         Test uploading an invalid image
@@ -307,3 +819,23 @@ class RecipeImageUploadTests(TestCase):
         )
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_image_too_large(self):
+        """
+        Test that uploads over the size limit are rejected
+        """
+        url = IMAGE_UPLOAD_URL(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (100, 100))
+            img.save(ntf, format='JPEG')
+            ntf.seek(0)
+
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.assertFalse(self.recipe.image)
@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from utils.test_utils import (
+    sample_user,
+    sample_recipe,
+    sample_tag,
+    sample_ingredient,
+)
+
+STATS_URL = reverse('recipe:stats')
+
+
+class PublicStatsAPITests(TestCase):
+    """
+    Test the publicly available stats API
+    """
+
+    def test_login_required(self):
+        """
+        Test that login is required to read the stats
+        """
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsAPITests(TestCase):
+    """
+    Test the authorized user stats API
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_library(self):
+        """
+        Test the stats of a user without recipes
+        """
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes']['count'], 0)
+        self.assertIsNone(res.data['recipes']['average_time_minutes'])
+        self.assertIsNone(res.data['recipes']['price']['average'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_library_stats(self):
+        """
+        Test the recipe totals, price distribution and usage counts
+        """
+        vegan = sample_tag(user=self.user, name='Vegan')
+        sample_tag(user=self.user, name='Unused')
+        salt = sample_ingredient(user=self.user, name='Salt')
+        pepper = sample_ingredient(user=self.user, name='Pepper')
+        recipe1 = sample_recipe(user=self.user, time_minutes=10, price='4.00')
+        recipe1.tags.add(vegan)
+        recipe1.ingredients.add(salt, pepper)
+        recipe2 = sample_recipe(user=self.user, time_minutes=25, price='60')
+        recipe2.ingredients.add(salt)
+        other = sample_user(email='other@rafacorp.com')
+        sample_recipe(user=other).tags.add(sample_tag(user=other))
+
+        res = self.client.get(STATS_URL)
+
+        recipes = res.data['recipes']
+        self.assertEqual(recipes['count'], 2)
+        self.assertEqual(recipes['average_time_minutes'], 17.5)
+        self.assertEqual(recipes['price']['min'], '4.00')
+        self.assertEqual(recipes['price']['max'], '60.00')
+        self.assertEqual(recipes['price']['average'], '32.00')
+        distribution = recipes['price']['distribution']
+        self.assertEqual(distribution[0], {
+            'min': None, 'max': '5.00', 'count': 1,
+        })
+        self.assertEqual(distribution[-1], {
+            'min': '50.00', 'max': None, 'count': 1,
+        })
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Vegan', 1), ('Unused', 0)],
+        )
+        self.assertEqual(
+            [(i['name'], i['recipe_count'])
+             for i in res.data['top_ingredients']],
+            [('Salt', 2), ('Pepper', 1)],
+        )
+
+    def test_stats_queries(self):
+        """
+        Test that the stats take two queries and are then cached
+        """
+        for i in range(3):
+            recipe = sample_recipe(user=self.user)
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(STATS_URL)
+        self.assertEqual(len(context.captured_queries), 2)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(STATS_URL)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_stats_invalidated_by_changes(self):
+        """
+        Test that changes to the library refresh the cached stats
+        """
+        self.client.get(STATS_URL)
+
+        sample_recipe(user=self.user)
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipes']['count'], 1)
@@ -0,0 +1,280 @@
+import datetime
+import threading
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Tag
+from utils.test_utils import (
+    sample_user,
+    sample_recipe,
+    sample_tag,
+    sample_ingredient,
+)
+
+SYNC_URL = reverse('recipe:sync')
+
+
+class PublicSyncAPITests(TestCase):
+    """
+    Test the publicly available sync API
+    """
+
+    def test_login_required(self):
+        """
+        Test that login is required to sync
+        """
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncAPITests(TransactionTestCase):
+    """
+    Test the authorized user sync API, committing changes as clients see
+    them once committed only
+    """
+
+    def setUp(self):
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=0, **params):
+        res = self.client.get(SYNC_URL, {'since': since, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.data
+
+    def test_first_sync_returns_everything(self):
+        """
+        Test that syncing from zero returns all of the user's objects
+        """
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        sample_tag(user=sample_user(email='other@rafacorp.com'))
+
+        data = self.sync()
+
+        self.assertEqual([t['id'] for t in data['tags']['updated']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in data['ingredients']['updated']],
+            [ingredient.id],
+        )
+        self.assertEqual(data['recipes']['updated'][0]['tags'], [tag.id])
+        self.assertFalse(data['more'])
+
+    def test_sync_returns_changes_since_watermark(self):
+        """
+        Test that only objects changed after the watermark are returned,
+        with tombstones for deleted ones
+        """
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe = sample_recipe(user=self.user)
+        watermark = self.sync()['watermark']
+
+        tag1.name = 'Vegetarian'
+        tag1.save()
+        deleted_id = tag2.id
+        tag2.delete()
+
+        data = self.sync(watermark)
+
+        self.assertEqual(
+            [t['name'] for t in data['tags']['updated']],
+            ['Vegetarian'],
+        )
+        self.assertEqual(data['tags']['deleted'], [deleted_id])
+        self.assertEqual(data['recipes']['updated'], [])
+        self.assertGreater(data['watermark'], watermark)
+        self.assertEqual(self.sync(data['watermark'])['tags']['updated'], [])
+        self.assertNotIn(recipe.id, data['recipes']['deleted'])
+
+    def test_sync_reports_related_and_bulk_changes(self):
+        """
+        Test that linking tags and bulk requests are synced
+        """
+        recipe = sample_recipe(user=self.user)
+        watermark = self.sync()['watermark']
+
+        recipe.tags.add(sample_tag(user=self.user))
+        self.client.post(
+            reverse('recipe:ingredient-bulk'),
+            [{'name': 'Salt'}],
+            format='json',
+        )
+        data = self.sync(watermark)
+
+        self.assertEqual(
+            [r['id'] for r in data['recipes']['updated']],
+            [recipe.id],
+        )
+        self.assertEqual(len(data['ingredients']['updated']), 1)
+
+    def test_sync_pages_through_changes(self):
+        """
+        Test that large syncs are split and resumed from the watermark
+        """
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)]
+
+        data = self.sync(page_size=2)
+        self.assertTrue(data['more'])
+        data = self.sync(data['watermark'], page_size=2)
+
+        self.assertFalse(data['more'])
+        self.assertEqual(
+            [t['id'] for t in data['tags']['updated']],
+            [tags[2].id],
+        )
+
+    def test_sync_queries_do_not_grow(self):
+        """
+        Test that the number of queries does not depend on the changes
+        """
+        # so every sync resumes from a watermark
+        sample_tag(user=self.user, name='First')
+        counts = []
+        for size in (1, 10):
+            watermark = self.sync()['watermark']
+            for i in range(size):
+                recipe = sample_recipe(user=self.user)
+                recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            with CaptureQueriesContext(connection) as context:
+                self.sync(watermark)
+            counts.append(len(context.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_sync_invalid_watermark(self):
+        """
+        Test that a watermark must be a positive integer
+        """
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', res.data)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs transaction ids')
+    def test_sync_returns_transactions_whole(self):
+        """
+        Test that the changes of one transaction are returned together,
+        even past the page size
+        """
+        with transaction.atomic():
+            tags = [
+                sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)
+            ]
+
+        data = self.sync(page_size=2)
+
+        self.assertEqual(
+            [t['id'] for t in data['tags']['updated']],
+            [tag.id for tag in tags],
+        )
+        self.assertFalse(self.sync(data['watermark'])['tags']['updated'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs transaction ids')
+    def test_sync_waits_for_running_transactions(self):
+        """
+        Test that changes committed while an older transaction is still
+        running are held back until it ends, so the watermark never moves
+        past the changes it logs
+        """
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow_transaction():
+            try:
+                with transaction.atomic():
+                    sample_tag(user=self.user, name='Slow')
+                    started.set()
+                    finish.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=slow_transaction)
+        thread.start()
+        try:
+            started.wait(10)
+            sample_tag(user=self.user, name='Fast')
+            data = self.sync()
+        finally:
+            finish.set()
+            thread.join()
+
+        self.assertEqual(data['tags']['updated'], [])
+        data = self.sync(data['watermark'])
+        self.assertEqual(
+            sorted(t['name'] for t in data['tags']['updated']),
+            ['Fast', 'Slow'],
+        )
+
+    def test_compacted_log_syncs_the_same(self):
+        """
+        Test that compacting keeps the last change of each object only,
+        without changing what clients receive
+        """
+        tag = sample_tag(user=self.user)
+        for name in ('Vegan', 'Vegetarian'):
+            tag.name = name
+            tag.save()
+        gone = sample_tag(user=self.user, name='Gone')
+        gone_id = gone.id
+        gone.delete()
+        before = self.sync()
+
+        call_command('compact_changes', stdout=StringIO())
+
+        self.assertEqual(
+            Change.objects.filter(model='tag', object_id=tag.id).count(), 1,
+        )
+        after = self.sync()
+        self.assertEqual(after['tags'], before['tags'])
+        self.assertEqual(after['tags']['deleted'], [gone_id])
+
+    def test_resync_after_pruned_tombstones(self):
+        """
+        Test that clients that synced before removed tombstones must start
+        over, while newer watermarks keep working
+        """
+        tag = sample_tag(user=self.user)
+        watermark = self.sync()['watermark']
+        tag.delete()
+        Change.objects.filter(action=Change.DELETED).update(
+            created_at=timezone.now() - datetime.timedelta(days=10),
+        )
+
+        call_command('compact_changes', days=7, stdout=StringIO())
+
+        res = self.client.get(SYNC_URL, {'since': watermark})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        data = self.sync()
+        self.assertEqual(data['tags'], {'updated': [], 'deleted': []})
+        self.assertFalse(Tag.objects.exists())
+        self.assertEqual(self.sync(data['watermark'])['tags']['deleted'], [])
+
+
+class ChangeLogTests(TestCase):
+    def test_deleting_user_drops_change_log(self):
+        """
+        Test that deleting a user removes their change log entries
+        """
+        user = sample_user()
+        sample_recipe(user=user).tags.add(sample_tag(user=user))
+
+        get_user_model().objects.filter(pk=user.pk).delete()
+
+        self.assertFalse(Change.objects.filter(user_id=user.pk).exists())
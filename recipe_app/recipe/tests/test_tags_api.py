@@ -7,6 +7,8 @@ from rest_framework.test import APIClient
 from core.models import Tag
 
 from utils.test_utils import sample_user, sample_tag, sample_recipe
+from recipe.filters import annotate_recipe_count
+from recipe.pagination import RecipeAttrCursorPagination
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -48,10 +50,10 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL)
 
-        tags = Tag.objects.all().order_by('-name')
+        tags = annotate_recipe_count(Tag.objects.all()).order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_list_tags_for_only_current_user(self):
         """
@@ -68,8 +70,8 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def create_tag_successful(self):
         """
@@ -109,10 +111,11 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        serializer1 = TagSerializer(tag1)
-        serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        tags = annotate_recipe_count(Tag.objects.all())
+        serializer1 = TagSerializer(tags.get(pk=tag1.pk))
+        serializer2 = TagSerializer(tags.get(pk=tag2.pk))
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_tags_assigned_unique(self):
         """
@@ -133,4 +136,106 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_list_tags_paginated(self):
+        """
+        Test that tags are paginated by name without repeating entries
+        """
+        sample_tag(user=self.user, name='Lunch')
+        sample_tag(user=self.user, name='Lunch')
+        sample_tag(user=self.user, name='Breakfast')
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        ids = [tag['id'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [tag['name'] for tag in res.data['results']]
+        ids += [tag['id'] for tag in res.data['results']]
+
+        self.assertEqual(names, ['Lunch', 'Lunch', 'Breakfast'])
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_list_tags_recipe_count(self):
+        """
+        Test that tags carry the number of recipes using them
+        """
+        tag1 = sample_tag(user=self.user, name='Eggs')
+        tag2 = sample_tag(user=self.user, name='Cheese')
+        recipe1 = sample_recipe(user=self.user, title='Omelette')
+        recipe2 = sample_recipe(user=self.user, title='Frittata')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL)
+
+        counts = {
+            tag['id']: tag['recipe_count'] for tag in res.data['results']
+        }
+        self.assertEqual(counts, {tag1.id: 2, tag2.id: 1})
+
+    def test_list_tags_by_usage(self):
+        """
+        Test ordering tags by the number of recipes using them, across
+        pages
+        """
+        tag1 = sample_tag(user=self.user, name='Eggs')
+        tag2 = sample_tag(user=self.user, name='Cheese')
+        tag3 = sample_tag(user=self.user, name='Flour')
+        recipe1 = sample_recipe(user=self.user, title='Omelette')
+        recipe2 = sample_recipe(user=self.user, title='Frittata')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        res = self.client.get(
+            TAGS_URL,
+            {'ordering': '-recipe_count', 'page_size': 2},
+        )
+        ids = [tag['id'] for tag in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [tag['id'] for tag in res.data['results']]
+
+        self.assertEqual(ids, [tag1.id, tag2.id, tag3.id])
+
+    def test_list_tags_by_usage_many_ties(self):
+        """
+        Test that following the cursor returns every tag once when more
+        tags than the pagination offset cutoff have the same count
+        """
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name='Used'))
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'Tag {i}')
+            for i in range(RecipeAttrCursorPagination.offset_cutoff + 300)
+        )
+        total = Tag.objects.filter(user=self.user).count()
+
+        for ordering in ('recipe_count', '-recipe_count'):
+            ids = []
+            url, params = TAGS_URL, {'ordering': ordering, 'page_size': 100}
+            pages = 0
+            while url and pages <= total // 100:
+                res = self.client.get(url, params)
+                ids += [tag['id'] for tag in res.data['results']]
+                url, params = res.data['next'], None
+                pages += 1
+
+            self.assertIsNone(url)
+            self.assertEqual(len(ids), total)
+            self.assertEqual(len(set(ids)), total)
+
+            # and back again from the last page
+            last = len(res.data['results'])
+            res = self.client.get(res.data['previous'])
+            self.assertEqual(
+                [tag['id'] for tag in res.data['results']],
+                ids[-100 - last:-last],
+            )
+
+    def test_list_tags_invalid_ordering(self):
+        """
+        Test that an unknown ordering is rejected
+        """
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -11,5 +11,7 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('stats/', views.StatsView.as_view(), name='stats'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('', include(router.urls)),
 ]
@@ -1,27 +1,77 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
+
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from core import metrics
+from core.authentication import CachedTokenAuthentication
 from core.models import Tag, Ingredient, Recipe
 
-from recipe import serializers
+from recipe import serializers, filters, images, export, stats, sync
+from recipe.bulk import BulkModelMixin
+from recipe.cache import (
+    CachedListMixin,
+    ConditionalRetrieveMixin,
+    cached_response,
+)
+from recipe.fastpath import FastListMixin
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
 
 
 class BaseRecipeAttrViewSet(
+        CachedListMixin,
+        BulkModelMixin,
         viewsets.GenericViewSet,
         mixins.ListModelMixin,
         mixins.CreateModelMixin):
     """
     Base viewset for user owned recipe attributes
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+    # values of the `ordering` parameter, with the id keeping the order
+    # stable between repeated names or counts
+    orderings = {
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+        'recipe_count': ('recipe_count', 'id'),
+        '-recipe_count': ('-recipe_count', '-id'),
+    }
+    default_ordering = '-name'
+
+    def get_ordering(self):
+        """
+        Return the ordering requested with the `ordering` parameter
+        """
+        ordering = self.request.query_params.get(
+            'ordering',
+            self.default_ordering,
+        )
+        if ordering not in self.orderings:
+            raise ValidationError({
+                'ordering': _('Must be one of: %s') % ', '.join(
+                    self.orderings,
+                ),
+            })
+
+        return self.orderings[ordering]
 
     def get_queryset(self):
         """
-        Return objects for the current authenticated user only
+        Return objects for the current authenticated user only, annotated
+        with the number of recipes using them
         """
         assigned_only = bool(
             int(
@@ -31,11 +81,18 @@ class BaseRecipeAttrViewSet(
 
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = filters.filter_assigned(queryset)
 
-        return queryset.filter(
+        return filters.annotate_recipe_count(queryset).filter(
             user=self.request.user,
-        ).order_by('-name').distinct()
+        ).order_by(*self.get_ordering())
+
+    def get_bulk_results_queryset(self):
+        """
+        Return the objects serialized into bulk results, with their recipe
+        counts
+        """
+        return filters.annotate_recipe_count(super().get_bulk_queryset())
 
     def perform_create(self, serializer):
         """
@@ -60,10 +117,22 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+        CachedListMixin,
+        FastListMixin,
+        ConditionalRetrieveMixin,
+        BulkModelMixin,
+        viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+    bulk_serializer_class = serializers.RecipeBulkSerializer
+    fast_list_serializer_class = serializers.RecipeRowSerializer
+    bulk_related = {
+        'tags': Tag,
+        'ingredients': Ingredient,
+    }
 
     def _params_to_ints(self, qs):
         """
@@ -75,19 +144,68 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Return recipes for the current authenticated user only
         """
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
+        params = self.request.query_params
+        tags = params.get('tags')
+        ingredients = params.get('ingredients')
         queryset = self.queryset
 
         # filter by tags and ingredients
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filters.filter_by_related(
+                queryset,
+                'tags',
+                tag_ids,
+                params.get('tags_mode', filters.MATCH_ANY),
+            )
         if ingredients:
             ing_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ing_ids)
+            queryset = filters.filter_by_related(
+                queryset,
+                'ingredients',
+                ing_ids,
+                params.get('ingredients_mode', filters.MATCH_ANY),
+            )
 
-        return queryset.filter(user=self.request.user)
+        # search by title, tag and ingredient names, best matches first
+        query = params.get('search', '').strip()
+        if query:
+            queryset = filters.search_recipes(queryset, query)
+            ordering = ('-search_rank', '-id')
+        else:
+            ordering = ('-id',)
+
+        queryset = queryset.prefetch_related(*self.get_prefetch_plan())
+
+        return queryset.filter(user=self.request.user).order_by(*ordering)
+
+    def get_prefetch_plan(self):
+        """
+        Return the related lookups to prefetch for the current action
+        """
+        if self.action in ('list', 'bulk'):
+            fields = ('id',)
+        elif self.action == 'retrieve':
+            fields = ('id', 'name')
+        else:
+            return ()
+
+        # ordered by id, as RecipeRowSerializer lists the related ids
+        tags = Tag.objects.only(*fields).order_by('id')
+        ingredients = Ingredient.objects.only(*fields).order_by('id')
+
+        return (
+            Prefetch('tags', queryset=tags),
+            Prefetch('ingredients', queryset=ingredients),
+        )
+
+    def get_bulk_queryset(self):
+        """
+        Return the user's recipes with their related ids prefetched
+        """
+        return super().get_bulk_queryset().prefetch_related(
+            *self.get_prefetch_plan()
+        )
 
     def get_serializer_class(self):
         """
@@ -108,20 +226,119 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """
-        Upload an image to a recipe
+        Upload an image to a recipe, its variants are processed afterwards
         """
+        limit = images.LimitedUploadHandler(
+            settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE,
+            request._request,
+        )
+        request.upload_handlers.insert(0, limit)
+
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
             data=request.data,
         )
+        if limit.received:
+            metrics.UPLOAD_SIZE.observe(limit.received)
+        if limit.exceeded:
+            return Response(
+                {'image': [_('Image exceeds the maximum upload size')]},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
         if serializer.is_valid():
-            serializer.save()
+            # the stored image stays locked until the recipe uses it
+            with transaction.atomic():
+                serializer.save(image_status=Recipe.IMAGE_PROCESSING)
+            # variants are rendered in the background once the image is saved
+            transaction.on_commit(lambda: images.submit(recipe.id))
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK,
+                status=status.HTTP_202_ACCEPTED,
             )
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST,
         )
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """
+        Stream the recipe library of the user as NDJSON or CSV
+        """
+        export_format = request.query_params.get(
+            'export_format', export.FORMAT_NDJSON,
+        )
+        if export_format not in export.RENDERERS:
+            raise ValidationError({'export_format': [
+                _('Expected one of: %s') % ', '.join(export.RENDERERS),
+            ]})
+
+        response = StreamingHttpResponse(
+            export.export_recipes(request.user, export_format),
+            content_type=export.CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
+
+
+class SyncView(APIView):
+    """
+    Return the tags, ingredients and recipes changed since a watermark,
+    or 410 when the changes since it were pruned from the log
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        since = self._get_param('since', 0, minimum=0)
+        page_size = min(
+            self._get_param('page_size', settings.SYNC_PAGE_SIZE, minimum=1),
+            settings.SYNC_MAX_PAGE_SIZE,
+        )
+
+        return Response(sync.get_changes(
+            request.user,
+            since,
+            page_size,
+            context=self.get_serializer_context(),
+        ))
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+    def _get_param(self, name, default, minimum):
+        """
+        Return an integer query parameter
+        """
+        value = self.request.query_params.get(name)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = None
+        if value is None or value < minimum:
+            raise ValidationError({name: [
+                _('Expected an integer of at least %d') % minimum,
+            ]})
+
+        return value
+
+
+class StatsView(APIView):
+    """
+    Return aggregate statistics of the user's recipes, tags and
+    ingredients
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        return cached_response(
+            request,
+            lambda: Response(stats.get_stats(request.user)),
+            'stats',
+        )
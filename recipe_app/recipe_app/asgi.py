@@ -0,0 +1,15 @@
+"""
+ASGI config for recipe_app project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Django 2.1 only speaks WSGI, so the WSGI application is
+adapted with asgiref, running each request in a thread. Serving it needs
+the asgiref package and an ASGI server such as uvicorn, see
+gunicorn.conf.py.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+
+from recipe_app.wsgi import application as wsgi_application
+
+application = WsgiToAsgi(wsgi_application)
@@ -24,9 +24,13 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = str(os.getenv('SECRET_KEY'))
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG') == '1'
 
-ALLOWED_HOSTS = []
+# comma separated host names the site is served under
+ALLOWED_HOSTS = [
+    host.strip() for host in os.environ.get('ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
 
 
 # Application definition
@@ -46,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,13 +85,28 @@ WSGI_APPLICATION = 'recipe_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# Set DB_ENGINE=core.db.backends.postgresql_pool to use the in-process
+# connection pool, sized by the POOL options. MIN_SIZE connections are
+# opened along with the pool and kept when idle, and with health checks
+# on, connections are tested as they are taken from the pool
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get(
+            'DB_ENGINE', 'django.db.backends.postgresql',
+        ),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS') == '1',
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+        },
     }
 }
 
@@ -132,5 +153,127 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = 'vol/web/media'
 STATIC_ROOT = 'vol/web/static'
 
+# Collected static files are named after a hash of their content and
+# stored along with gzip and brotli encodings
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Serve static and media files from the application, by default only with
+# DEBUG, for deployments without a web server or CDN in front of it, with
+# the seconds they may be cached for, for good when the name includes a
+# hash of the content
+SERVE_FILES = os.environ.get('SERVE_FILES', '1' if DEBUG else '0') == '1'
+FILE_MAX_AGE = int(os.environ.get('FILE_MAX_AGE', 3600))
+HASHED_FILE_MAX_AGE = int(
+    os.environ.get('HASHED_FILE_MAX_AGE', 365 * 24 * 3600),
+)
+
 # Custom user model definition
 AUTH_USER_MODEL = 'core.User'
+
+# Django REST framework, API_FAST_JSON selects the JSON renderer and parser
+# that use orjson when it is installed instead of the standard library
+API_FAST_JSON = os.environ.get('API_FAST_JSON', '1') == '1'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer' if API_FAST_JSON
+        else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser' if API_FAST_JSON
+        else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# API pagination
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+# build recipe lists from database rows rather than serializer fields
+RECIPE_LIST_FAST_PATH = os.environ.get('RECIPE_LIST_FAST_PATH', '1') == '1'
+
+# Bulk endpoints, items accepted per request and rows per INSERT
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 10000))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+
+# Change log entries returned per sync request, by default and at most
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 1000))
+SYNC_MAX_PAGE_SIZE = int(os.environ.get('SYNC_MAX_PAGE_SIZE', 10000))
+# Days tombstones of deleted objects are kept in the change log, clients
+# that did not sync for longer start over, see compact_changes
+SYNC_RETENTION_DAYS = int(os.environ.get('SYNC_RETENTION_DAYS', 30))
+
+# Library statistics, prices splitting the price distribution and number
+# of most used ingredients listed
+RECIPE_STATS_PRICE_BUCKETS = (5, 10, 20, 50)
+RECIPE_STATS_TOP_INGREDIENTS = int(
+    os.environ.get('RECIPE_STATS_TOP_INGREDIENTS', 10),
+)
+
+# Text search configuration used for the recipe search vectors
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Rows fetched per server side cursor round trip when exporting recipes
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Request profiling, off by default. Enabled requests report their timings
+# in Server-Timing headers and the core.profiling log, and those sampled at
+# PROFILING_SAMPLE_RATE or sending PROFILING_SECRET in an X-Profile header
+# are run under cProfile with the stats written to PROFILING_DIR
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET', '')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', 'vol/profiles')
+
+# Metrics served at /metrics when enabled. Workers of a multi-process
+# server write their values to METRICS_DIR every METRICS_FLUSH_INTERVAL
+# seconds, so any of them serves the totals. METRICS_TOKEN must be sent as
+# a bearer token to read them, which only DEBUG does without
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Cache backends, local memory unless configured otherwise
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+}
+
+# Cached list responses, RESPONSE_CACHE_ALIAS names the cache from CACHES
+# holding them along with the per user versions. Responses are not cached
+# in a process local cache, such as LocMemCache, when SERVER_PROCESSES
+# processes serve requests, gunicorn.conf.py sets it to its worker count.
+SERVER_PROCESSES = int(os.environ.get('SERVER_PROCESSES', 1))
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+
+# Token authentication cache, TOKEN_CACHE_ALIAS names an optional shared
+# cache from CACHES. Without one, tokens are only cached in the memory of
+# the process while a single process serves requests, see SERVER_PROCESSES
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_ALIAS = os.environ.get('TOKEN_CACHE_ALIAS')
+
+# Recipe image processing. Uploads above the size limit are rejected while
+# streaming, the rest get a variant per size (longest side, in pixels) and
+# format. The executor is 'thread', 'process' (thread + process pool for
+# the image work) or 'sync' (inline, for development)
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': 150,
+    'small': 480,
+    'large': 1280,
+}
+RECIPE_IMAGE_FORMATS = ('webp', 'jpeg')
+RECIPE_IMAGE_EXECUTOR = os.environ.get('RECIPE_IMAGE_EXECUTOR', 'thread')
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
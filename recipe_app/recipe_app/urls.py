@@ -13,13 +13,39 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', core_views.metrics, name='metrics'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+
+def file_pattern(prefix, view, name):
+    """
+    Route the files below a local url prefix to a file view
+    """
+    return re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(prefix.lstrip('/'))),
+        view,
+        name=name,
+    )
+
+
+if settings.SERVE_FILES:
+    # files served from another host are left alone
+    urlpatterns += [
+        file_pattern(prefix, view, name) for prefix, view, name in (
+            (settings.STATIC_URL, core_views.static_file, 'static'),
+            (settings.MEDIA_URL, core_views.media_file, 'media'),
+        )
+        if prefix.startswith('/')
+    ]
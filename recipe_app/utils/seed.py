@@ -0,0 +1,297 @@
+import datetime
+import io
+import itertools
+import random
+
+from django.db import connections
+
+from core.models import Ingredient, Recipe, Tag
+from core.signals import bulk_saved
+from recipe.bulk import bulk_create
+
+TAG_NAMES = (
+    'Breakfast', 'Brunch', 'Lunch', 'Dinner', 'Dessert', 'Snack', 'Side',
+    'Starter', 'Vegan', 'Vegetarian', 'Gluten Free', 'Dairy Free',
+    'Low Carb', 'Quick', 'Slow Cooker', 'One Pot', 'Baking', 'Grill',
+    'Italian', 'Mexican', 'Indian', 'Thai', 'Japanese', 'Chinese',
+    'French', 'Greek', 'Spanish', 'Comfort Food', 'Healthy', 'Kids',
+)
+# roughly from the most to the least common
+INGREDIENT_NAMES = (
+    'Salt', 'Olive Oil', 'Garlic', 'Onion', 'Black Pepper', 'Butter',
+    'Sugar', 'Eggs', 'Flour', 'Water', 'Milk', 'Lemon', 'Tomato',
+    'Parsley', 'Chicken', 'Carrot', 'Cheese', 'Cream', 'Rice', 'Potato',
+    'Basil', 'Ginger', 'Chili', 'Bell Pepper', 'Soy Sauce', 'Honey',
+    'Cumin', 'Paprika', 'Beef', 'Mushroom', 'Spinach', 'Coriander',
+    'Pasta', 'Vinegar', 'Yogurt', 'Lime', 'Thyme', 'Oregano', 'Celery',
+    'Bacon', 'Cinnamon', 'Vanilla', 'Salmon', 'Beans', 'Lentils', 'Corn',
+    'Zucchini', 'Pork', 'Coconut Milk', 'Tofu', 'Shrimp', 'Chickpeas',
+    'Avocado', 'Cabbage', 'Broccoli', 'Peas', 'Almonds', 'Walnuts',
+    'Mint', 'Rosemary',
+)
+TITLE_WORDS = (
+    'Roasted', 'Grilled', 'Spicy', 'Creamy', 'Crispy', 'Baked', 'Fried',
+    'Braised', 'Smoky', 'Sweet', 'Tangy', 'Herbed', 'Stuffed', 'Easy',
+    'Classic', 'Rustic',
+)
+DISHES = (
+    'Soup', 'Salad', 'Stew', 'Curry', 'Pie', 'Tart', 'Bowl', 'Tacos',
+    'Risotto', 'Stir Fry', 'Casserole', 'Skillet', 'Bake', 'Sandwich',
+    'Noodles', 'Cake',
+)
+
+# tags per recipe with their relative frequency, and the range of
+# ingredients per recipe
+TAG_COUNTS = ((0, 5), (1, 20), (2, 30), (3, 25), (4, 12), (5, 8))
+INGREDIENT_COUNTS = (3, 20)
+
+
+def _cumulative_popularity(count, exponent=1.1):
+    """
+    Return cumulative Zipf weights, so a few names are used by most
+    recipes and the rest by a long tail
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def _weighted_sample(rand, population, cum_weights, count):
+    """
+    Return `count` distinct elements of the population, or all of them,
+    picked by weight
+    """
+    count = min(count, len(population))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rand.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen),
+        ))
+
+    return sorted(chosen)
+
+
+def _names(base, count):
+    """
+    Return `count` distinct names, numbering the base names once they
+    run out
+    """
+    return [
+        base[index % len(base)] if index < len(base)
+        else f'{base[index % len(base)]} {index // len(base) + 1}'
+        for index in range(count)
+    ]
+
+
+def can_copy(using='default'):
+    """
+    Return whether rows can be loaded with PostgreSQL COPY
+    """
+    return connections[using].vendor == 'postgresql'
+
+
+def _copy_value(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+
+    return str(value).replace('\\', '\\\\').replace('\t', r'\t').replace(
+        '\n', r'\n',
+    ).replace('\r', r'\r')
+
+
+def copy_insert(objs, using='default'):
+    """
+    Insert objects of one model with COPY, reserving their ids from the
+    primary key sequence first and setting them on the objects
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    model = type(objs[0])
+    opts = model._meta
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+            'FROM generate_series(1, %s)',
+            [opts.db_table, opts.pk.column, len(objs)],
+        )
+        for obj, (pk,) in zip(objs, cursor.fetchall()):
+            obj.pk = pk
+
+    fields = opts.concrete_fields
+    copy_rows(
+        model,
+        [field.column for field in fields],
+        (
+            [
+                field.get_db_prep_save(
+                    field.pre_save(obj, add=True),
+                    connection=connection,
+                )
+                for field in fields
+            ]
+            for obj in objs
+        ),
+        using=using,
+    )
+
+    return objs
+
+
+def copy_rows(model, columns, rows, using='default'):
+    """
+    Load rows of database values into the given columns of a model's
+    table with COPY, skipping model instances altogether
+    """
+    connection = connections[using]
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(name) for name in columns)
+    with connection.cursor() as cursor:
+        # the psycopg2 cursor under Django's wrapper
+        cursor.cursor.copy_expert(
+            f'COPY {table} ({columns}) FROM STDIN',
+            buffer,
+        )
+
+
+class LibraryGenerator:
+    """
+    Generate recipe libraries with skewed tag and ingredient popularity,
+    log-normal cooking times and prices, and titles built from a small
+    vocabulary. The same seed always produces the same libraries.
+
+    Rows are loaded with COPY on PostgreSQL and with bulk inserts
+    elsewhere, `batch_size` recipes at a time, and `bulk_saved` is sent
+    for each batch so search vectors, the change log and cached responses
+    follow.
+    """
+
+    def __init__(self, seed=0, batch_size=1000, use_copy=None,
+                 using='default'):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.use_copy = can_copy(using) if use_copy is None else use_copy
+        self.using = using
+
+    def generate(self, user, recipes, tags=20, ingredients=50, index=0):
+        """
+        Create `tags` tags, `ingredients` ingredients and `recipes`
+        recipes for a user, returning the recipe ids. `index` tells the
+        libraries generated with the same seed apart.
+        """
+        rand = random.Random(self.seed * 1000003 + index)
+        tag_ids = self._insert_named(Tag, user, _names(TAG_NAMES, tags))
+        ingredient_ids = self._insert_named(
+            Ingredient, user, _names(INGREDIENT_NAMES, ingredients),
+        )
+        # the most popular names stay on top, the tail differs per user
+        for related in (tag_ids, ingredient_ids):
+            tail = related[len(related) // 3:]
+            rand.shuffle(tail)
+            related[len(related) // 3:] = tail
+        tag_weights = _cumulative_popularity(len(tag_ids))
+        ingredient_weights = _cumulative_popularity(len(ingredient_ids))
+        tag_counts, tag_count_weights = zip(*TAG_COUNTS)
+
+        ids = []
+        for start in range(0, recipes, self.batch_size):
+            batch = self._insert(
+                [
+                    self._recipe(user, rand)
+                    for _ in range(min(self.batch_size, recipes - start))
+                ],
+            )
+            links = {'tags': [], 'ingredients': []}
+            for recipe in batch:
+                links['tags'].extend(
+                    (recipe.pk, pk) for pk in _weighted_sample(
+                        rand,
+                        tag_ids,
+                        tag_weights,
+                        rand.choices(tag_counts, tag_count_weights)[0],
+                    )
+                )
+                links['ingredients'].extend(
+                    (recipe.pk, pk) for pk in _weighted_sample(
+                        rand,
+                        ingredient_ids,
+                        ingredient_weights,
+                        rand.randint(*INGREDIENT_COUNTS),
+                    )
+                )
+            for name, pairs in links.items():
+                self._insert_links(name, pairs)
+            # search vectors follow the links, so they are refreshed once
+            # the links exist
+            bulk_saved.send(sender=Recipe, instances=batch, created=True)
+            ids.extend(recipe.pk for recipe in batch)
+
+        return ids
+
+    def _recipe(self, user, rand):
+        words = rand.sample(TITLE_WORDS, rand.randint(0, 2))
+        title = ' '.join(
+            words
+            + [rand.choice(INGREDIENT_NAMES), rand.choice(DISHES)]
+        )
+        time_minutes = int(min(max(rand.lognormvariate(3.4, 0.6), 5), 480))
+        price = round(min(max(rand.lognormvariate(2.3, 0.7), 1), 999), 2)
+
+        return Recipe(
+            user=user,
+            title=title,
+            time_minutes=time_minutes,
+            price=price,
+        )
+
+    def _insert_named(self, model, user, names):
+        objs = self._insert(
+            [model(user=user, name=name) for name in names],
+        )
+        bulk_saved.send(sender=model, instances=objs, created=True)
+
+        return [obj.pk for obj in objs]
+
+    def _insert_links(self, name, pairs):
+        """
+        Link recipes to related objects through a many to many field from
+        (recipe id, related id) pairs
+        """
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        if self.use_copy:
+            copy_rows(through, [source, target], pairs, using=self.using)
+        else:
+            through.objects.using(self.using).bulk_create(
+                [through(**{source: a, target: b}) for a, b in pairs],
+                batch_size=self.batch_size,
+            )
+
+    def _insert(self, objs):
+        """
+        Insert objects of one model, setting their ids
+        """
+        if not objs:
+            return objs
+        if self.use_copy:
+            return copy_insert(objs, using=self.using)
+
+        return bulk_create(
+            type(objs[0]).objects.using(self.using),
+            objs,
+            batch_size=self.batch_size,
+        )
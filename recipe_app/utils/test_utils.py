@@ -1,5 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from core.models import Recipe, Tag, Ingredient
+from utils.seed import LibraryGenerator
 
 
 def sample_superuser(**params):
@@ -52,3 +55,32 @@ def sample_ingredient(user, name='Salt'):
     Create and return a sample ingredient
     """
     return Ingredient.objects.create(user=user, name=name)
+
+
+def sample_library(user, recipes, tags=20, ingredients=50, seed=0,
+                   index=0, batch_size=1000):
+    """
+    Create a library of recipes for a user with bulk inserts, each recipe
+    linked to some of the user's new tags and ingredients, and return the
+    ids of the recipes
+    """
+    generator = LibraryGenerator(seed=seed, batch_size=batch_size)
+    return generator.generate(user, recipes, tags, ingredients, index)
+
+
+def assert_constant_queries(test_case, request, add_rows, sizes=(1, 10)):
+    """
+    Assert that `request` runs the same number of queries no matter how
+    many rows were added by calling `add_rows(size)` before each run
+    """
+    counts = []
+    for size in sizes:
+        add_rows(size)
+        with CaptureQueriesContext(connection) as context:
+            request()
+        counts.append(len(context.captured_queries))
+
+    test_case.assertEqual(
+        len(set(counts)), 1,
+        f'Query count changes with the number of rows: {counts}',
+    )